@@ -68,6 +68,18 @@ parser.add_argument(
     type=str2bool,
     default=True,
     help='Whether to run as local mode.')
+parser.add_argument(
+    '--fuse_grad_size_mb',
+    type=float,
+    default=0,
+    help='The max size in MB of the fused grad buffers sent to a pserver, '
+    '0 disables the fusion.')
+parser.add_argument(
+    '--grad_compression',
+    type=str,
+    default=None,
+    choices=['fp16', 'int8', 'topk'],
+    help='The method to compress the grads sent to the pservers.')
 args = parser.parse_args()
 
 
@@ -223,11 +235,15 @@ def main():
             "TRAINING_ROLE",
             "TRAINER")  # get the training role: trainer/pserver
         t = fluid.DistributeTranspiler()
+        trainer_id = int(os.getenv("PADDLE_INIT_TRAINER_ID", "0"))
         t.transpile(
             optimize_ops,
             params_grads,
+            trainer_id,
             pservers=pserver_endpoints,
-            trainers=trainers)
+            trainers=trainers,
+            fuse_grad_size_mb=args.fuse_grad_size_mb,
+            grad_compression=args.grad_compression)
 
         if training_role == "PSERVER":
             if not current_endpoint:
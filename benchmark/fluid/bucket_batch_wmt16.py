@@ -0,0 +1,112 @@
+#   Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tokens/sec of a WMT16 LSTM encoder with paddle.batch and bucket_batch"""
+from __future__ import print_function
+
+import argparse
+import time
+
+import paddle.v2 as paddle
+import paddle.fluid as fluid
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument(
+    '--batch_size', type=int, default=64, help="Batch size for training.")
+parser.add_argument(
+    '--dict_size', type=int, default=10000, help="Size of the dictionaries.")
+parser.add_argument(
+    '--hidden_size', type=int, default=256, help="Size of the LSTM.")
+parser.add_argument(
+    '--iterations', type=int, default=200, help="No. of batches to time.")
+parser.add_argument(
+    '--device',
+    type=str,
+    default='CPU',
+    choices=['CPU', 'GPU'],
+    help="The device type.")
+args = parser.parse_args()
+
+BUCKET_BOUNDARIES = [10, 15, 20, 25, 30, 40, 50]
+
+
+def encoder():
+    src = fluid.layers.data(
+        name='src_word_id', shape=[1], dtype='int64', lod_level=1)
+    label = fluid.layers.data(name='label', shape=[1], dtype='int64')
+    emb = fluid.layers.embedding(
+        input=src, size=[args.dict_size, args.hidden_size], is_sparse=True)
+    fc = fluid.layers.fc(input=emb, size=args.hidden_size * 4)
+    lstm, _ = fluid.layers.dynamic_lstm(input=fc, size=args.hidden_size * 4)
+    last = fluid.layers.sequence_last_step(lstm)
+    # predict the first target word, which is enough to time the encoder
+    prediction = fluid.layers.fc(input=last,
+                                 size=args.dict_size,
+                                 act='softmax')
+    cost = fluid.layers.mean(
+        fluid.layers.cross_entropy(
+            input=prediction, label=label))
+    fluid.optimizer.Adam(learning_rate=1e-3).minimize(cost)
+    return [src, label], cost
+
+
+def to_sample(sample):
+    src_ids, trg_ids, _ = sample
+    return src_ids, trg_ids[1]
+
+
+def run(name, batch_reader, exe, feeder, cost):
+    tokens = 0
+    padded_tokens = 0
+    start = None
+    for batch_id, data in enumerate(batch_reader()):
+        if batch_id == 1:
+            # skip the first batch, which allocates the memory
+            start = time.time()
+        if batch_id > 0:
+            lens = [len(s[0]) for s in data]
+            tokens += sum(lens)
+            padded_tokens += max(lens) * len(data)
+        exe.run(fluid.default_main_program(),
+                feed=feeder.feed(data),
+                fetch_list=[cost])
+        if batch_id == args.iterations:
+            break
+    elapsed = time.time() - start
+    print("%s: %.0f tokens/s, padding efficiency %.1f%%" %
+          (name, tokens / elapsed, 100.0 * tokens / padded_tokens))
+
+
+def main():
+    feed_list, cost = encoder()
+    place = fluid.CPUPlace() if args.device == 'CPU' else fluid.CUDAPlace(0)
+    exe = fluid.Executor(place)
+    exe.run(fluid.default_startup_program())
+    feeder = fluid.DataFeeder(feed_list=feed_list, place=place)
+
+    samples = paddle.reader.map_readers(
+        to_sample, paddle.dataset.wmt16.train(args.dict_size, args.dict_size))
+    shuffled = paddle.reader.shuffle(samples, buf_size=10000)
+    run('batch',
+        paddle.batch(shuffled, args.batch_size), exe, feeder, cost)
+    run('bucket_batch',
+        paddle.bucket_batch(
+            samples,
+            BUCKET_BOUNDARIES,
+            batch_size=args.batch_size,
+            shuffle=True,
+            buf_size=10000), exe, feeder, cost)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#   Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compare the batched and the generic conversion of fluid.DataFeeder"""
+from __future__ import print_function
+
+import argparse
+import time
+
+import numpy as np
+import paddle.fluid as fluid
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument(
+    '--batch_size', type=int, default=64, help="Batch size of each feed.")
+parser.add_argument(
+    '--iterations', type=int, default=20, help="No. of feeds to time.")
+parser.add_argument(
+    '--max_seq_len',
+    type=int,
+    default=100,
+    help="The max length of the sequences in the sequence benchmark.")
+args = parser.parse_args()
+
+
+def image_samples(batch_size):
+    img = np.random.random((3 * 224 * 224, )).astype('float32')
+    return [(img, np.random.randint(1000)) for _ in xrange(batch_size)]
+
+
+def sequence_samples(batch_size, max_seq_len):
+    return [(np.random.randint(
+        30000, size=np.random.randint(1, max_seq_len)).tolist(),
+             np.random.randint(2)) for _ in xrange(batch_size)]
+
+
+def time_feeder(feed_list, samples, batched):
+    feeder = fluid.DataFeeder(
+        feed_list=feed_list, place=fluid.CPUPlace(), batched=batched)
+    # warm up, this also allocates the buffers of the batched converters
+    feeder.feed(samples)
+    start = time.time()
+    for _ in xrange(args.iterations):
+        feeder.feed(samples)
+    return (time.time() - start) / args.iterations
+
+
+def run(name, feed_list, samples):
+    generic = time_feeder(feed_list, samples, batched=False)
+    batched = time_feeder(feed_list, samples, batched=True)
+    print("%s: generic %.2f ms/batch, batched %.2f ms/batch, speedup %.2fx" %
+          (name, generic * 1000, batched * 1000, generic / batched))
+
+
+def main():
+    image = fluid.layers.data(name='image', shape=[3, 224, 224])
+    label = fluid.layers.data(name='label', shape=[1], dtype='int64')
+    run('image', [image, label], image_samples(args.batch_size))
+
+    words = fluid.layers.data(
+        name='words', shape=[1], dtype='int64', lod_level=1)
+    run('sequence', [words, label],
+        sequence_samples(args.batch_size, args.max_seq_len))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#   Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Throughput of paddle.v2.reader.xmap_readers with and without order"""
+from __future__ import print_function
+
+import argparse
+import random
+import time
+
+import paddle.v2.reader as reader
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument(
+    '--num_samples', type=int, default=20000, help="No. of samples to map.")
+parser.add_argument(
+    '--process_num', type=int, default=8, help="No. of mapping workers.")
+parser.add_argument(
+    '--buffer_size', type=int, default=64, help="Size of the buffers.")
+parser.add_argument(
+    '--mapper_ms',
+    type=float,
+    default=0.2,
+    help="Mean time in ms a mapper sleeps, which releases the GIL like "
+    "the OpenCV based image mappers.")
+parser.add_argument(
+    '--use_process', action='store_true', help="Map in worker processes.")
+args = parser.parse_args()
+
+
+def mapper(sample):
+    time.sleep(random.random() * 2 * args.mapper_ms / 1000.0)
+    return sample
+
+
+def samples():
+    for i in xrange(args.num_samples):
+        yield i
+
+
+def throughput(order):
+    r = reader.xmap_readers(
+        mapper,
+        samples,
+        args.process_num,
+        args.buffer_size,
+        order=order,
+        use_process=args.use_process)
+    start = time.time()
+    count = sum(1 for _ in r())
+    return count / (time.time() - start)
+
+
+def main():
+    unordered = throughput(order=False)
+    ordered = throughput(order=True)
+    print("unordered: %.0f samples/s" % unordered)
+    print("ordered: %.0f samples/s (%.1f%% of unordered)" %
+          (ordered, ordered / unordered * 100))
+
+
+if __name__ == '__main__':
+    main()
@@ -14,7 +14,13 @@ limitations under the License. */
 
 #include "paddle/fluid/framework/executor.h"
 
+#include <algorithm>
+#include <condition_variable>
+#include <deque>
+#include <mutex>
 #include <set>
+#include <unordered_map>
+#include <unordered_set>
 
 #include "gflags/gflags.h"
 #include "paddle/fluid/framework/channel.h"
@@ -24,6 +30,7 @@ limitations under the License. */
 #include "paddle/fluid/framework/lod_tensor_array.h"
 #include "paddle/fluid/framework/op_registry.h"
 #include "paddle/fluid/framework/reader.h"
+#include "paddle/fluid/framework/threadpool.h"
 #include "paddle/fluid/platform/place.h"
 #include "paddle/fluid/platform/profiler.h"
 
@@ -84,33 +91,207 @@ static void CheckTensorNANOrInf(const std::string& name,
                  "Tensor %s contains NAN", name);
 }
 
+ExecutorPrepareContext::ExecutorPrepareContext(
+    const framework::ProgramDesc& prog, size_t block_id)
+    : prog_(prog), block_id_(block_id) {}
+
+ExecutorPrepareContext::~ExecutorPrepareContext() {
+  // The local scope is owned by the scope it was created in, which might
+  // have been deleted already, so it is left to that scope.
+  VLOG(5) << "destroy ExecutorPrepareContext";
+}
+
+void ExecutorPrepareContext::ResetLocalScope() {
+  if (local_scope_ != nullptr) {
+    scope_->DeleteScope(local_scope_);
+  }
+  scope_ = nullptr;
+  local_scope_ = nullptr;
+  reset_vars_.clear();
+}
+
+// The operators with side effects not shown by their outputs.
+static const std::unordered_set<std::string> kBarrierOpTypes = {
+    "send",
+    "recv",
+    "send_vars",
+    "send_barrier",
+    "listen_and_serv",
+    "print",
+    "go",
+    "select",
+    "channel_create",
+    "channel_send",
+    "channel_recv",
+    "channel_close",
+    "read",
+    "create_recordio_file_reader"};
+
+static bool IsBarrierOp(const OperatorBase& op) {
+  if (kBarrierOpTypes.count(op.Type()) || op.OutputVars(true).empty()) {
+    return true;
+  }
+  for (auto& attr : op.Attrs()) {
+    if (attr.second.type() == typeid(BlockDesc*)) {
+      return true;
+    }
+  }
+  return false;
+}
+
+void ExecutorPrepareContext::BuildDependencyGraph() {
+  size_t op_num = ops_.size();
+  std::vector<std::unordered_set<size_t>> dependents(op_num);
+  dependency_counts_.assign(op_num, 0);
+  barriers_.assign(op_num, false);
+
+  auto add_dependency = [&](size_t from, size_t to) {
+    if (from != to && dependents[from].insert(to).second) {
+      ++dependency_counts_[to];
+    }
+  };
+
+  std::unordered_map<std::string, size_t> last_writer;
+  std::unordered_map<std::string, std::vector<size_t>> readers;
+  std::vector<size_t> since_barrier;
+  bool has_barrier = false;
+  size_t last_barrier = 0;
+
+  for (size_t i = 0; i < op_num; ++i) {
+    auto& op = *ops_[i];
+    if (IsBarrierOp(op)) {
+      barriers_[i] = true;
+      for (auto j : since_barrier) {
+        add_dependency(j, i);
+      }
+      if (has_barrier) {
+        add_dependency(last_barrier, i);
+      }
+      since_barrier.clear();
+      last_writer.clear();
+      readers.clear();
+      has_barrier = true;
+      last_barrier = i;
+      continue;
+    }
+
+    if (has_barrier) {
+      add_dependency(last_barrier, i);
+    }
+    for (auto& name : op.InputVars()) {
+      if (name == kEmptyVarName) continue;
+      auto it = last_writer.find(name);
+      if (it != last_writer.end()) {
+        add_dependency(it->second, i);
+      }
+      readers[name].push_back(i);
+    }
+    for (auto& name : op.OutputVars(true)) {
+      if (name == kEmptyVarName) continue;
+      auto it = last_writer.find(name);
+      if (it != last_writer.end()) {
+        add_dependency(it->second, i);
+      }
+      auto& var_readers = readers[name];
+      for (auto j : var_readers) {
+        add_dependency(j, i);
+      }
+      var_readers.clear();
+      last_writer[name] = i;
+    }
+    since_barrier.push_back(i);
+  }
+
+  dependents_.resize(op_num);
+  for (size_t i = 0; i < op_num; ++i) {
+    dependents_[i].assign(dependents[i].begin(), dependents[i].end());
+  }
+  has_dependency_graph_ = true;
+}
+
+void Executor::SetInterOpThreads(size_t threads) {
+  PADDLE_ENFORCE_GT(threads, 0UL, "The number of threads must be positive");
+  inter_op_threads_ = threads;
+}
+
 void Executor::Run(const ProgramDesc& pdesc, Scope* scope, int block_id,
                    bool create_local_scope, bool create_vars) {
   // TODO(tonyyang-svail):
   //    - only runs on the first device (i.e. no interdevice communication)
   //    - will change to use multiple blocks for RNN op and Cond Op
-  PADDLE_ENFORCE_LT(static_cast<size_t>(block_id), pdesc.Size());
-  auto& block = pdesc.Block(block_id);
+  auto ctx = Prepare(pdesc, block_id);
+  RunPreparedContext(ctx.get(), scope, create_local_scope, create_vars);
+}
+
+std::unique_ptr<ExecutorPrepareContext> Executor::Prepare(
+    const ProgramDesc& program, int block_id) {
+  PADDLE_ENFORCE_LT(static_cast<size_t>(block_id), program.Size());
+  std::unique_ptr<ExecutorPrepareContext> ctx(
+      new ExecutorPrepareContext(program, block_id));
+  auto& block = program.Block(block_id);
+  for (auto& op_desc : block.AllOps()) {
+    ctx->ops_.push_back(OpRegistry::CreateOp(*op_desc));
+  }
+  return ctx;
+}
+
+// Create the variables of the block, the persistable ones in scope and the
+// others in local_scope. Append the variables to be created again before
+// the next run to reset_vars if it is not nullptr.
+static void CreateVariables(
+    const BlockDesc& block, Scope* scope, Scope* local_scope,
+    std::vector<std::pair<Variable*, proto::VarType::Type>>* reset_vars) {
+  for (auto& var : block.AllVars()) {
+    if (var->Name() == framework::kEmptyVarName) {
+      continue;
+    }
+
+    if (var->Persistable()) {
+      auto* ptr = scope->Var(var->Name());
+      CreateTensor(ptr, var->GetType());
+      VLOG(3) << "Create Variable " << var->Name()
+              << " global, which pointer is " << ptr;
+    } else {
+      auto* ptr = local_scope->Var(var->Name());
+      CreateTensor(ptr, var->GetType());
+      VLOG(3) << "Create Variable " << var->Name()
+              << " locally, which pointer is " << ptr;
+      if (reset_vars != nullptr &&
+          var->GetType() != proto::VarType::LOD_TENSOR) {
+        reset_vars->emplace_back(ptr, var->GetType());
+      }
+    }
+  }
+}
+
+void Executor::RunPreparedContext(ExecutorPrepareContext* ctx, Scope* scope,
+                                  bool create_local_scope, bool create_vars,
+                                  bool keep_local_scope) {
+  auto& block = ctx->prog_.Block(ctx->block_id_);
 
   Scope* local_scope = scope;
   if (create_vars) {
     if (create_local_scope) {
-      local_scope = &scope->NewScope();
-      for (auto& var : block.AllVars()) {
-        if (var->Name() == framework::kEmptyVarName) {
-          continue;
+      if (keep_local_scope && ctx->local_scope_ != nullptr &&
+          ctx->scope_ == scope) {
+        local_scope = ctx->local_scope_;
+        // the step scopes of the last run and the arrays, tables and so on
+        // filled by it are not reused.
+        local_scope->DropKids();
+        for (auto& pair : ctx->reset_vars_) {
+          pair.first->Clear();
+          CreateTensor(pair.first, pair.second);
         }
-
-        if (var->Persistable()) {
-          auto* ptr = scope->Var(var->Name());
-          CreateTensor(ptr, var->GetType());
-          VLOG(3) << "Create Variable " << var->Name()
-                  << " global, which pointer is " << ptr;
-        } else {
-          auto* ptr = local_scope->Var(var->Name());
-          CreateTensor(ptr, var->GetType());
-          VLOG(3) << "Create Variable " << var->Name()
-                  << " locally, which pointer is " << ptr;
+      } else {
+        if (keep_local_scope) {
+          ctx->ResetLocalScope();
+        }
+        local_scope = &scope->NewScope();
+        CreateVariables(block, scope, local_scope,
+                        keep_local_scope ? &ctx->reset_vars_ : nullptr);
+        if (keep_local_scope) {
+          ctx->scope_ = scope;
+          ctx->local_scope_ = local_scope;
         }
       }
     } else {
@@ -123,30 +304,15 @@ void Executor::Run(const ProgramDesc& pdesc, Scope* scope, int block_id,
     }  // if (create_local_scope)
   }    // if (create_vars)
 
-  for (auto& op_desc : block.AllOps()) {
-    auto op = paddle::framework::OpRegistry::CreateOp(*op_desc);
-
-    platform::DeviceContextPool& pool = platform::DeviceContextPool::Instance();
-    platform::RecordEvent record_event(op->Type(), pool.Get(place_));
-
-    VLOG(3) << place_ << " " << op->DebugStringEx(local_scope);
-    op->Run(*local_scope, place_);
-
-    if (FLAGS_benchmark) {
-      VLOG(2) << "Memory used after operator " + op->Type() + " running: "
-              << memory::memory_usage(place_);
-    }
-    if (FLAGS_check_nan_inf) {
-      for (auto& vname : op->OutputVars(true)) {
-        auto* var = local_scope->FindVar(vname);
-        if (var == nullptr) continue;
-        if (var->IsType<framework::LoDTensor>()) {
-          CheckTensorNANOrInf(vname, var->Get<framework::LoDTensor>());
-        }
-      }
+  if (inter_op_threads_ > 1 && platform::is_cpu_place(place_) &&
+      ctx->ops_.size() > 1) {
+    RunOpsInParallel(ctx, local_scope);
+  } else {
+    for (auto& op : ctx->ops_) {
+      RunOp(op.get(), local_scope, ctx->block_id_);
     }
   }
-  if (create_vars && create_local_scope) {
+  if (create_vars && create_local_scope && !keep_local_scope) {
     scope->DeleteScope(local_scope);
   }
   if (FLAGS_benchmark) {
@@ -157,6 +323,118 @@ void Executor::Run(const ProgramDesc& pdesc, Scope* scope, int block_id,
   }
 }
 
+void Executor::RunOp(OperatorBase* op, Scope* scope, size_t block_id) {
+  platform::DeviceContextPool& pool = platform::DeviceContextPool::Instance();
+  {
+    platform::RecordEvent record_event(op->Type(), pool.Get(place_),
+                                       static_cast<int32_t>(block_id));
+
+    VLOG(3) << place_ << " " << op->DebugStringEx(scope);
+    op->Run(*scope, place_);
+  }
+  if (platform::IsProfileEnabled()) {
+    platform::RecordCounter("memory_used",
+                            static_cast<int64_t>(memory::memory_usage(place_)));
+  }
+
+  if (FLAGS_benchmark) {
+    VLOG(2) << "Memory used after operator " + op->Type() + " running: "
+            << memory::memory_usage(place_);
+  }
+  if (FLAGS_check_nan_inf) {
+    for (auto& vname : op->OutputVars(true)) {
+      auto* var = scope->FindVar(vname);
+      if (var == nullptr) continue;
+      if (var->IsType<framework::LoDTensor>()) {
+        CheckTensorNANOrInf(vname, var->Get<framework::LoDTensor>());
+      }
+    }
+  }
+}
+
+void Executor::RunOpsInParallel(ExecutorPrepareContext* ctx, Scope* scope) {
+  if (!ctx->has_dependency_graph_) {
+    ctx->BuildDependencyGraph();
+  }
+  size_t op_num = ctx->ops_.size();
+  size_t max_running =
+      std::min(inter_op_threads_, ThreadPool::GetInstance()->Threads());
+  std::vector<size_t> pending(ctx->dependency_counts_);
+  std::deque<size_t> ready;
+  for (size_t i = 0; i < op_num; ++i) {
+    if (pending[i] == 0) {
+      ready.push_back(i);
+    }
+  }
+
+  std::mutex mutex;
+  std::condition_variable finished_cv;
+  std::vector<size_t> finished;
+  std::unique_ptr<platform::EnforceNotMet> exception;
+  bool failed = false;
+  size_t running = 0;
+  size_t done = 0;
+
+  auto finish = [&](size_t i) {
+    for (auto j : ctx->dependents_[i]) {
+      if (--pending[j] == 0) {
+        ready.push_back(j);
+      }
+    }
+    ++done;
+  };
+
+  while (done < op_num) {
+    // The barriers run on this thread when nothing else is running, so the
+    // sub-blocks they run can use the thread pool too.
+    while (!failed && !ready.empty()) {
+      size_t i = ready.front();
+      if (ctx->barriers_[i]) {
+        if (running > 0) break;
+        ready.pop_front();
+        RunOp(ctx->ops_[i].get(), scope, ctx->block_id_);
+        finish(i);
+        continue;
+      }
+      if (running >= max_running) break;
+      ready.pop_front();
+      ++running;
+      Async([&, i] {
+        std::unique_ptr<platform::EnforceNotMet> ex;
+        try {
+          RunOp(ctx->ops_[i].get(), scope, ctx->block_id_);
+        } catch (platform::EnforceNotMet& e) {
+          ex.reset(new platform::EnforceNotMet(e));
+        }
+        std::lock_guard<std::mutex> lock(mutex);
+        if (ex != nullptr && exception == nullptr) {
+          exception = std::move(ex);
+        }
+        finished.push_back(i);
+        finished_cv.notify_one();
+      });
+    }
+    if (running == 0) break;
+
+    std::vector<size_t> just_finished;
+    {
+      std::unique_lock<std::mutex> lock(mutex);
+      finished_cv.wait(lock, [&] { return !finished.empty(); });
+      just_finished.swap(finished);
+      failed = exception != nullptr;
+    }
+    for (auto i : just_finished) {
+      --running;
+      finish(i);
+    }
+  }
+
+  if (exception != nullptr) {
+    throw *exception;
+  }
+  PADDLE_ENFORCE_EQ(done, op_num, "Operators are not all run");
+}
+
 // Check whether the block already has feed operators and feed_holder.
 // Return false if the block does not have any feed operators.
 // If some feed operators have been prepended to the block, check that
@@ -14,7 +14,13 @@ limitations under the License. */
 
 #pragma once
 
+#include <memory>
+#include <string>
+#include <utility>
+#include <vector>
+
 #include "paddle/fluid/framework/op_info.h"
+#include "paddle/fluid/framework/operator.h"
 #include "paddle/fluid/framework/program_desc.h"
 #include "paddle/fluid/framework/scope.h"
 #include "paddle/fluid/framework/tensor.h"
@@ -23,6 +29,52 @@ limitations under the License. */
 namespace paddle {
 namespace framework {
 
+/* @Brief
+ * The operators of a block instantiated once by Executor::Prepare, so that
+ * Executor::RunPreparedContext runs the block without creating them again.
+ *
+ * The ProgramDesc must outlive the context.
+ */
+struct ExecutorPrepareContext {
+  ExecutorPrepareContext(const framework::ProgramDesc& prog, size_t block_id);
+  ~ExecutorPrepareContext();
+
+  /* @Brief
+   * Delete the local scope kept by the previous runs from the scope it was
+   * created in, which must be still alive.
+   */
+  void ResetLocalScope();
+
+  /* @Brief
+   * Build the dependency graph of the operators for running them in
+   * parallel. An operator depends on the last operator writing any of its
+   * inputs or outputs, and on the operators reading its outputs since that
+   * write. The operators with sub-blocks or side effects are barriers, which
+   * depend on all the operators before them, and all the operators after
+   * them depend on.
+   */
+  void BuildDependencyGraph();
+
+  const framework::ProgramDesc& prog_;
+  size_t block_id_;
+  std::vector<std::unique_ptr<OperatorBase>> ops_;
+
+  // The local scope kept between the runs, and the scope it belongs to.
+  Scope* scope_{nullptr};
+  Scope* local_scope_{nullptr};
+  // The variables of the local scope which are created again before each
+  // run, i.e. all but the LoDTensors whose memory is reused.
+  std::vector<std::pair<Variable*, proto::VarType::Type>> reset_vars_;
+
+  bool has_dependency_graph_{false};
+  // operator index -> the indexes of the operators depending on it
+  std::vector<std::vector<size_t>> dependents_;
+  // operator index -> the number of operators it depends on
+  std::vector<size_t> dependency_counts_;
+  // operator index -> whether it is a barrier
+  std::vector<bool> barriers_;
+};
+
 class Executor {
  public:
   // TODO(dzhwinter) : Do not rely on this function, it will be removed
@@ -47,8 +99,40 @@ class Executor {
            const std::string& feed_holder_name = "feed",
            const std::string& fetch_holder_name = "fetch");
 
+  /* @Brief
+   * Instantiate the operators of a block.
+   */
+  static std::unique_ptr<ExecutorPrepareContext> Prepare(
+      const ProgramDesc& program, int block_id);
+
+  /* @Brief
+   * Run the operators prepared by Prepare under the given Scope.
+   *
+   * @param
+   *  keep_local_scope: keep the local scope and the variables created in it
+   *  in ctx, and reuse them in the next run under the same scope. Only the
+   *  variables which are not LoDTensors are created again.
+   */
+  void RunPreparedContext(ExecutorPrepareContext* ctx, Scope* scope,
+                          bool create_local_scope = true,
+                          bool create_vars = true,
+                          bool keep_local_scope = false);
+
+  /* @Brief
+   * Set the max number of independent operators of a block run at the same
+   * time by the threads of framework::ThreadPool. The operators are run one
+   * after another if it is 1, which is the default. Only the blocks run on
+   * CPUPlace are run in parallel.
+   */
+  void SetInterOpThreads(size_t threads);
+
  private:
+  void RunOp(OperatorBase* op, Scope* scope, size_t block_id);
+
+  void RunOpsInParallel(ExecutorPrepareContext* ctx, Scope* scope);
+
   const platform::Place place_;
+  size_t inter_op_threads_{1};
 };
 
 }  // namespace framework
@@ -38,26 +38,23 @@ Scope::~Scope() {
 }
 
 Scope& Scope::NewScope() const {
+  std::lock_guard<std::mutex> lock(mutex_);
   kids_.push_back(new Scope(this));
   return *kids_.back();
 }
 
 Variable* Scope::Var(const std::string& name) {
-  auto* v = FindVarLocally(name);
-  if (v != nullptr) return v;
-  v = new Variable();
-  vars_[name] = v;
-  VLOG(3) << "Create variable " << name;
-  v->name_ = &(vars_.find(name)->first);
-  return v;
+  std::lock_guard<std::mutex> lock(mutex_);
+  return VarInternal(name);
 }
 
 Variable* Scope::Var(std::string* name) {
+  std::lock_guard<std::mutex> lock(mutex_);
   auto var_name = string::Sprintf("%p.%d", this, vars_.size());
   if (name != nullptr) {
     *name = var_name;
   }
-  return Var(var_name);
+  return VarInternal(var_name);
 }
 
 Variable* Scope::FindVar(const std::string& name) const {
@@ -69,19 +66,32 @@ Variable* Scope::FindVar(const std::string& name) const {
 }
 
 const Scope* Scope::FindScope(const Variable* var) const {
-  for (auto& kv : vars_) {
-    if (kv.second == var) {
-      return this;
+  {
+    std::lock_guard<std::mutex> lock(mutex_);
+    for (auto& kv : vars_) {
+      if (kv.second == var) {
+        return this;
+      }
     }
   }
   return (parent_ == nullptr) ? nullptr : parent_->FindScope(var);
 }
 void Scope::DropKids() {
-  for (Scope* s : kids_) delete s;
-  kids_.clear();
+  std::list<Scope*> kids;
+  {
+    std::lock_guard<std::mutex> lock(mutex_);
+    kids.swap(kids_);
+  }
+  for (Scope* s : kids) delete s;
+}
+
+size_t Scope::KidsNum() const {
+  std::lock_guard<std::mutex> lock(mutex_);
+  return kids_.size();
 }
 
 std::vector<std::string> Scope::LocalVarNames() const {
+  std::lock_guard<std::mutex> lock(mutex_);
   std::vector<std::string> known_vars;
   known_vars.reserve(this->vars_.size());
   for (auto& p : vars_) {
@@ -91,9 +101,13 @@ std::vector<std::string> Scope::LocalVarNames() const {
 }
 
 void Scope::DeleteScope(Scope* scope) {
-  auto it = std::find(this->kids_.begin(), this->kids_.end(), scope);
-  PADDLE_ENFORCE(it != this->kids_.end(), "Cannot find %p as kid scope", scope);
-  this->kids_.erase(it);
+  {
+    std::lock_guard<std::mutex> lock(mutex_);
+    auto it = std::find(this->kids_.begin(), this->kids_.end(), scope);
+    PADDLE_ENFORCE(it != this->kids_.end(), "Cannot find %p as kid scope",
+                   scope);
+    this->kids_.erase(it);
+  }
   // When making memory benchmark on Fluid, we have to delete scope sync.
   if (FLAGS_benchmark) {
     delete scope;
@@ -104,27 +118,49 @@ void Scope::DeleteScope(Scope* scope) {
 
 void Scope::Rename(const std::string& origin_name,
                    const std::string& new_name) const {
-  auto origin_it = vars_.find(origin_name);
-  PADDLE_ENFORCE(origin_it != vars_.end(),
-                 "Cannot find original variable with name %s", origin_name);
-  auto new_it = vars_.find(new_name);
-  PADDLE_ENFORCE(new_it == vars_.end(),
-                 "The variable with name %s is already in the scope", new_name);
-  vars_[new_name] = origin_it->second;
-  vars_.erase(origin_it);
+  std::lock_guard<std::mutex> lock(mutex_);
+  RenameInternal(origin_name, new_name);
 }
 
 std::string Scope::Rename(const std::string& origin_name) const {
+  std::lock_guard<std::mutex> lock(mutex_);
   auto var_name = string::Sprintf("%p.%d", this, vars_.size());
-  Rename(origin_name, var_name);
+  RenameInternal(origin_name, var_name);
   return var_name;
 }
 
 Variable* Scope::FindVarLocally(const std::string& name) const {
+  std::lock_guard<std::mutex> lock(mutex_);
+  return FindVarLocallyInternal(name);
+}
+
+Variable* Scope::VarInternal(const std::string& name) {
+  auto* v = FindVarLocallyInternal(name);
+  if (v != nullptr) return v;
+  v = new Variable();
+  vars_[name] = v;
+  VLOG(3) << "Create variable " << name;
+  v->name_ = &(vars_.find(name)->first);
+  return v;
+}
+
+Variable* Scope::FindVarLocallyInternal(const std::string& name) const {
   auto it = vars_.find(name);
   if (it != vars_.end()) return it->second;
   return nullptr;
 }
 
+void Scope::RenameInternal(const std::string& origin_name,
+                           const std::string& new_name) const {
+  auto origin_it = vars_.find(origin_name);
+  PADDLE_ENFORCE(origin_it != vars_.end(),
+                 "Cannot find original variable with name %s", origin_name);
+  auto new_it = vars_.find(new_name);
+  PADDLE_ENFORCE(new_it == vars_.end(),
+                 "The variable with name %s is already in the scope", new_name);
+  vars_[new_name] = origin_it->second;
+  vars_.erase(origin_it);
+}
+
 }  // namespace framework
 }  // namespace paddle
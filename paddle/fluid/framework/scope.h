@@ -15,6 +15,7 @@ limitations under the License. */
 #pragma once
 
 #include <list>
+#include <mutex>
 #include <string>
 #include <unordered_map>
 #include <vector>
@@ -65,6 +66,9 @@ class Scope {
   /// Drop all kids scopes belonged to this scope.
   void DropKids();
 
+  /// The number of the kid scopes.
+  size_t KidsNum() const;
+
   // enumerate all the variables current contains.
   std::vector<std::string> LocalVarNames() const;
 
@@ -81,10 +85,21 @@ class Scope {
   // Call Scope::NewScope for a sub-scope.
   explicit Scope(Scope const* parent) : parent_(parent) {}
 
+  // The unlocked versions of the methods, called with mutex_ held.
+  Variable* VarInternal(const std::string& name);
+  Variable* FindVarLocallyInternal(const std::string& name) const;
+  void RenameInternal(const std::string& origin_name,
+                      const std::string& new_name) const;
+
   mutable std::unordered_map<std::string, Variable*> vars_;
   mutable std::list<Scope*> kids_;
   Scope const* parent_{nullptr};
 
+  // Guards vars_ and kids_, since the operators run by the executor in
+  // parallel create and look up the variables and kid scopes of the same
+  // scope. It is never held while locking the parent or a kid scope.
+  mutable std::mutex mutex_;
+
   DISABLE_COPY_AND_ASSIGN(Scope);
 };
 }  // namespace framework
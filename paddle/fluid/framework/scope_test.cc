@@ -13,6 +13,9 @@ See the License for the specific language governing permissions and
 limitations under the License. */
 
 #include "paddle/fluid/framework/scope.h"
+#include <string>
+#include <thread>
+#include <vector>
 #include "glog/logging.h"
 #include "gtest/gtest.h"
 
@@ -69,3 +72,25 @@ TEST(Scope, GetAllNames) {
 
   EXPECT_STREQ("a", str.c_str());
 }
+
+TEST(Scope, ConcurrentAccess) {
+  Scope s;
+  std::vector<std::thread> threads;
+  for (int t = 0; t < 4; ++t) {
+    threads.emplace_back([&s, t] {
+      for (int i = 0; i < 100; ++i) {
+        std::string name = std::to_string(t) + "." + std::to_string(i);
+        Variable* v = s.Var(name);
+        Scope& ss = s.NewScope();
+        EXPECT_EQ(v, ss.FindVar(name));
+        ss.Var("local");
+        s.DeleteScope(&ss);
+      }
+    });
+  }
+  for (auto& th : threads) {
+    th.join();
+  }
+  EXPECT_EQ(400UL, s.LocalVarNames().size());
+  EXPECT_EQ(0UL, s.KidsNum());
+}
@@ -0,0 +1,100 @@
+/* Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License. */
+
+#include "paddle/fluid/operators/compress_grad_op.h"
+
+namespace paddle {
+namespace operators {
+
+class CompressGradOp : public framework::OperatorWithKernel {
+ public:
+  using framework::OperatorWithKernel::OperatorWithKernel;
+
+ protected:
+  void InferShape(framework::InferShapeContext* ctx) const override {
+    PADDLE_ENFORCE(ctx->HasInput("X"),
+                   "Input(X) of CompressGradOp should not be null.");
+    PADDLE_ENFORCE(ctx->HasOutput("Out"),
+                   "Output(Out) of CompressGradOp should not be null.");
+    auto method = ctx->Attrs().Get<std::string>("method");
+    auto ratio = ctx->Attrs().Get<float>("ratio");
+    PADDLE_ENFORCE(ratio > 0 && ratio <= 1,
+                   "Attr(ratio) should be in (0, 1].");
+    auto numel = framework::product(ctx->GetInputDim("X"));
+    ctx->SetOutputDim("Out", {CompressedSize(method, numel, ratio)});
+    if (ctx->HasOutput("ResidualOut")) {
+      PADDLE_ENFORCE(ctx->HasInput("Residual"),
+                     "Input(Residual) should be set with Output(ResidualOut).");
+      ctx->SetOutputDim("ResidualOut", ctx->GetInputDim("Residual"));
+    }
+  }
+
+  // The compression always runs on CPU, the gradient is copied to CPU
+  // first if it is on GPU.
+  framework::OpKernelType GetExpectedKernelType(
+      const framework::ExecutionContext& ctx) const override {
+    return framework::OpKernelType(framework::proto::VarType::FP32,
+                                   platform::CPUPlace());
+  }
+};
+
+class CompressGradOpMaker : public framework::OpProtoAndCheckerMaker {
+ public:
+  CompressGradOpMaker(OpProto* proto, OpAttrChecker* op_checker)
+      : OpProtoAndCheckerMaker(proto, op_checker) {
+    AddInput("X", "(Tensor) The float gradient to compress.");
+    AddInput("Residual",
+             "(Tensor) The compression error accumulated in the previous "
+             "steps, with the same shape as X. It must be on CPU.")
+        .AsDispensable();
+    AddOutput("Out", "(Tensor) The 1-D int32 tensor of the packed gradient.");
+    AddOutput("ResidualOut",
+              "(Tensor) The updated residual, the same variable as "
+              "Input(Residual).")
+        .AsDispensable();
+    AddAttr<std::string>("method",
+                         "(string, default fp16) "
+                         "The compression method, fp16, int8 or topk.")
+        .SetDefault("fp16");
+    AddAttr<float>("ratio",
+                   "(float, default 0.01) "
+                   "The ratio of the values kept by the topk method.")
+        .SetDefault(0.01f);
+    AddComment(R"DOC(
+CompressGrad Operator.
+
+Compress a float gradient to reduce the bytes sent to the parameter server.
+The methods are:
+
+fp16: cast the values to float16.
+int8: quantize the values to int8 with one scale, max(|X|) / 127.
+topk: keep the $ratio * numel(X)$ values with the largest magnitudes.
+
+For int8 and topk, the values which are not sent, i.e. the quantization
+error or the values not in the top k, are kept in Residual and added to
+the gradient of the next step. The result is packed into a 1-D int32
+tensor, and is restored by the decompress_grad operator.
+)DOC");
+  }
+};
+
+}  // namespace operators
+}  // namespace paddle
+
+namespace ops = paddle::operators;
+REGISTER_OP_WITHOUT_GRADIENT(compress_grad, ops::CompressGradOp,
+                             ops::CompressGradOpMaker);
+REGISTER_OP_CPU_KERNEL(
+    compress_grad,
+    ops::CompressGradKernel<paddle::platform::CPUDeviceContext, float>);
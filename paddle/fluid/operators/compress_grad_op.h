@@ -0,0 +1,190 @@
+/* Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License. */
+
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstring>
+#include <numeric>
+#include <string>
+#include <vector>
+
+#include "paddle/fluid/framework/op_registry.h"
+#include "paddle/fluid/platform/float16.h"
+
+namespace paddle {
+namespace operators {
+
+// The compressed gradients are packed into 1-D int32 tensors, so that they
+// can be sent as ordinary LoDTensors. The layouts are:
+//   fp16: the float16 values, two in each word.
+//   int8: the float scale, then the int8 values, four in each word.
+//   topk: (index, float value) pairs of the k largest values.
+
+inline int64_t TopKCount(int64_t numel, float ratio) {
+  int64_t k = static_cast<int64_t>(std::ceil(numel * ratio));
+  return std::min(numel, std::max(static_cast<int64_t>(1), k));
+}
+
+inline int64_t CompressedSize(const std::string& method, int64_t numel,
+                              float ratio) {
+  if (method == "fp16") {
+    return (numel + 1) / 2;
+  } else if (method == "int8") {
+    return 1 + (numel + 3) / 4;
+  } else if (method == "topk") {
+    return 2 * TopKCount(numel, ratio);
+  }
+  PADDLE_THROW("Unknown gradient compression method %s", method);
+}
+
+inline int32_t FloatBits(float f) {
+  int32_t bits;
+  std::memcpy(&bits, &f, sizeof(bits));
+  return bits;
+}
+
+inline float BitsFloat(int32_t bits) {
+  float f;
+  std::memcpy(&f, &bits, sizeof(f));
+  return f;
+}
+
+// Compress x into out. When residual is not null, the error of the
+// compression is accumulated in it and added to the next x.
+inline void CompressGrad(const std::string& method, float ratio,
+                         const float* x, int64_t numel, float* residual,
+                         int32_t* out) {
+  if (method == "fp16") {
+    out[CompressedSize(method, numel, ratio) - 1] = 0;
+    auto* halves = reinterpret_cast<uint16_t*>(out);
+    for (int64_t i = 0; i < numel; ++i) {
+      halves[i] = platform::float16(x[i]).x;
+    }
+    return;
+  }
+
+  std::vector<float> buffer;
+  float* v = residual;
+  if (v == nullptr) {
+    buffer.assign(x, x + numel);
+    v = buffer.data();
+  } else {
+    for (int64_t i = 0; i < numel; ++i) {
+      v[i] += x[i];
+    }
+  }
+
+  if (method == "int8") {
+    float max_abs = 0;
+    for (int64_t i = 0; i < numel; ++i) {
+      max_abs = std::max(max_abs, std::fabs(v[i]));
+    }
+    float scale = max_abs / 127;
+    out[0] = FloatBits(scale);
+    out[CompressedSize(method, numel, ratio) - 1] = 0;
+    auto* bytes = reinterpret_cast<int8_t*>(out + 1);
+    for (int64_t i = 0; i < numel; ++i) {
+      float q = scale > 0 ? std::round(v[i] / scale) : 0;
+      q = std::min(127.f, std::max(-127.f, q));
+      bytes[i] = static_cast<int8_t>(q);
+      v[i] -= q * scale;
+    }
+  } else if (method == "topk") {
+    int64_t k = TopKCount(numel, ratio);
+    std::vector<int32_t> idx(numel);
+    std::iota(idx.begin(), idx.end(), 0);
+    std::nth_element(idx.begin(), idx.begin() + (k - 1), idx.end(),
+                     [v](int32_t a, int32_t b) {
+                       return std::fabs(v[a]) > std::fabs(v[b]);
+                     });
+    for (int64_t i = 0; i < k; ++i) {
+      out[2 * i] = idx[i];
+      out[2 * i + 1] = FloatBits(v[idx[i]]);
+      v[idx[i]] = 0;
+    }
+  } else {
+    PADDLE_THROW("Unknown gradient compression method %s", method);
+  }
+}
+
+inline void DecompressGrad(const std::string& method, const int32_t* in,
+                           int64_t in_numel, int64_t numel, float* out) {
+  if (method == "fp16") {
+    auto* halves = reinterpret_cast<const uint16_t*>(in);
+    for (int64_t i = 0; i < numel; ++i) {
+      platform::float16 h;
+      h.x = halves[i];
+      out[i] = static_cast<float>(h);
+    }
+  } else if (method == "int8") {
+    float scale = BitsFloat(in[0]);
+    auto* bytes = reinterpret_cast<const int8_t*>(in + 1);
+    for (int64_t i = 0; i < numel; ++i) {
+      out[i] = bytes[i] * scale;
+    }
+  } else if (method == "topk") {
+    std::fill(out, out + numel, 0.f);
+    for (int64_t i = 0; i < in_numel / 2; ++i) {
+      PADDLE_ENFORCE(in[2 * i] >= 0 && in[2 * i] < numel,
+                     "The index of the top-k value is out of range.");
+      out[in[2 * i]] += BitsFloat(in[2 * i + 1]);
+    }
+  } else {
+    PADDLE_THROW("Unknown gradient compression method %s", method);
+  }
+}
+
+template <typename DeviceContext, typename T>
+class CompressGradKernel : public framework::OpKernel<T> {
+ public:
+  void Compute(const framework::ExecutionContext& ctx) const override {
+    auto* x = ctx.Input<framework::Tensor>("X");
+    auto* out = ctx.Output<framework::Tensor>("Out");
+    auto method = ctx.Attr<std::string>("method");
+    auto ratio = ctx.Attr<float>("ratio");
+
+    // ResidualOut is the same variable as Residual, updated in place.
+    float* residual = nullptr;
+    auto* residual_out = ctx.Output<framework::Tensor>("ResidualOut");
+    if (residual_out != nullptr) {
+      PADDLE_ENFORCE_EQ(residual_out->numel(), x->numel(),
+                        "Residual should have the same size as X.");
+      residual = residual_out->mutable_data<float>(ctx.GetPlace());
+    }
+    CompressGrad(method, ratio, x->data<float>(), x->numel(), residual,
+                 out->mutable_data<int32_t>(ctx.GetPlace()));
+  }
+};
+
+template <typename DeviceContext, typename T>
+class DecompressGradKernel : public framework::OpKernel<T> {
+ public:
+  void Compute(const framework::ExecutionContext& ctx) const override {
+    auto* x = ctx.Input<framework::Tensor>("X");
+    auto* out = ctx.Output<framework::Tensor>("Out");
+    auto method = ctx.Attr<std::string>("method");
+    // the number of the topk values is known from the size of X
+    if (method != "topk") {
+      PADDLE_ENFORCE_EQ(x->numel(), CompressedSize(method, out->numel(), 0),
+                        "The size of X mismatches with Attr(shape).");
+    }
+    DecompressGrad(method, x->data<int32_t>(), x->numel(), out->numel(),
+                   out->mutable_data<float>(ctx.GetPlace()));
+  }
+};
+
+}  // namespace operators
+}  // namespace paddle
@@ -0,0 +1,73 @@
+/* Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License. */
+
+#include "paddle/fluid/operators/compress_grad_op.h"
+
+namespace paddle {
+namespace operators {
+
+class DecompressGradOp : public framework::OperatorWithKernel {
+ public:
+  using framework::OperatorWithKernel::OperatorWithKernel;
+
+ protected:
+  void InferShape(framework::InferShapeContext* ctx) const override {
+    PADDLE_ENFORCE(ctx->HasInput("X"),
+                   "Input(X) of DecompressGradOp should not be null.");
+    PADDLE_ENFORCE(ctx->HasOutput("Out"),
+                   "Output(Out) of DecompressGradOp should not be null.");
+    auto shape = ctx->Attrs().Get<std::vector<int>>("shape");
+    PADDLE_ENFORCE(shape.size() > 0, "Attr(shape) shouldn't be empty.");
+    std::vector<int64_t> shape_int64(shape.begin(), shape.end());
+    ctx->SetOutputDim("Out", framework::make_ddim(shape_int64));
+  }
+
+  framework::OpKernelType GetExpectedKernelType(
+      const framework::ExecutionContext& ctx) const override {
+    return framework::OpKernelType(framework::proto::VarType::FP32,
+                                   platform::CPUPlace());
+  }
+};
+
+class DecompressGradOpMaker : public framework::OpProtoAndCheckerMaker {
+ public:
+  DecompressGradOpMaker(OpProto* proto, OpAttrChecker* op_checker)
+      : OpProtoAndCheckerMaker(proto, op_checker) {
+    AddInput("X",
+             "(Tensor) The 1-D int32 tensor packed by the compress_grad "
+             "operator.");
+    AddOutput("Out", "(Tensor) The restored float gradient.");
+    AddAttr<std::vector<int>>("shape", "(vector<int>) The shape of Out.");
+    AddAttr<std::string>("method",
+                         "(string, default fp16) "
+                         "The compression method, fp16, int8 or topk.")
+        .SetDefault("fp16");
+    AddComment(R"DOC(
+DecompressGrad Operator.
+
+Restore the gradient compressed by the compress_grad operator with the same
+method. For topk, the values not sent are zeros.
+)DOC");
+  }
+};
+
+}  // namespace operators
+}  // namespace paddle
+
+namespace ops = paddle::operators;
+REGISTER_OP_WITHOUT_GRADIENT(decompress_grad, ops::DecompressGradOp,
+                             ops::DecompressGradOpMaker);
+REGISTER_OP_CPU_KERNEL(
+    decompress_grad,
+    ops::DecompressGradKernel<paddle::platform::CPUDeviceContext, float>);
@@ -0,0 +1,77 @@
+/* Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License. */
+
+#pragma once
+
+#include <stdint.h>
+#include <string>
+#include <unordered_map>
+
+namespace paddle {
+namespace operators {
+namespace detail {
+
+/*
+ * Track the staleness of the gradients applied by the parameter server in
+ * the async mode. The staleness of a gradient is the number of the updates
+ * applied to its variable since the previous gradient of the same trainer
+ * was handled. The gradients are named like "var.trainer_0".
+ */
+class GradStaleness {
+ public:
+  // 0 means no bound.
+  explicit GradStaleness(int max_staleness) : max_staleness_(max_staleness) {}
+
+  // Whether to drop the gradient as too stale. A dropped gradient is
+  // recorded as handled, so the next one of the same trainer is compared
+  // with the updates applied after it.
+  bool Drop(const std::string& grad_name) {
+    auto handled = handled_at_.find(grad_name);
+    if (max_staleness_ <= 0 || handled == handled_at_.end()) {
+      return false;
+    }
+    int64_t update_count = updates_[VarName(grad_name)];
+    if (update_count - handled->second <= max_staleness_) {
+      return false;
+    }
+    handled->second = update_count;
+    return true;
+  }
+
+  // Record that the gradient is applied to its variable.
+  void Applied(const std::string& grad_name) {
+    handled_at_[grad_name] = ++updates_[VarName(grad_name)];
+  }
+
+  int64_t Staleness(const std::string& grad_name) {
+    auto handled = handled_at_.find(grad_name);
+    if (handled == handled_at_.end()) return 0;
+    return updates_[VarName(grad_name)] - handled->second;
+  }
+
+ private:
+  static std::string VarName(const std::string& grad_name) {
+    return grad_name.substr(0, grad_name.rfind(".trainer_"));
+  }
+
+  int max_staleness_;
+  // the number of the updates applied to each variable, and the number
+  // when each trainer's previous gradient of it was handled.
+  std::unordered_map<std::string, int64_t> updates_;
+  std::unordered_map<std::string, int64_t> handled_at_;
+};
+
+}  // namespace detail
+}  // namespace operators
+}  // namespace paddle
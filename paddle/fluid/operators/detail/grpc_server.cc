@@ -84,12 +84,13 @@ class RequestGet final : public RequestBase {
   explicit RequestGet(sendrecv::SendRecvService::AsyncService* service,
                       grpc::ServerCompletionQueue* cq, framework::Scope* scope,
                       const platform::DeviceContext* dev_ctx,
-                      SimpleBlockQueue<char>* queue)
+                      SimpleBlockQueue<char>* queue, std::mutex* mutex)
       : RequestBase(service, cq),
         responder_(&ctx_),
         scope_(scope),
         dev_ctx_(dev_ctx),
-        queue_(queue) {
+        queue_(queue),
+        mutex_(mutex) {
     service_->RequestGetVariable(&ctx_, &request_, &responder_, cq_, cq_, this);
   }
 
@@ -101,11 +102,18 @@ class RequestGet final : public RequestBase {
     // proc request.
     std::string var_name = request_.varname();
     auto* var = scope_->FindVar(var_name);
-    SerializeToMessage(var_name, var, *dev_ctx_, &reply_);
+    if (mutex_ != nullptr) {
+      std::lock_guard<std::mutex> lock(*mutex_);
+      SerializeToMessage(var_name, var, *dev_ctx_, &reply_);
+    } else {
+      SerializeToMessage(var_name, var, *dev_ctx_, &reply_);
+    }
     // TODO(gongwb): check var's info.
     responder_.Finish(reply_, grpc::Status::OK, this);
     status_ = FINISH;
-    queue_->Push('c');
+    if (queue_ != nullptr) {
+      queue_->Push('c');
+    }
   }
 
  protected:
@@ -115,6 +123,7 @@ class RequestGet final : public RequestBase {
   framework::Scope* scope_;
   const platform::DeviceContext* dev_ctx_;
   SimpleBlockQueue<char>* queue_;
+  std::mutex* mutex_;
 };
 
 void AsyncGRPCServer::WaitClientGet(int count) {
@@ -183,8 +192,11 @@ void AsyncGRPCServer::TryToRegisterNewGetOne() {
   if (is_shut_down_) {
     return;
   }
-  RequestGet* get = new RequestGet(&service_, cq_get_.get(), scope_, dev_ctx_,
-                                   &var_get_queue_);
+  // nobody waits for the fetches in the async mode
+  RequestGet* get = new RequestGet(
+      &service_, cq_get_.get(), scope_, dev_ctx_,
+      sync_mode_ ? &var_get_queue_ : nullptr,
+      sync_mode_ ? nullptr : &update_mutex_);
   VLOG(4) << "Create RequestGet status:" << get->Status();
 }
 
@@ -204,8 +216,8 @@ void AsyncGRPCServer::HandleRequest(grpc::ServerCompletionQueue* cq,
 
     PADDLE_ENFORCE(tag);
     // FIXME(typhoonzero): de-couple the barriers with recv_op
-    if (cq_name == "cq_get") WaitCond(1);
-    if (cq_name == "cq_send") WaitCond(0);
+    if (sync_mode_ && cq_name == "cq_get") WaitCond(1);
+    if (sync_mode_ && cq_name == "cq_send") WaitCond(0);
 
     RequestBase* base = (RequestBase*)tag;
     // reference:
@@ -25,6 +25,7 @@ limitations under the License. */
 
 #include <grpc++/grpc++.h>
 #include <grpc/support/log.h>
+#include <mutex>
 #include <thread>
 #include "paddle/fluid/operators/detail/sendrecvop_utils.h"
 
@@ -37,7 +38,12 @@ class RequestBase;
 
 class AsyncGRPCServer final : public sendrecv::SendRecvService::Service {
  public:
-  explicit AsyncGRPCServer(const std::string &address) : address_(address) {}
+  // In the sync mode, the variables sent and fetched by the clients are
+  // handled in turns separated by the barriers. In the async mode, they are
+  // handled at any time, and the fetches are serialized with the updates by
+  // UpdateMutex().
+  explicit AsyncGRPCServer(const std::string &address, bool sync_mode = true)
+      : address_(address), sync_mode_(sync_mode) {}
 
   void RunSyncUpdate();
 
@@ -56,6 +62,10 @@ class AsyncGRPCServer final : public sendrecv::SendRecvService::Service {
 
   void ShutDown();
 
+  bool SyncMode() const { return sync_mode_; }
+
+  std::mutex &UpdateMutex() { return update_mutex_; }
+
  protected:
   void HandleRequest(grpc::ServerCompletionQueue *cq, std::string cq_name,
                      std::function<void()> TryToRegisterNewOne);
@@ -73,6 +83,7 @@ class AsyncGRPCServer final : public sendrecv::SendRecvService::Service {
   std::unique_ptr<grpc::Server> server_;
 
   std::string address_;
+  bool sync_mode_;
   framework::Scope *scope_;
   const platform::DeviceContext *dev_ctx_;
   // received variable from RPC, operators fetch variable from this queue.
@@ -84,6 +95,9 @@ class AsyncGRPCServer final : public sendrecv::SendRecvService::Service {
   mutable int barrier_cond_step_;
   std::condition_variable barrier_condition_;
 
+  // held while the variables are updated or fetched in the async mode
+  std::mutex update_mutex_;
+
   std::unique_ptr<std::thread> t_send_;
   std::unique_ptr<std::thread> t_get_;
 };
@@ -0,0 +1,54 @@
+/* Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License. */
+
+#include "paddle/fluid/operators/detail/grad_staleness.h"
+#include "gtest/gtest.h"
+
+using paddle::operators::detail::GradStaleness;
+
+TEST(GradStaleness, DropStale) {
+  GradStaleness staleness(2);
+  // the first grad of a trainer is never dropped
+  EXPECT_FALSE(staleness.Drop("w.trainer_0"));
+  staleness.Applied("w.trainer_0");
+  EXPECT_FALSE(staleness.Drop("w.trainer_1"));
+  staleness.Applied("w.trainer_1");
+
+  // trainer 1 applies two more grads of w, and one of another var
+  for (int i = 0; i < 2; ++i) {
+    EXPECT_FALSE(staleness.Drop("w.trainer_1"));
+    staleness.Applied("w.trainer_1");
+  }
+  staleness.Applied("b.trainer_1");
+  EXPECT_EQ(3, staleness.Staleness("w.trainer_0"));
+  EXPECT_EQ(0, staleness.Staleness("w.trainer_1"));
+
+  // 3 updates of w since the previous grad of trainer 0
+  EXPECT_TRUE(staleness.Drop("w.trainer_0"));
+  // the dropped grad is handled, so the next one is fresh
+  EXPECT_EQ(0, staleness.Staleness("w.trainer_0"));
+  EXPECT_FALSE(staleness.Drop("w.trainer_0"));
+  staleness.Applied("w.trainer_0");
+  EXPECT_EQ(1, staleness.Staleness("w.trainer_1"));
+}
+
+TEST(GradStaleness, NoBound) {
+  GradStaleness staleness(0);
+  staleness.Applied("w.trainer_0");
+  for (int i = 0; i < 100; ++i) {
+    staleness.Applied("w.trainer_1");
+  }
+  EXPECT_EQ(100, staleness.Staleness("w.trainer_0"));
+  EXPECT_FALSE(staleness.Drop("w.trainer_0"));
+}
@@ -14,8 +14,10 @@ limitations under the License. */
 
 #include <stdint.h>
 #include <sys/stat.h>
+#include <mutex>
 #include <ostream>
 #include <thread>
+#include <unordered_map>
 
 #include <unistd.h>
 
@@ -24,6 +26,7 @@ limitations under the License. */
 #include "paddle/fluid/framework/lod_tensor.h"
 #include "paddle/fluid/framework/op_registry.h"
 #include "paddle/fluid/framework/proto_desc.h"
+#include "paddle/fluid/operators/detail/grad_staleness.h"
 #include "paddle/fluid/operators/detail/grpc_server.h"
 #include "paddle/fluid/operators/detail/sendrecvop_utils.h"
 #include "paddle/fluid/operators/detail/simple_block_queue.h"
@@ -62,7 +65,8 @@ class ListenAndServOp : public framework::OperatorBase {
       : OperatorBase(type, inputs, outputs, attrs) {
     if (!rpc_service_) {
       std::string endpoint = Attr<std::string>("endpoint");
-      rpc_service_.reset(new detail::AsyncGRPCServer(endpoint));
+      rpc_service_.reset(
+          new detail::AsyncGRPCServer(endpoint, Attr<bool>("sync_mode")));
       server_thread_.reset(new std::thread(RunServer, rpc_service_));
     }
   }
@@ -91,6 +95,11 @@ class ListenAndServOp : public framework::OperatorBase {
     auto *program = block->Program();
     framework::Executor executor(dev_place);
 
+    if (!Attr<bool>("sync_mode")) {
+      RunAsyncLoop(&executor, program, block, &recv_scope, dev_ctx);
+      return;
+    }
+
     // TODO(typhoonzero): change this to a while_op for every cluster-batch.
     bool exit_flag = false;
     // Record received sparse variables, so that
@@ -152,6 +161,76 @@ class ListenAndServOp : public framework::OperatorBase {
   }
 
  protected:
+  // Apply the gradients of each trainer as soon as they arrive, by running
+  // the block of each gradient in grad_to_block_id. The OptimizeBlock is run
+  // once every Fanin batch barriers.
+  void RunAsyncLoop(framework::Executor *executor,
+                    framework::ProgramDesc *program,
+                    framework::BlockDesc *block, framework::Scope *recv_scope,
+                    const platform::DeviceContext &dev_ctx) const {
+    auto fan_in = Attr<int>("Fanin");
+
+    std::unordered_map<std::string,
+                       std::unique_ptr<framework::ExecutorPrepareContext>>
+        grad_to_ctx;
+    for (auto &grad_and_id : Attr<std::vector<std::string>>(
+             "grad_to_block_id")) {
+      auto pos = grad_and_id.rfind(':');
+      PADDLE_ENFORCE(pos != std::string::npos,
+                     "grad_to_block_id should be like grad_name:block_id");
+      int block_id = std::stoi(grad_and_id.substr(pos + 1));
+      grad_to_ctx[grad_and_id.substr(0, pos)] =
+          framework::Executor::Prepare(*program, block_id);
+    }
+    auto optimize_ctx = framework::Executor::Prepare(*program, block->ID());
+
+    detail::GradStaleness staleness(Attr<int>("max_staleness"));
+    int batch_barrier = 0;
+    while (true) {
+      const detail::MessageWithName &v = rpc_service_->Get();
+      auto recv_var_name = v.first;
+      if (recv_var_name == LISTEN_TERMINATE_MESSAGE) {
+        LOG(INFO) << "received terminate message and exit";
+        rpc_service_->ShutDown();
+        break;
+      } else if (recv_var_name == BATCH_BARRIER_MESSAGE) {
+        VLOG(3) << "recv batch barrier message";
+        if (++batch_barrier == fan_in) {
+          batch_barrier = 0;
+          std::lock_guard<std::mutex> lock(rpc_service_->UpdateMutex());
+          executor->RunPreparedContext(optimize_ctx.get(), recv_scope, false,
+                                       false);
+        }
+        continue;
+      }
+
+      VLOG(3) << "received grad: " << recv_var_name;
+      auto it = grad_to_ctx.find(recv_var_name);
+      auto *var = recv_scope->FindVar(recv_var_name);
+      if (var == nullptr || it == grad_to_ctx.end()) {
+        LOG(ERROR) << "Can not find server side var: " << recv_var_name;
+        PADDLE_THROW("Can not find server side var");
+      }
+      if (staleness.Drop(recv_var_name)) {
+        VLOG(3) << "drop stale grad: " << recv_var_name;
+        continue;
+      }
+
+      detail::DeserializeFromMessage(v.second, dev_ctx, var);
+      try {
+        std::lock_guard<std::mutex> lock(rpc_service_->UpdateMutex());
+        executor->RunPreparedContext(it->second.get(), recv_scope, false,
+                                     false);
+      } catch (std::exception &e) {
+        LOG(ERROR) << "run sub program error " << e.what();
+      }
+      if (var->IsType<framework::SelectedRows>()) {
+        var->GetMutable<framework::SelectedRows>()->mutable_rows()->clear();
+      }
+      staleness.Applied(recv_var_name);
+    }
+  }
+
   std::shared_ptr<detail::AsyncGRPCServer> rpc_service_;
   std::shared_ptr<std::thread> server_thread_;
 };
@@ -176,6 +255,25 @@ from send_op and send back variables to recv_op.
                                     "BlockID to run on server side.");
     AddAttr<int>("Fanin", "How many clients send to this server.")
         .SetDefault(1);
+    AddAttr<bool>("sync_mode",
+                  "(bool, default true) "
+                  "Whether to run OptimizeBlock after the gradients of all "
+                  "the clients arrive. If false, each gradient is applied "
+                  "when it arrives by the block in grad_to_block_id.")
+        .SetDefault(true);
+    AddAttr<std::vector<std::string>>(
+        "grad_to_block_id",
+        "(vector<string>, default empty) "
+        "The blocks to apply the gradients in the async mode, as strings "
+        "like grad_name:block_id.")
+        .SetDefault({});
+    AddAttr<int>("max_staleness",
+                 "(int, default 0) "
+                 "In the async mode, drop a gradient if more than "
+                 "max_staleness updates were applied to the same variable "
+                 "since the previous gradient of the same client. 0 means "
+                 "no bound.")
+        .SetDefault(0);
   }
 };
 
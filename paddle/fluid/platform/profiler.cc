@@ -13,6 +13,7 @@ See the License for the specific language governing permissions and
 limitations under the License. */
 
 #include "paddle/fluid/platform/profiler.h"
+#include <fstream>
 #include <iomanip>
 #include <map>
 #include "glog/logging.h"
@@ -47,8 +48,13 @@ inline uint64_t GetTimeInNsec() {
 }
 
 Event::Event(EventKind kind, std::string name, uint32_t thread_id,
-             const DeviceContext* dev_ctx)
-    : kind_(kind), name_(name), thread_id_(thread_id), has_cuda_(false) {
+             const DeviceContext* dev_ctx, int32_t block_id, int64_t value)
+    : kind_(kind),
+      name_(name),
+      thread_id_(thread_id),
+      block_id_(block_id),
+      value_(value),
+      has_cuda_(false) {
 #ifdef PADDLE_WITH_CUDA
   has_cuda_ = dev_ctx ? platform::is_gpu_place(dev_ctx->GetPlace()) : false;
   if (has_cuda_) {
@@ -70,6 +76,8 @@ std::string Event::kind() const {
       return "push";
     case EventKind::kPopRange:
       return "pop";
+    case EventKind::kCounter:
+      return "counter";
   }
   PADDLE_THROW("Unknown EventKind.");
 }
@@ -118,20 +126,30 @@ void Mark(const std::string& name, const DeviceContext* dev_ctx) {
   GetEventList().Record(EventKind::kMark, name, g_thread_id, dev_ctx);
 }
 
-void PushEvent(const std::string& name, const DeviceContext* dev_ctx) {
-  GetEventList().Record(EventKind::kPushRange, name, g_thread_id, dev_ctx);
+void PushEvent(const std::string& name, const DeviceContext* dev_ctx,
+               int32_t block_id) {
+  GetEventList().Record(EventKind::kPushRange, name, g_thread_id, dev_ctx,
+                        block_id);
 }
 
 void PopEvent(const std::string& name, const DeviceContext* dev_ctx) {
   GetEventList().Record(EventKind::kPopRange, name, g_thread_id, dev_ctx);
 }
 
-RecordEvent::RecordEvent(const std::string& name,
-                         const DeviceContext* dev_ctx) {
+void RecordCounter(const std::string& name, int64_t value) {
+  if (g_state == ProfilerState::kDisabled) return;
+  GetEventList().Record(EventKind::kCounter, name, g_thread_id, nullptr, -1,
+                        value);
+}
+
+bool IsProfileEnabled() { return g_state != ProfilerState::kDisabled; }
+
+RecordEvent::RecordEvent(const std::string& name, const DeviceContext* dev_ctx,
+                         int32_t block_id) {
   if (g_state == ProfilerState::kDisabled) return;
   dev_ctx_ = dev_ctx;
   name_ = name;
-  PushEvent(name_, dev_ctx_);
+  PushEvent(name_, dev_ctx_, block_id);
 }
 
 RecordEvent::~RecordEvent() {
@@ -183,7 +201,8 @@ std::vector<std::vector<Event>> GetAllEvents() {
   return result;
 }
 
-void DisableProfiler(EventSortingKey sorted_key) {
+void DisableProfiler(EventSortingKey sorted_key,
+                     const std::string& trace_path) {
   PADDLE_ENFORCE(g_state != ProfilerState::kDisabled,
                  "Can't disable profiling, since it's not starting.");
   // Mark the profiling stop.
@@ -191,10 +210,96 @@ void DisableProfiler(EventSortingKey sorted_key) {
   g_state = ProfilerState::kDisabled;
 
   std::vector<std::vector<Event>> all_events = GetAllEvents();
+  if (!trace_path.empty()) {
+    WriteChromeTrace(all_events, trace_path);
+  }
   ParseEvents(all_events, sorted_key);
   ResetProfiler();
 }
 
+static std::string EscapeJson(const std::string& str) {
+  std::string escaped;
+  for (char c : str) {
+    if (c == '"' || c == '\\') {
+      escaped += '\\';
+      escaped += c;
+    } else if (static_cast<unsigned char>(c) < 0x20) {
+      escaped += ' ';
+    } else {
+      escaped += c;
+    }
+  }
+  return escaped;
+}
+
+void WriteChromeTrace(const std::vector<std::vector<Event>>& events,
+                      const std::string& trace_path) {
+  std::ofstream out(trace_path);
+  PADDLE_ENFORCE(out.is_open(), "Cannot open %s to write the trace",
+                 trace_path);
+
+  // The timestamps are in microseconds since the first event.
+  int64_t start_ns = -1;
+  for (auto& thread_events : events) {
+    for (auto& event : thread_events) {
+      if (start_ns < 0 || event.cpu_ns() < start_ns) {
+        start_ns = event.cpu_ns();
+      }
+    }
+  }
+  auto us = [start_ns](int64_t ns) { return (ns - start_ns) / 1000.0; };
+
+  out << std::fixed << std::setprecision(3);
+  out << "{\"traceEvents\": [";
+  bool first = true;
+  auto begin_record = [&]() {
+    out << (first ? "\n" : ",\n");
+    first = false;
+  };
+  for (auto& thread_events : events) {
+    std::list<const Event*> pushed_events;
+    for (auto& event : thread_events) {
+      if (event.kind() == "push") {
+        pushed_events.push_back(&event);
+      } else if (event.kind() == "pop") {
+        auto rit = pushed_events.rbegin();
+        while (rit != pushed_events.rend() &&
+               (*rit)->name() != event.name()) {
+          ++rit;
+        }
+        if (rit == pushed_events.rend()) continue;
+        const Event& push = **rit;
+        double dur_ms = (g_profiler_place == "CUDA" && push.has_cuda())
+                            ? push.CudaElapsedMs(event)
+                            : push.CpuElapsedMs(event);
+        begin_record();
+        out << "{\"name\": \"" << EscapeJson(push.name())
+            << "\", \"cat\": \"" << (push.block_id() >= 0 ? "op" : "span")
+            << "\", \"ph\": \"X\", \"pid\": 0, \"tid\": "
+            << push.thread_id() << ", \"ts\": " << us(push.cpu_ns())
+            << ", \"dur\": " << dur_ms * 1000.0;
+        if (push.block_id() >= 0) {
+          out << ", \"args\": {\"block_id\": " << push.block_id() << "}";
+        }
+        out << "}";
+        pushed_events.erase((++rit).base());
+      } else if (event.kind() == "counter") {
+        begin_record();
+        out << "{\"name\": \"" << EscapeJson(event.name())
+            << "\", \"ph\": \"C\", \"pid\": 0, \"tid\": "
+            << event.thread_id() << ", \"ts\": " << us(event.cpu_ns())
+            << ", \"args\": {\"bytes\": " << event.value() << "}}";
+      } else {
+        begin_record();
+        out << "{\"name\": \"" << EscapeJson(event.name())
+            << "\", \"ph\": \"i\", \"s\": \"g\", \"pid\": 0, \"tid\": "
+            << event.thread_id() << ", \"ts\": " << us(event.cpu_ns()) << "}";
+      }
+    }
+  }
+  out << "\n], \"displayTimeUnit\": \"ms\"}\n";
+}
+
 void ParseEvents(std::vector<std::vector<Event>>& events,
                  EventSortingKey sorted_by) {
   if (g_profiler_place == "") return;
@@ -16,25 +16,32 @@ limitations under the License. */
 #include <forward_list>
 #include <list>
 #include <mutex>
+#include <string>
 #include <vector>
 #include "paddle/fluid/platform/device_context.h"
 
 namespace paddle {
 namespace platform {
 
-enum EventKind { kMark, kPushRange, kPopRange };
+enum EventKind { kMark, kPushRange, kPopRange, kCounter };
 
 class Event {
  public:
   // The DeviceContext is used to get the cuda stream.
   // If CPU profiling mode, can pass nullptr.
+  // The block_id is the index of the block an operator event belongs to,
+  // -1 for the others. The value is the value of a counter event.
   Event(EventKind kind, std::string name, uint32_t thread_id,
-        const DeviceContext* dev_ctx);
+        const DeviceContext* dev_ctx, int32_t block_id = -1,
+        int64_t value = 0);
 
   std::string kind() const;
   std::string name() const { return name_; }
   uint32_t thread_id() const { return thread_id_; }
   bool has_cuda() const { return has_cuda_; }
+  int64_t cpu_ns() const { return cpu_ns_; }
+  int32_t block_id() const { return block_id_; }
+  int64_t value() const { return value_; }
 
 #ifdef PADDLE_WITH_CUDA
   cudaEvent_t event() const { return event_; }
@@ -49,6 +56,8 @@ class Event {
   std::string name_;
   uint32_t thread_id_;
   int64_t cpu_ns_;
+  int32_t block_id_;
+  int64_t value_;
   bool has_cuda_;
 #ifdef PADDLE_WITH_CUDA
   cudaEvent_t event_ = nullptr;
@@ -97,12 +106,21 @@ enum ProfilerState {
 
 void Mark(const std::string& name, const DeviceContext* dev_ctx);
 
-void PushEvent(const std::string& name, const DeviceContext* dev_ctx);
+void PushEvent(const std::string& name, const DeviceContext* dev_ctx,
+               int32_t block_id = -1);
 
 void PopEvent(const std::string& name, const DeviceContext* dev_ctx);
 
+// Record the value of a counter, e.g. the memory used, if the profiler is
+// enabled.
+void RecordCounter(const std::string& name, int64_t value);
+
+// Whether the profiler is enabled.
+bool IsProfileEnabled();
+
 struct RecordEvent {
-  explicit RecordEvent(const std::string& name, const DeviceContext* dev_ctx);
+  explicit RecordEvent(const std::string& name, const DeviceContext* dev_ctx,
+                       int32_t block_id = -1);
 
   ~RecordEvent();
 
@@ -135,7 +153,15 @@ void EnableProfiler(ProfilerState state);
 // Clear the g_all_event_lists, which is total event lists of all threads.
 void ResetProfiler();
 
-void DisableProfiler(EventSortingKey sorted_key);
+// Disable the profiler and print the report. If trace_path is not empty,
+// the events are also written to it in the Chrome trace format, which can
+// be viewed by chrome://tracing.
+void DisableProfiler(EventSortingKey sorted_key,
+                     const std::string& trace_path = "");
+
+// Write the events in the Chrome trace format.
+void WriteChromeTrace(const std::vector<std::vector<Event>>& events,
+                      const std::string& trace_path);
 
 // Parse the event list and output the profiling report
 void ParseEvents(std::vector<std::vector<Event>>&,
@@ -229,7 +229,8 @@ All parameter, weight, gradient are variables in Paddle.
       .def(py::init<>())
       .def("new_scope", [](Scope &self) -> Scope * { return &self.NewScope(); },
            py::return_value_policy::reference)
-      .def("drop_kids", &Scope::DropKids);
+      .def("drop_kids", &Scope::DropKids)
+      .def("kids_num", &Scope::KidsNum);
 
   //! @note: Be careful! PyBind will return std::string as an unicode, not
   //! Python str. If you want a str object, you should cast them in Python.
@@ -399,11 +400,21 @@ All parameter, weight, gradient are variables in Paddle.
              self.set_falsenet(net.Clone());
            });
 
+  py::class_<framework::ExecutorPrepareContext>(m, "ExecutorPrepareContext")
+      .def("reset_local_scope", &ExecutorPrepareContext::ResetLocalScope);
+
   py::class_<framework::Executor>(m, "Executor")
       .def(py::init<const platform::Place &>())
       .def("run",
            (void (Executor::*)(const ProgramDesc &, Scope *, int, bool, bool)) &
-               Executor::Run);
+               Executor::Run)
+      .def("prepare",
+           [](Executor &self, const ProgramDesc &program, int block_id) {
+             return Executor::Prepare(program, block_id);
+           },
+           py::keep_alive<0, 2>())
+      .def("run_prepared_ctx", &Executor::RunPreparedContext)
+      .def("set_inter_op_threads", &Executor::SetInterOpThreads);
 
   m.def("init_gflags", framework::InitGflags);
   m.def("init_glog", framework::InitGLOG);
@@ -473,6 +484,13 @@ All parameter, weight, gradient are variables in Paddle.
   m.def("enable_profiler", platform::EnableProfiler);
   m.def("disable_profiler", platform::DisableProfiler);
   m.def("reset_profiler", platform::ResetProfiler);
+  m.def("is_profiler_enabled", platform::IsProfileEnabled);
+  m.def("push_event", [](const std::string &name) {
+    if (platform::IsProfileEnabled()) platform::PushEvent(name, nullptr);
+  });
+  m.def("pop_event", [](const std::string &name) {
+    if (platform::IsProfileEnabled()) platform::PopEvent(name, nullptr);
+  });
   return m.ptr();
 }
 }  // namespace pybind
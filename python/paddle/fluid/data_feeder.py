@@ -22,22 +22,31 @@ from framework import Variable, default_main_program
 __all__ = ['DataFeeder']
 
 
+def _is_fixed_shape(shape):
+    # only the first dimension, i.e. the batch size, is unknown
+    return len(shape) > 1 and shape[0] < 0 and all(s > 0 for s in shape[1:])
+
+
+def convert_dtype(dtype):
+    if dtype == core.VarDesc.VarType.FP32:
+        return 'float32'
+    elif dtype == core.VarDesc.VarType.INT64:
+        return 'int64'
+    elif dtype == core.VarDesc.VarType.FP64:
+        return 'float64'
+    elif dtype == core.VarDesc.VarType.INT32:
+        return 'int32'
+    else:
+        raise ValueError("dtype must be any of [int32, float32, int64, "
+                         "float64]")
+
+
 class DataToLoDTensorConverter(object):
     def __init__(self, place, lod_level, shape, dtype):
         self.place = place
         self.lod_level = lod_level
         self.shape = shape
-        if dtype == core.VarDesc.VarType.FP32:
-            self.dtype = 'float32'
-        elif dtype == core.VarDesc.VarType.INT64:
-            self.dtype = 'int64'
-        elif dtype == core.VarDesc.VarType.FP64:
-            self.dtype = 'float64'
-        elif dtype == core.VarDesc.VarType.INT32:
-            self.dtype = 'int32'
-        else:
-            raise ValueError("dtype must be any of [int32, float32, int64, "
-                             "float64]")
+        self.dtype = convert_dtype(dtype)
 
         self.data = []
         self.lod = []
@@ -66,8 +75,98 @@ class DataToLoDTensorConverter(object):
         return t
 
 
+class BatchedDataToLoDTensorConverter(object):
+    """
+    Convert the samples of a slot whose shape is fixed except for the batch
+    size dimension. Samples are written straight into a preallocated numpy
+    buffer, which is reused between batches and grows when a batch does not
+    fit. The LoD of a sequence slot is computed by numpy.cumsum.
+
+    Only lod_level 0 and 1 are supported. The converter is reset by done(),
+    so one instance can convert many batches.
+    """
+
+    def __init__(self, place, lod_level, shape, dtype, capacity=64):
+        if lod_level not in (0, 1):
+            raise ValueError("lod_level must be 0 or 1")
+        self.place = place
+        self.lod_level = lod_level
+        self.shape = shape
+        self.dtype = convert_dtype(dtype)
+        self.sample_shape = tuple(shape[1:])
+        self.sample_size = int(numpy.prod(self.sample_shape))
+        self.buffer = numpy.empty(
+            (max(capacity, 1), ) + self.sample_shape, dtype=self.dtype)
+        self.reset()
+
+    def reset(self):
+        self.size = 0
+        self.seq_lens = []
+
+    def _reserve(self, size):
+        capacity = len(self.buffer)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        buf = numpy.empty((capacity, ) + self.sample_shape, dtype=self.dtype)
+        buf[:self.size] = self.buffer[:self.size]
+        self.buffer = buf
+
+    def feed(self, data):
+        if self.lod_level == 0:
+            self._reserve(self.size + 1)
+            # a flattened sample, e.g. an image fed to a [C, H, W] slot, is
+            # accepted, but not one broadcast from fewer elements.
+            data = numpy.ravel(data)
+            if data.size != self.sample_size:
+                raise ValueError(
+                    "The sample has %d elements, while the slot of shape %s "
+                    "expects %d" %
+                    (data.size, list(self.shape), self.sample_size))
+            self.buffer[self.size].reshape(-1)[...] = data
+            self.size += 1
+        else:
+            seq = numpy.asarray(
+                data, dtype=self.dtype).reshape((-1, ) + self.sample_shape)
+            seq_len = len(seq)
+            self._reserve(self.size + seq_len)
+            self.buffer[self.size:self.size + seq_len] = seq
+            self.size += seq_len
+            self.seq_lens.append(seq_len)
+
+    def done(self):
+        arr = self.buffer[:self.size].reshape(self.shape)
+        t = core.LoDTensor()
+        # LoDTensor.set copies the data, so the buffer can be reused.
+        t.set(arr, self.place)
+        if self.lod_level > 0:
+            lod = numpy.zeros(len(self.seq_lens) + 1, dtype='int64')
+            numpy.cumsum(self.seq_lens, out=lod[1:])
+            t.set_lod([lod.tolist()])
+        self.reset()
+        return t
+
+
 class DataFeeder(object):
-    def __init__(self, feed_list, place, program=None):
+    """
+    Convert the samples of a mini-batch to a dict of {name: LoDTensor},
+    which can be fed to Executor.run.
+
+    Args:
+        feed_list(list): the variables, or the names of the variables, to
+            feed. The order of the slots in each sample must match it.
+        place(core.CPUPlace|core.CUDAPlace): the place of the tensors.
+        program(Program|None): the program to find the variables by name.
+            If None, default_main_program() will be used.
+        batched(bool): whether to convert the slots whose shape is fixed
+            with BatchedDataToLoDTensorConverter. The batched converters
+            keep their buffers between calls of feed, so a DataFeeder
+            should not be used by several threads at the same time when
+            batched is True.
+    """
+
+    def __init__(self, feed_list, place, program=None, batched=True):
         self.feed_dtypes = []
         self.feed_names = []
         self.feed_shapes = []
@@ -94,17 +193,34 @@ class DataFeeder(object):
             self.feed_shapes.append(shape)
 
         self.place = place
+        self.batched_converters = {}
+        if batched:
+            for i, (lod_level, shape, dtype) in enumerate(
+                    six.zip(self.feed_lod_level, self.feed_shapes,
+                            self.feed_dtypes)):
+                if _is_fixed_shape(shape) and lod_level <= 1:
+                    self.batched_converters[i] = \
+                        BatchedDataToLoDTensorConverter(
+                            place=self.place,
+                            lod_level=lod_level,
+                            shape=shape,
+                            dtype=dtype)
 
     def feed(self, iterable):
         converter = []
-        for lod_level, shape, dtype in six.zip(
-                self.feed_lod_level, self.feed_shapes, self.feed_dtypes):
-            converter.append(
-                DataToLoDTensorConverter(
+        for i, (lod_level, shape, dtype) in enumerate(
+                six.zip(self.feed_lod_level, self.feed_shapes,
+                        self.feed_dtypes)):
+            if i in self.batched_converters:
+                each_converter = self.batched_converters[i]
+                each_converter.reset()
+            else:
+                each_converter = DataToLoDTensorConverter(
                     place=self.place,
                     lod_level=lod_level,
                     shape=shape,
-                    dtype=dtype))
+                    dtype=dtype)
+            converter.append(each_converter)
 
         for each_sample in iterable:
             assert len(each_sample) == len(converter), (
@@ -22,6 +22,22 @@ import math
 from . import core
 
 
+GRAD_COMPRESSION_METHODS = ["fp16", "int8", "topk"]
+
+
+def _compressed_size(method, numel, topk_ratio):
+    """
+    The size of the int32 tensor packed by compress_grad_op, see
+    paddle/fluid/operators/compress_grad_op.h
+    """
+    if method == "fp16":
+        return (numel + 1) / 2
+    elif method == "int8":
+        return 1 + (numel + 3) / 4
+    k = min(numel, max(1, int(math.ceil(numel * topk_ratio))))
+    return 2 * k
+
+
 class VarBlock:
     def __init__(self, varname, offset, size):
         self.varname = varname
@@ -137,7 +153,13 @@ class DistributeTranspiler:
                   program=None,
                   pservers="127.0.0.1:6174",
                   trainers=1,
-                  split_method=round_robin):
+                  split_method=round_robin,
+                  fuse_grad_size_mb=0,
+                  grad_compression=None,
+                  topk_ratio=0.01,
+                  sync_mode=True,
+                  max_staleness=0,
+                  startup_program=None):
         """
             Transpile the program to distributed data-parallelism programs.
             The main_program will be transformed to use a remote parameter server
@@ -153,13 +175,22 @@ class DistributeTranspiler:
             3. modify trainer program add split_op to each grad variable.
             4. append send_op to send splited variables to server and fetch
                params(splited blocks or origin param) from server.
+               If fuse_grad_size_mb > 0, small grad blocks sent to the same
+               server are flattened and concatenated into fused buffers
+               first, and the params are fetched by a separate recv_op.
+               If grad_compression is set, compress_grad_op is appended to
+               compress each grad before it is sent.
             5. append concat_op to merge splited blocks to update local weights.
 
             Steps to transpile pserver:
             1. create new program for parameter server.
             2. create params and grad variables that assigned to current server instance.
-            3. create a sub-block in the server side program
-            4. append ops that should run on current server instance.
+            3. create a sub-block in the server side program, and append
+               decompress_grad_op, split_op and reshape_op to it to restore
+               the compressed and fused grads.
+            4. append ops that should run on current server instance. In the
+               async mode, the optimize ops of the grads received from each
+               trainer are put into a block of their own.
             5. add listen_and_serv op
 
             :param optimize_ops: op list of optimization, should be the
@@ -176,14 +207,49 @@ class DistributeTranspiler:
             :param trainers: total number of workers/trainers in the job
             :type trainers: int
             :param split_method: A function to determin how to split variables
-                to different servers equally.
+                to different servers equally, e.g. round_robin, or
+                size_balanced and SizeBalanced which balance the bytes and
+                the optimizer FLOPs of the servers.
             :type split_method: function
+            :param fuse_grad_size_mb: the max size in MB of a fused grad
+                buffer. The float32 dense grad blocks smaller than it which
+                are sent to the same server are packed into fused buffers,
+                so that they are sent by one RPC. 0 disables the fusion.
+            :type fuse_grad_size_mb: float
+            :param grad_compression: the method to compress the float32
+                dense grads sent to the servers, None for no compression.
+                "fp16" casts the grads to float16, "int8" quantizes them to
+                int8, and "topk" only sends the topk_ratio of the values
+                with the largest magnitudes. The error of int8 and topk is
+                kept on the trainer and added to the grads of the next step.
+            :type grad_compression: string
+            :param topk_ratio: the ratio of the values sent by "topk".
+            :type topk_ratio: float
+            :param sync_mode: if False, the servers apply the grads of each
+                trainer as soon as they arrive instead of waiting for all
+                the trainers, and the trainers fetch the latest params
+                without waiting for the others.
+            :type sync_mode: bool
+            :param max_staleness: in the async mode, a server drops a grad
+                if more than max_staleness updates were applied to the same
+                variable since the previous grad of the same trainer.
+                0 means no bound. It should be at least trainers - 1.
+            :type max_staleness: int
+            :param startup_program: the startup program of program, to which
+                the ops initializing the vars created by the transpiler are
+                appended, default is default_startup_program
+            :type startup_program: Program
         """
         assert (callable(split_method))
         if program is None:
             program = default_main_program()
+        if startup_program is None:
+            startup_program = default_startup_program()
         self.program = program
+        self.startup_program = startup_program
         self.trainers = trainers
+        self.sync_mode = sync_mode
+        self.max_staleness = max_staleness
         self.optimize_ops = optimize_ops
         # TODO(typhoonzero): currently trainer_id is fetched from cluster system
         # like Kubernetes, we should port this to use etcd later when developing
@@ -228,14 +294,44 @@ class DistributeTranspiler:
             persistable=True,
             type=core.VarDesc.VarType.RAW)
 
-        # create send_op
-        program.global_block().append_op(
-            type="send",
-            inputs={"X": send_inputs},
-            outputs={"Out": send_outputs,
-                     "RPCClient": rpc_client_var},
-            attrs={"endpoints": pserver_endpoints,
-                   "epmap": eplist})
+        send_vars, send_eplist = send_inputs, eplist
+        # pack the small grad blocks of each endpoint into fused buffers
+        self.fused_grad_mapping = dict()
+        fuse_grad_size = int(fuse_grad_size_mb * 1024 * 1024)
+        if fuse_grad_size > 0:
+            send_vars, send_eplist = self._append_fuse_op(
+                program, send_inputs, eplist, pserver_endpoints,
+                fuse_grad_size)
+        # compress the grads right before sending them
+        self.compressed_grad_mapping = dict()
+        if grad_compression is not None:
+            send_vars = self._append_compress_op(
+                program, send_vars, send_eplist, grad_compression, topk_ratio)
+
+        if fuse_grad_size > 0:
+            # the grads and params are not one to one any more, so fetch
+            # the params by a recv_op which has its own epmap.
+            program.global_block().append_op(
+                type="send",
+                inputs={"X": send_vars},
+                outputs={"Out": [],
+                         "RPCClient": rpc_client_var},
+                attrs={"endpoints": pserver_endpoints,
+                       "epmap": send_eplist})
+            program.global_block().append_op(
+                type="recv",
+                inputs={},
+                outputs={"Out": send_outputs},
+                attrs={"epmap": eplist})
+        else:
+            # create send_op
+            program.global_block().append_op(
+                type="send",
+                inputs={"X": send_vars},
+                outputs={"Out": send_outputs,
+                         "RPCClient": rpc_client_var},
+                attrs={"endpoints": pserver_endpoints,
+                       "epmap": eplist})
         # step4
         for varname, splited_var in param_var_mapping.iteritems():
             if len(splited_var) <= 1:
@@ -289,6 +385,14 @@ class DistributeTranspiler:
                 print("create per trainer var: ", var.name)
         # step3
         optimize_block = pserver_program.create_block(0)
+        # restore the compressed grads and unpack the fused grads to the per
+        # trainer grad vars before they are merged and optimized.
+        if self.sync_mode:
+            for orig_name, shape in self.compressed_grad_mapping.get(endpoint,
+                                                                     []):
+                self._append_decompress_op(optimize_block, orig_name, shape)
+            for fused_name, grads in self.fused_grad_mapping.get(endpoint, []):
+                self._append_unfuse_op(optimize_block, fused_name, grads)
         # step 4
         # Create a union-find data struct from optimize ops,
         # If two ops are connected, we could add these two ops
@@ -308,11 +412,20 @@ class DistributeTranspiler:
         for _, op in enumerate(self.optimize_ops):
             for _, opt_op in enumerate(opt_op_on_pserver):
                 if ufind.is_connected(op, opt_op):
-                    if self._is_opt_op(op):
-                        self._append_pserver_ops(optimize_block, op, endpoint)
-                    else:
+                    if not self._is_opt_op(op):
                         self._append_pserver_non_opt_ops(optimize_block, op)
+                    elif self.sync_mode:
+                        self._append_pserver_ops(optimize_block, op, endpoint)
                     break
+        # step 4.4
+        # In the async mode, create a block for each var received from each
+        # trainer, which applies the grads in it as soon as it arrives. The
+        # optimize block only keeps the non-optimize ops, such as learning
+        # rate decay, and is run once every `trainers` batch barriers.
+        grad_to_block_id = []
+        if not self.sync_mode:
+            grad_to_block_id = self._append_async_blocks(
+                pserver_program, endpoint, opt_op_on_pserver)
         # step5 append the listen_and_serv op
         pserver_program.global_block().append_op(
             type="listen_and_serv",
@@ -321,7 +434,10 @@ class DistributeTranspiler:
             attrs={
                 "OptimizeBlock": optimize_block,
                 "endpoint": endpoint,
-                "Fanin": self.trainers
+                "Fanin": self.trainers,
+                "sync_mode": self.sync_mode,
+                "grad_to_block_id": grad_to_block_id,
+                "max_staleness": self.max_staleness
             })
         pserver_program.sync_with_cpp()
         return pserver_program
@@ -333,7 +449,7 @@ class DistributeTranspiler:
         were split to several blocks.
         """
         s_prog = Program()
-        orig_s_prog = framework.default_startup_program()
+        orig_s_prog = self.startup_program
         params = self.param_grad_ep_mapping[endpoint]["params"]
 
         def _get_splited_name_and_shape(varname):
@@ -486,6 +602,258 @@ class DistributeTranspiler:
                                "[LOD_TENSOR, SELECTED_ROWS]")
         return var_mapping
 
+    def _append_fuse_op(self, program, send_inputs, eplist, pserver_endpoints,
+                        fuse_grad_size):
+        """
+        Flatten the small grad blocks sent to the same endpoint and
+        concatenate them into fused buffers of at most fuse_grad_size bytes.
+        Only float32 dense grads are fused, the others are sent as they are.
+
+        Returns the vars to send and the endpoints to send them to.
+        """
+        buckets = dict()  # endpoint -> list of grad lists
+        send_vars = []
+        send_eplist = []
+        for grad, ep in zip(send_inputs, eplist):
+            nbytes = reduce(lambda x, y: x * y, grad.shape) * 4
+            if grad.type != core.VarDesc.VarType.LOD_TENSOR or \
+                    grad.dtype != core.VarDesc.VarType.FP32 or \
+                    nbytes >= fuse_grad_size:
+                send_vars.append(grad)
+                send_eplist.append(ep)
+                continue
+            ep_buckets = buckets.setdefault(ep, [[]])
+            bucket_size = sum(
+                reduce(lambda x, y: x * y, g.shape) * 4 for g in ep_buckets[-1])
+            if bucket_size + nbytes > fuse_grad_size:
+                ep_buckets.append([])
+            ep_buckets[-1].append(grad)
+
+        block = program.global_block()
+        for ep in pserver_endpoints:
+            for grads in buckets.get(ep, []):
+                if len(grads) == 1:
+                    # nothing to fuse with
+                    send_vars.append(grads[0])
+                    send_eplist.append(ep)
+                    continue
+                fused_name = "fused_grad.%d.%d" % (
+                    pserver_endpoints.index(ep),
+                    len(self.fused_grad_mapping.get(ep, [])))
+                flat_vars = []
+                for g in grads:
+                    flat_var = block.create_var(
+                        name="%s.flat" % g.name,
+                        persistable=False,
+                        dtype=g.dtype,
+                        shape=[reduce(lambda x, y: x * y, g.shape)])
+                    block.append_op(
+                        type="reshape",
+                        inputs={"X": g},
+                        outputs={"Out": flat_var},
+                        attrs={"shape": list(flat_var.shape)})
+                    flat_vars.append(flat_var)
+                fused_var = block.create_var(
+                    name="%s.trainer_%d" % (fused_name, self.trainer_id),
+                    persistable=False,
+                    dtype=core.VarDesc.VarType.FP32,
+                    shape=[sum(v.shape[0] for v in flat_vars)])
+                block.append_op(
+                    type="concat",
+                    inputs={"X": flat_vars},
+                    outputs={"Out": fused_var},
+                    attrs={"axis": 0})
+                send_vars.append(fused_var)
+                send_eplist.append(ep)
+                if not self.fused_grad_mapping.has_key(ep):
+                    self.fused_grad_mapping[ep] = []
+                self.fused_grad_mapping[ep].append((fused_name, grads))
+        return send_vars, send_eplist
+
+    def _append_unfuse_op(self,
+                          optimize_block,
+                          fused_name,
+                          grads,
+                          trainer_ids=None):
+        """
+        The reverse of _append_fuse_op on the pserver side: split the fused
+        buffer received from each trainer and reshape the pieces into the
+        per trainer grad vars.
+        """
+        pserver_block = optimize_block.program.global_block()
+        if trainer_ids is None:
+            trainer_ids = xrange(self.trainers)
+        for trainer_id in trainer_ids:
+            flat_vars = []
+            for g in grads:
+                flat_vars.append(
+                    pserver_block.create_var(
+                        name="%s.trainer_%d.flat" %
+                        (self._orig_varname(g.name), trainer_id),
+                        persistable=False,
+                        dtype=g.dtype,
+                        shape=[reduce(lambda x, y: x * y, g.shape)]))
+            fused_var = pserver_block.create_var(
+                name="%s.trainer_%d" % (fused_name, trainer_id),
+                persistable=False,
+                dtype=core.VarDesc.VarType.FP32,
+                shape=[sum(v.shape[0] for v in flat_vars)])
+            optimize_block.append_op(
+                type="split",
+                inputs={"X": fused_var},
+                outputs={"Out": flat_vars},
+                attrs={"sections": [v.shape[0] for v in flat_vars],
+                       "axis": 0})
+            for g, flat_var in zip(grads, flat_vars):
+                per_trainer_name = "%s.trainer_%d" % \
+                    (self._orig_varname(g.name), trainer_id)
+                optimize_block.append_op(
+                    type="reshape",
+                    inputs={"X": flat_var},
+                    outputs={"Out": pserver_block.vars[per_trainer_name]},
+                    attrs={"shape": list(g.shape)})
+
+    def _append_compress_op(self, program, send_vars, send_eplist, method,
+                            topk_ratio):
+        """
+        Compress the float32 dense grads in send_vars, the others are sent
+        as they are. Returns the vars to send.
+        """
+        if method not in GRAD_COMPRESSION_METHODS:
+            raise ValueError("grad_compression should be one of %s" %
+                             (GRAD_COMPRESSION_METHODS, ))
+        block = program.global_block()
+        startup_block = self.startup_program.global_block()
+        compressed_vars = []
+        for grad, ep in zip(send_vars, send_eplist):
+            if grad.type != core.VarDesc.VarType.LOD_TENSOR or \
+                    grad.dtype != core.VarDesc.VarType.FP32:
+                compressed_vars.append(grad)
+                continue
+            orig_name = self._orig_varname(grad.name)
+            numel = reduce(lambda x, y: x * y, grad.shape)
+            compressed_var = block.create_var(
+                name="%s.compressed.trainer_%d" % (orig_name, self.trainer_id),
+                persistable=False,
+                dtype=core.VarDesc.VarType.INT32,
+                shape=[_compressed_size(method, numel, topk_ratio)])
+            inputs = {"X": grad}
+            outputs = {"Out": compressed_var, "ResidualOut": []}
+            if method != "fp16":
+                # the residual is kept on CPU, where the compression runs.
+                residual = block.create_var(
+                    name="%s.residual" % orig_name,
+                    persistable=True,
+                    dtype=grad.dtype,
+                    shape=grad.shape)
+                startup_block.append_op(
+                    type="fill_constant",
+                    outputs={
+                        "Out": startup_block.create_var(
+                            name=residual.name,
+                            persistable=True,
+                            dtype=grad.dtype,
+                            shape=grad.shape)
+                    },
+                    attrs={
+                        "shape": list(grad.shape),
+                        "dtype": grad.dtype,
+                        "value": 0.0,
+                        "force_cpu": True
+                    })
+                inputs["Residual"] = residual
+                outputs["ResidualOut"] = residual
+            block.append_op(
+                type="compress_grad",
+                inputs=inputs,
+                outputs=outputs,
+                attrs={"method": method,
+                       "ratio": topk_ratio})
+            compressed_vars.append(compressed_var)
+            if not self.compressed_grad_mapping.has_key(ep):
+                self.compressed_grad_mapping[ep] = []
+            self.compressed_grad_mapping[ep].append((orig_name, grad.shape))
+        self.grad_compression = method
+        self.topk_ratio = topk_ratio
+        return compressed_vars
+
+    def _append_decompress_op(self,
+                              optimize_block,
+                              orig_name,
+                              shape,
+                              trainer_ids=None):
+        """
+        Restore the grad compressed by _append_compress_op from each trainer
+        on the pserver side.
+        """
+        pserver_block = optimize_block.program.global_block()
+        numel = reduce(lambda x, y: x * y, shape)
+        if trainer_ids is None:
+            trainer_ids = xrange(self.trainers)
+        for trainer_id in trainer_ids:
+            compressed_var = pserver_block.create_var(
+                name="%s.compressed.trainer_%d" % (orig_name, trainer_id),
+                persistable=False,
+                dtype=core.VarDesc.VarType.INT32,
+                shape=[
+                    _compressed_size(self.grad_compression, numel,
+                                     self.topk_ratio)
+                ])
+            grad_var = pserver_block.create_var(
+                name="%s.trainer_%d" % (orig_name, trainer_id),
+                persistable=False,
+                dtype=core.VarDesc.VarType.FP32,
+                shape=shape)
+            optimize_block.append_op(
+                type="decompress_grad",
+                inputs={"X": compressed_var},
+                outputs={"Out": grad_var},
+                attrs={"shape": list(shape),
+                       "method": self.grad_compression})
+
+    def _append_async_blocks(self, pserver_program, endpoint,
+                             opt_op_on_pserver):
+        """
+        Create a block to apply each var received from each trainer in the
+        async mode. Returns the list of "received_var_name:block_id".
+        """
+        grads = self.param_grad_ep_mapping[endpoint]["grads"]
+        compressed = dict(self.compressed_grad_mapping.get(endpoint, []))
+        fused = self.fused_grad_mapping.get(endpoint, [])
+        fused_grads = set()
+        for _, fused_grad_list in fused:
+            fused_grads.update(g.name for g in fused_grad_list)
+        # the vars sent by the trainers, and the grads in them
+        recv_units = list(fused)
+        for g in grads:
+            if g.name not in fused_grads:
+                recv_units.append((self._orig_varname(g.name), [g]))
+
+        grad_to_block_id = []
+        for orig_name, unit_grads in recv_units:
+            unit_grad_names = [self._orig_varname(g.name) for g in unit_grads]
+            for trainer_id in xrange(self.trainers):
+                block = pserver_program.create_block(0)
+                recv_name = "%s.trainer_%d" % (orig_name, trainer_id)
+                if compressed.has_key(orig_name):
+                    recv_name = "%s.compressed.trainer_%d" % (orig_name,
+                                                             trainer_id)
+                    self._append_decompress_op(block, orig_name,
+                                               compressed[orig_name],
+                                               [trainer_id])
+                if orig_name not in unit_grad_names:
+                    self._append_unfuse_op(block, orig_name, unit_grads,
+                                           [trainer_id])
+                for op in opt_op_on_pserver:
+                    grad_name = op.input("Grad")[0]
+                    if any(
+                            same_or_split_var(name, grad_name)
+                            for name in unit_grad_names):
+                        self._append_pserver_ops(block, op, endpoint,
+                                                 trainer_id)
+                grad_to_block_id.append("%s:%d" % (recv_name, block.idx))
+        return grad_to_block_id
+
     def _get_optimizer_input_shape(self, op_type, varkey, orig_shape,
                                    param_shape):
         """
@@ -520,7 +888,15 @@ class DistributeTranspiler:
             orig_var_name = varname[:suff_idx]
         return orig_var_name
 
-    def _append_pserver_ops(self, optimize_block, opt_op, endpoint):
+    def _append_pserver_ops(self,
+                            optimize_block,
+                            opt_op,
+                            endpoint,
+                            trainer_id=None):
+        """
+        NOTE: in the async mode, the grad of the trainer trainer_id is
+              applied directly instead of the merged grad of all trainers.
+        """
         program = optimize_block.program
         pserver_block = program.global_block()
         new_inputs = dict()
@@ -538,6 +914,11 @@ class DistributeTranspiler:
                     # do not append this op if current endpoint
                     # is not dealing with this grad block
                     return
+                if trainer_id is not None:
+                    merged_var = pserver_block.vars["%s.trainer_%d" % (
+                        self._orig_varname(grad_block.name), trainer_id)]
+                    new_inputs[key] = merged_var
+                    continue
                 merged_var = \
                     pserver_block.vars[self._orig_varname(grad_block.name)]
                 if self.trainers > 1:
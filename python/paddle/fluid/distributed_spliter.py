@@ -12,6 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import re
+
+from . import core
+
+__all__ = ['hash_name', 'round_robin', 'SizeBalanced', 'size_balanced']
+
 
 def hash_name(varlist, pserver_endpoints):
     """
@@ -48,3 +54,161 @@ def round_robin(varlist, pserver_endpoints):
         if pserver_idx >= len(pserver_endpoints):
             pserver_idx = 0
     return eplist
+
+
+def _split_varname(varname):
+    """
+    The name of the variable a block is split from, e.g. "fc.w@GRAD" for
+    "fc.w@GRAD.block1.trainer_0".
+    """
+    return re.sub(r"(\.block\d+)?(\.trainer_\d+)?$", "", varname)
+
+
+class SizeBalanced(object):
+    """
+    distribute variables to several endpoints by greedy bin packing, so that
+    every endpoint gets a share of the total bytes and of the estimated
+    optimizer FLOPs in proportion to its capacity.
+
+    The variables are placed from the largest to the smallest, each one on
+    the endpoint whose load, i.e. the larger of its bytes and FLOPs shares
+    divided by its capacity, is the lowest after placing it. The blocks of
+    the same variable are placed on different endpoints, as the transpiler
+    expects.
+
+    Use an instance as the split_method of DistributeTranspiler.transpile,
+    and print its report() to see the placement.
+
+    :param capacities: the relative capacity of each endpoint, a dict of
+        endpoint -> weight or a list of weights in the order of the
+        endpoints. All endpoints have the same capacity by default.
+    :type capacities: dict|list
+    :param optimizer: the type of the optimize op, e.g. "sgd" or "adam",
+        used to estimate the FLOPs and the bytes of the accumulators.
+    :type optimizer: string
+    """
+
+    # (FLOPs, accumulator count) per element of the optimize ops
+    OPTIMIZER_COST = {
+        "sgd": (2, 0),
+        "momentum": (4, 1),
+        "adagrad": (5, 1),
+        "decayed_adagrad": (6, 1),
+        "adadelta": (10, 2),
+        "rmsprop": (9, 2),
+        "adamax": (8, 2),
+        "adam": (12, 2),
+        "ftrl": (15, 2),
+    }
+
+    DTYPE_SIZE = {
+        core.VarDesc.VarType.FP16: 2,
+        core.VarDesc.VarType.FP32: 4,
+        core.VarDesc.VarType.FP64: 8,
+        core.VarDesc.VarType.INT32: 4,
+        core.VarDesc.VarType.INT64: 8,
+    }
+
+    def __init__(self, capacities=None, optimizer="sgd"):
+        if optimizer not in SizeBalanced.OPTIMIZER_COST:
+            raise ValueError("unknown optimizer %s, should be one of %s" %
+                             (optimizer, SizeBalanced.OPTIMIZER_COST.keys()))
+        self.capacities = capacities
+        self.optimizer = optimizer
+        self.placement = None
+
+    def _capacities(self, pserver_endpoints):
+        if self.capacities is None:
+            weights = [1.0] * len(pserver_endpoints)
+        elif isinstance(self.capacities, dict):
+            weights = [
+                float(self.capacities.get(ep, 1.0)) for ep in pserver_endpoints
+            ]
+        else:
+            assert len(self.capacities) == len(pserver_endpoints), \
+                "one capacity should be given for each endpoint"
+            weights = [float(w) for w in self.capacities]
+        assert all(w > 0 for w in weights), "capacities should be positive"
+        total = sum(weights)
+        return [w / total for w in weights]
+
+    def _cost(self, var):
+        numel = reduce(lambda x, y: x * y, var.shape, 1)
+        flops, accumulators = SizeBalanced.OPTIMIZER_COST[self.optimizer]
+        elem_size = SizeBalanced.DTYPE_SIZE.get(var.dtype, 4)
+        # the param, its grad and the accumulators of the optimizer
+        return numel * elem_size * (2 + accumulators), numel * flops
+
+    def __call__(self, varlist, pserver_endpoints):
+        shares = self._capacities(pserver_endpoints)
+        costs = [self._cost(var) for var in varlist]
+        total_bytes = float(sum(c[0] for c in costs)) or 1.0
+        total_flops = float(sum(c[1] for c in costs)) or 1.0
+
+        ep_bytes = [0] * len(pserver_endpoints)
+        ep_flops = [0] * len(pserver_endpoints)
+        ep_vars = [[] for _ in pserver_endpoints]
+
+        def _load(ep_idx, nbytes, flops):
+            return max((ep_bytes[ep_idx] + nbytes) / total_bytes,
+                       (ep_flops[ep_idx] + flops) / total_flops) / \
+                shares[ep_idx]
+
+        # the endpoints holding the blocks of each split variable
+        split_eps = {}
+        eplist = [None] * len(varlist)
+        order = sorted(
+            xrange(len(varlist)), key=lambda i: costs[i], reverse=True)
+        for i in order:
+            nbytes, flops = costs[i]
+            used = split_eps.setdefault(_split_varname(varlist[i].name), set())
+            candidates = [
+                j for j in xrange(len(pserver_endpoints)) if j not in used
+            ] or range(len(pserver_endpoints))
+            ep_idx = min(
+                candidates,
+                key=lambda j: (_load(j, nbytes, flops), len(ep_vars[j]), j))
+            used.add(ep_idx)
+            ep_bytes[ep_idx] += nbytes
+            ep_flops[ep_idx] += flops
+            ep_vars[ep_idx].append(varlist[i].name)
+            eplist[i] = pserver_endpoints[ep_idx]
+
+        self.placement = []
+        for j, ep in enumerate(pserver_endpoints):
+            self.placement.append({
+                "endpoint": ep,
+                "capacity": shares[j],
+                "bytes": ep_bytes[j],
+                "flops": ep_flops[j],
+                "vars": ep_vars[j],
+            })
+        return eplist
+
+    def report(self):
+        """
+        Return the placement of the last call as a table of the bytes and
+        FLOPs of each endpoint, and their shares of the totals.
+        """
+        assert self.placement is not None, "no variable is placed yet"
+        total_bytes = float(sum(p["bytes"] for p in self.placement)) or 1.0
+        total_flops = float(sum(p["flops"] for p in self.placement)) or 1.0
+        lines = [
+            "%-24s%10s%14s%8s%14s%8s%8s" % ("endpoint", "capacity", "bytes",
+                                            "%", "flops", "%", "vars")
+        ]
+        for p in self.placement:
+            lines.append("%-24s%10.3f%14d%8.1f%14d%8.1f%8d" % (
+                p["endpoint"], p["capacity"], p["bytes"],
+                100 * p["bytes"] / total_bytes, p["flops"],
+                100 * p["flops"] / total_flops, len(p["vars"])))
+        return "\n".join(lines)
+
+
+def size_balanced(varlist, pserver_endpoints):
+    """
+    distribute variables to several endpoints of the same capacity,
+    balancing the bytes and the SGD FLOPs of each endpoint. Use SizeBalanced
+    for other capacities or optimizers, or to get the placement report.
+    """
+    return SizeBalanced()(varlist, pserver_endpoints)
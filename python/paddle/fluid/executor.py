@@ -14,7 +14,9 @@
 
 import numpy as np
 import contextlib
-from framework import Program, default_main_program
+from collections import OrderedDict
+from framework import Program, Variable, default_main_program
+from profiler import record_event
 from . import core
 
 __all__ = [
@@ -163,8 +165,138 @@ def fetch_var(name, scope=None, return_numpy=True):
     return tensor
 
 
+def _fetch_var_name(var):
+    if isinstance(var, Variable):
+        return var.name
+    return str(var)
+
+
+def get_program_cache_key(program, feed, fetch_list, feed_var_name,
+                          fetch_var_name):
+    """
+    Get the key of the prepared program in the program cache.
+
+    The key identifies the source program together with its version, so
+    the cached program becomes invalid as soon as the source program is
+    modified.
+
+    Args:
+        program(Program): the program passed to Executor.run
+        feed(dict): a dictionary of {feed_target_name: feed_target_data}
+        fetch_list(list): the variables (or their names) to fetch
+        feed_var_name(str): the name of the feed holder variable
+        fetch_var_name(str): the name of the fetch holder variable
+
+    Returns:
+        tuple: a hashable key
+    """
+    return (id(program), program.version, tuple(sorted(feed.keys())),
+            tuple(_fetch_var_name(var) for var in fetch_list), feed_var_name,
+            fetch_var_name)
+
+
+class ProgramCache(object):
+    """
+    A LRU cache of the programs prepared by Executor.run, i.e. the clones
+    of the user's programs with feed and fetch operators already inserted.
+
+    Args:
+        capacity(int): the max number of cached programs. The least recently
+            used one is evicted when the cache is full.
+        release(callable|None): called with the prepared program evicted or
+            cleared from the cache.
+    """
+
+    def __init__(self, capacity=16, release=None):
+        if capacity <= 0:
+            raise ValueError("The capacity of ProgramCache must be positive")
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._release = release
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, program):
+        """
+        Get the prepared program of the key, or None if it is not cached.
+        """
+        entry = self._entries.pop(key, None)
+        # the source program is kept in the entry, so its id can not be
+        # reused by another program while the entry is alive.
+        if entry is None or entry[0] is not program:
+            if entry is not None and self._release is not None:
+                self._release(entry[1])
+            self.misses += 1
+            return None
+        self._entries[key] = entry
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, program, prepared):
+        entry = self._entries.pop(key, None)
+        if entry is not None and self._release is not None:
+            self._release(entry[1])
+        while len(self._entries) >= self.capacity:
+            _, entry = self._entries.popitem(last=False)
+            if self._release is not None:
+                self._release(entry[1])
+        self._entries[key] = (program, prepared)
+
+    def clear(self):
+        if self._release is not None:
+            for _, prepared in self._entries.itervalues():
+                self._release(prepared)
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class _PreparedProgram(object):
+    """
+    A program with feed and fetch operators inserted, and the context of its
+    global block prepared by the C++ executor, which keeps the instantiated
+    operators and a local scope between the runs.
+    """
+
+    def __init__(self, program, ctx):
+        self.program = program
+        self.ctx = ctx
+        # the scope the local scope kept by ctx belongs to. It is referenced
+        # here so that it is alive until the local scope is deleted.
+        self.scope = None
+
+    def release(self):
+        if self.scope is not None:
+            self.ctx.reset_local_scope()
+            self.scope = None
+
+
 class Executor(object):
-    def __init__(self, places):
+    """
+    An Executor runs programs on the first of the places.
+
+    Args:
+        places(Place|list): the places to run on.
+        program_cache_size(int): the max number of programs cached by run.
+        inter_op_threads(int): the max number of independent operators run
+            at the same time by the framework thread pool. The operators
+            are run one after another if it is 1. It only takes effect on
+            CPUPlace.
+        keep_local_scope(bool): whether the programs cached by run keep
+            their local scopes, i.e. the non-persistable variables, between
+            the runs, so that the variables are not created again. Note that
+            each cached program then holds the memory of all its
+            activations until it is evicted or the executor is closed.
+    """
+
+    def __init__(self,
+                 places,
+                 program_cache_size=16,
+                 inter_op_threads=1,
+                 keep_local_scope=False):
         if not isinstance(places, list) and not isinstance(places, tuple):
             places = [places]
 
@@ -176,7 +308,27 @@ class Executor(object):
 
         # TODO(dzhwinter) : only use the first place
         self.executor = core.Executor(act_places[0])
+        if inter_op_threads > 1:
+            self.executor.set_inter_op_threads(inter_op_threads)
         self.places = places
+        self.keep_local_scope = keep_local_scope
+        self.program_cache = ProgramCache(
+            program_cache_size, release=_PreparedProgram.release)
+
+    def close(self):
+        """
+        Release the programs cached by run, i.e. delete the local scopes
+        they keep in the scopes they ran in. The executor can still run
+        programs after it is closed.
+        """
+        self.program_cache.clear()
+
+    def __del__(self):
+        # the local scopes are kids of the scopes the programs ran in, e.g.
+        # global_scope(), so they would outlive the executor otherwise.
+        program_cache = getattr(self, 'program_cache', None)
+        if program_cache is not None:
+            program_cache.clear()
 
     def aslodtensor(self, data):
         def accumulate(data):
@@ -218,30 +370,10 @@ class Executor(object):
             tensor.set_lod(lod)
             return tensor
 
-    def run(self,
-            program=None,
-            feed=None,
-            fetch_list=None,
-            feed_var_name='feed',
-            fetch_var_name='fetch',
-            scope=None,
-            return_numpy=True):
-        if feed is None:
-            feed = {}
-        if fetch_list is None:
-            fetch_list = []
-
-        if program is None:
-            program = default_main_program()
-
-        if not isinstance(program, Program):
-            raise TypeError()
-
-        if scope is None:
-            scope = global_scope()
-
-        program = program.clone()
-        global_block = program.global_block()
+    def _add_feed_fetch_ops(self, program, feed, fetch_list, feed_var_name,
+                            fetch_var_name):
+        tmp_program = program.clone()
+        global_block = tmp_program.global_block()
 
         if feed_var_name in global_block.vars:
             feed_var = global_block.var(feed_var_name)
@@ -268,6 +400,18 @@ class Executor(object):
                     outputs={'Out': [out]},
                     attrs={'col': i})
 
+        if not has_fetch_operators(global_block, fetch_list, fetch_var_name):
+            for i, var in enumerate(fetch_list):
+                global_block.append_op(
+                    type='fetch',
+                    inputs={'X': [var]},
+                    outputs={'Out': [fetch_var]},
+                    attrs={'col': i})
+
+        return tmp_program
+
+    def _feed_data(self, program, feed, feed_var_name, scope):
+        global_block = program.global_block()
         for op in global_block.ops:
             if op.desc.type() == 'feed':
                 feed_target_name = op.desc.output('Out')[0]
@@ -279,19 +423,98 @@ class Executor(object):
             else:
                 break
 
-        if not has_fetch_operators(global_block, fetch_list, fetch_var_name):
-            for i, var in enumerate(fetch_list):
-                global_block.append_op(
-                    type='fetch',
-                    inputs={'X': [var]},
-                    outputs={'Out': [fetch_var]},
-                    attrs={'col': i})
+    def run(self,
+            program=None,
+            feed=None,
+            fetch_list=None,
+            feed_var_name='feed',
+            fetch_var_name='fetch',
+            scope=None,
+            return_numpy=True,
+            use_program_cache=True):
+        """
+        Run a program by this Executor.
+
+        The program is cloned and the feed and fetch operators are inserted
+        into the clone before running. When `use_program_cache` is True, the
+        prepared clone is cached and reused by the following calls with the
+        same program, feed names and fetch list, until the program is
+        modified. The operators of a cached program are instantiated only
+        once. If the executor is created with `keep_local_scope`, the
+        non-persistable variables created by a run are kept and reused by
+        the next run of the cached program under the same scope, at the cost
+        of holding their memory between the runs. Otherwise they are freed
+        at the end of each run.
+
+        Args:
+            program(Program): the program to run. If None,
+                default_main_program() will be used.
+            feed(dict): a dictionary of {feed_target_name: feed_target_data}
+            fetch_list(list): the variables to fetch
+            feed_var_name(str): the name of the feed holder variable
+            fetch_var_name(str): the name of the fetch holder variable
+            scope(core.Scope|None): the scope to run in. If None,
+                global_scope() will be used.
+            return_numpy(bool): whether convert the fetched tensors to
+                numpy.ndarray
+            use_program_cache(bool): whether reuse the prepared program
+                cached by the previous calls
+
+        Returns:
+            list: the fetched values
+        """
+        if feed is None:
+            feed = {}
+        if fetch_list is None:
+            fetch_list = []
 
-        self.executor.run(program.desc, scope, 0, True, True)
-        outs = [
-            core.get_fetch_variable(scope, fetch_var_name, i)
-            for i in xrange(len(fetch_list))
-        ]
-        if return_numpy:
-            outs = as_numpy(outs)
+        if program is None:
+            program = default_main_program()
+
+        if not isinstance(program, Program):
+            raise TypeError()
+
+        if scope is None:
+            scope = global_scope()
+
+        if not use_program_cache:
+            program = self._add_feed_fetch_ops(
+                program=program,
+                feed=feed,
+                fetch_list=fetch_list,
+                feed_var_name=feed_var_name,
+                fetch_var_name=fetch_var_name)
+            with record_event("Executor.run/feed"):
+                self._feed_data(program, feed, feed_var_name, scope)
+            with record_event("Executor.run/run"):
+                self.executor.run(program.desc, scope, 0, True, True)
+        else:
+            cache_key = get_program_cache_key(program, feed, fetch_list,
+                                              feed_var_name, fetch_var_name)
+            prepared = self.program_cache.get(cache_key, program)
+            if prepared is None:
+                tmp_program = self._add_feed_fetch_ops(
+                    program=program,
+                    feed=feed,
+                    fetch_list=fetch_list,
+                    feed_var_name=feed_var_name,
+                    fetch_var_name=fetch_var_name)
+                prepared = _PreparedProgram(
+                    tmp_program, self.executor.prepare(tmp_program.desc, 0))
+                self.program_cache.put(cache_key, program, prepared)
+            if self.keep_local_scope and prepared.scope is not scope:
+                prepared.release()
+                prepared.scope = scope
+            with record_event("Executor.run/feed"):
+                self._feed_data(prepared.program, feed, feed_var_name, scope)
+            with record_event("Executor.run/run"):
+                self.executor.run_prepared_ctx(prepared.ctx, scope, True,
+                                               True, self.keep_local_scope)
+        with record_event("Executor.run/fetch"):
+            outs = [
+                core.get_fetch_variable(scope, fetch_var_name, i)
+                for i in xrange(len(fetch_list))
+            ]
+            if return_numpy:
+                outs = as_numpy(outs)
         return outs
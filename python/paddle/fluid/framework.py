@@ -267,6 +267,7 @@ class Variable(object):
 
     @persistable.setter
     def persistable(self, p):
+        self.block.program.bump_version()
         self.desc.set_persistable(p)
 
     @property
@@ -275,6 +276,7 @@ class Variable(object):
 
     @name.setter
     def name(self, new_name):
+        self.block.program.bump_version()
         self.desc.set_name(new_name)
 
     @property
@@ -517,9 +519,11 @@ class Operator(object):
         return self.desc.input(name)
 
     def rename_input(self, old_name, new_name):
+        self.block.program.bump_version()
         self.desc.rename_input(old_name, new_name)
 
     def rename_output(self, old_name, new_name):
+        self.block.program.bump_version()
         self.desc.rename_output(old_name, new_name)
 
     @property
@@ -682,6 +686,7 @@ class Block(object):
         return self.desc.get_forward_block_idx()
 
     def set_forward_block_idx(self, idx):
+        self.program.bump_version()
         self.desc.set_forward_block_idx(idx)
 
     @property
@@ -732,6 +737,7 @@ class Block(object):
                 if isinstance(item[1], Parameter))
 
     def create_var(self, *args, **kwargs):
+        self.program.bump_version()
         var = Variable(block=self, *args, **kwargs)
         if 'initializer' in kwargs:
             kwargs['initializer'](var, self)
@@ -766,6 +772,7 @@ class Block(object):
         else:
             raise ValueError("unsupported var type: %s", type(v))
 
+        self.program.bump_version()
         self.desc.rename_var(name, new_name)
         d = self.desc.find_var(new_name)
         var = None
@@ -795,6 +802,7 @@ class Block(object):
         self.sync_with_cpp()
 
     def create_parameter(self, *args, **kwargs):
+        self.program.bump_version()
         global_block = self.program.global_block()
         param = Parameter(global_block, *args, **kwargs)
         if 'initializer' in kwargs:
@@ -802,6 +810,7 @@ class Block(object):
         return param
 
     def append_op(self, *args, **kwargs):
+        self.program.bump_version()
         op_desc = self.desc.append_op()
         op = Operator(block=self, desc=op_desc, *args, **kwargs)
         self.ops.append(op)
@@ -815,12 +824,14 @@ class Block(object):
             end = list(self.ops).index(ops[-1])
         except Exception, e:
             raise e
+        self.program.bump_version()
         self.desc.remove_op(start, end + 1)
 
     def slice_ops(self, start, end):
         return list(self.ops)[start:end]
 
     def prepend_op(self, *args, **kwargs):
+        self.program.bump_version()
         op_desc = self.desc.prepend_op()
         op = Operator(self, op_desc, *args, **kwargs)
         self.ops.appendleft(op)
@@ -832,6 +843,7 @@ class Block(object):
 
         This method is used to synchronize the c++ desc instance generated by backward.
         """
+        self.program.bump_version()
         # sync variables from cpp
         for var in self.desc.all_vars():
             if not self.has_var(var.name()):
@@ -915,6 +927,7 @@ class Program(object):
         self.blocks = [Block(self, 0)]
         self.current_block_idx = 0
         self._seed = 0
+        self._version = 0
 
     def __str__(self):
         return self.to_string(True)
@@ -946,6 +959,29 @@ class Program(object):
     def get_desc(self):
         return self.desc
 
+    @property
+    def version(self):
+        """
+        A counter that increases every time the program is modified through
+        the Python API. It is used by the Executor to decide whether a
+        prepared program cached for this program is still valid.
+
+        Returns(int): The current version of the program.
+
+        """
+        return self._version
+
+    def bump_version(self):
+        """
+        Mark the program as modified. Code that changes `self.desc` directly
+        on the c++ end should call this method, so that the programs cached
+        by the Executor are invalidated.
+
+        Returns:
+            None
+        """
+        self._version += 1
+
     def clone(self):
         p = Program()
         p.desc = core.ProgramDesc(self.desc)
@@ -1029,6 +1065,7 @@ class Program(object):
         return param_to_grad_info
 
     def create_block(self, parent_idx=None):
+        self.bump_version()
         new_block_idx = len(self.blocks)
         parent = self.current_block() if parent_idx is None else self.block(
             parent_idx)
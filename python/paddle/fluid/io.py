@@ -13,9 +13,20 @@
 # limitations under the License.
 
 import os
+import fnmatch
+import json
+import mmap
+import re
+import threading
+import time
+import uuid
+import zlib
+
+import numpy as np
 
 from paddle.fluid.evaluator import Evaluator
 from paddle.fluid.framework import Program, Parameter, default_main_program, Variable
+from paddle.fluid.executor import global_scope
 from . import core
 
 __all__ = [
@@ -28,6 +39,8 @@ __all__ = [
     'save_inference_model',
     'load_inference_model',
     'get_inference_program',
+    'save_checkpoint',
+    'load_checkpoint',
 ]
 
 
@@ -440,3 +453,318 @@ def get_parameter_value_by_name(name, executor, program=None):
         program = default_main_program()
     var = program.global_block().var(name)
     return get_parameter_value(var, executor)
+
+
+CHECKPOINT_INDEX_FILE = "checkpoint.index"
+CHECKPOINT_FORMAT_VERSION = 1
+# align the tensors in a shard for mmap loading
+_CHECKPOINT_ALIGNMENT = 64
+
+
+_SHARD_FILE_PATTERN = re.compile(r"^shard-\d+-of-\d+\.[0-9a-f]+-[0-9a-f]+$")
+
+
+def _shard_file_name(shard_id, shard_num, save_id):
+    return "shard-%05d-of-%05d.%s" % (shard_id, shard_num, save_id)
+
+
+def _crc32(arr):
+    return zlib.crc32(np.ascontiguousarray(arr).view(np.uint8)) & 0xffffffff
+
+
+def _run_in_threads(func, args_list):
+    """
+    Call func with each args in args_list in a thread, and reraise the first
+    exception raised.
+    """
+    errors = []
+
+    def run(*args):
+        try:
+            func(*args)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=args) for args in args_list]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+
+
+def _snapshot_vars(vars, scope):
+    """
+    Copy the values of the LoDTensor vars out of the scope.
+
+    Returns:
+        list: (name, ndarray, lod) sorted by the byte size, largest first.
+    """
+    snapshot = []
+    for var in vars:
+        if var.type != core.VarDesc.VarType.LOD_TENSOR:
+            continue
+        scope_var = scope.find_var(var.name)
+        if scope_var is None:
+            raise ValueError("Variable %s is not found in the scope" %
+                             var.name)
+        tensor = scope_var.get_tensor()
+        snapshot.append((var.name, np.array(tensor), tensor.lod()))
+    snapshot.sort(key=lambda s: s[1].nbytes, reverse=True)
+    return snapshot
+
+
+def _write_shards(snapshot, dirname, shard_num):
+    """
+    Write the snapshot into shard_num shard files in parallel, and then the
+    index file. The shard names are unique to each save, so the shards of an
+    existing checkpoint in dirname are never overwritten, and the index,
+    which is renamed over the old one last, always refers to complete
+    shards. The shards not referred by the new index are removed at the end.
+    """
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    save_id = "%x-%s" % (int(time.time()), uuid.uuid4().hex[:8])
+
+    # assign the tensors, largest first, to the shard with the least bytes
+    shards = [[] for _ in xrange(shard_num)]
+    shard_bytes = [0] * shard_num
+    for item in snapshot:
+        shard_id = shard_bytes.index(min(shard_bytes))
+        shards[shard_id].append(item)
+        shard_bytes[shard_id] += item[1].nbytes
+
+    index = {
+        'version': CHECKPOINT_FORMAT_VERSION,
+        'shards':
+        [_shard_file_name(i, shard_num, save_id) for i in xrange(shard_num)],
+        'vars': {}
+    }
+    lock = threading.Lock()
+
+    def write_shard(shard_id):
+        filename = os.path.join(dirname, index['shards'][shard_id])
+        entries = {}
+        with open(filename + ".tmp", "wb") as f:
+            offset = 0
+            for name, arr, lod in shards[shard_id]:
+                padding = -offset % _CHECKPOINT_ALIGNMENT
+                f.write('\0' * padding)
+                offset += padding
+                arr = np.ascontiguousarray(arr)
+                f.write(arr.view(np.uint8).data)
+                entries[name] = {
+                    'shard': shard_id,
+                    'offset': offset,
+                    'nbytes': arr.nbytes,
+                    'dtype': arr.dtype.str,
+                    'shape': list(arr.shape),
+                    'lod': [list(level) for level in lod],
+                    'crc32': _crc32(arr)
+                }
+                offset += arr.nbytes
+        os.rename(filename + ".tmp", filename)
+        with lock:
+            index['vars'].update(entries)
+
+    _run_in_threads(write_shard, [(i, ) for i in xrange(shard_num)])
+
+    index_file = os.path.join(dirname, CHECKPOINT_INDEX_FILE)
+    with open(index_file + ".tmp", "w") as f:
+        json.dump(index, f)
+    os.rename(index_file + ".tmp", index_file)
+
+    # the shards of the checkpoints saved before are not readable any more
+    for filename in os.listdir(dirname):
+        if (_SHARD_FILE_PATTERN.match(filename) and
+                filename not in index['shards']):
+            os.remove(os.path.join(dirname, filename))
+
+
+class AsyncCheckpoint(object):
+    """
+    The handle of a checkpoint being written in the background, returned by
+    save_checkpoint with async_save=True.
+    """
+
+    def __init__(self, snapshot, dirname, shard_num):
+        self.dirname = dirname
+        self._error = None
+
+        def write():
+            try:
+                _write_shards(snapshot, dirname, shard_num)
+            except Exception as e:
+                self._error = e
+
+        self._thread = threading.Thread(target=write)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def done(self):
+        """
+        Whether the checkpoint has been written.
+        """
+        return not self._thread.is_alive()
+
+    def wait(self):
+        """
+        Wait until the checkpoint is written, and reraise the error raised
+        while writing it.
+        """
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+def save_checkpoint(dirname,
+                    main_program=None,
+                    vars=None,
+                    predicate=is_persistable,
+                    shard_num=4,
+                    async_save=False,
+                    scope=None):
+    """
+    Save the LoDTensor variables into a sharded checkpoint.
+
+    The tensors are copied out of the scope first, and then written into
+    shard_num shard files in parallel, balanced by their byte sizes. An index
+    file records the shard, offset, dtype, shape, LoD and CRC32 of each
+    tensor. The checkpoint can be loaded by load_checkpoint. Saving into the
+    directory of an existing checkpoint replaces it atomically, but the
+    saves into the same directory must not overlap.
+
+    :param dirname: directory path of the checkpoint.
+    :param main_program: program. If vars is None, then filter all variables
+    in this program which fit `predicate`. Default default_main_program().
+    :param vars: variables need to be saved. If vars is specified, program &
+    predicate will be ignored
+    :param predicate: The Predicate describes a callable that returns a
+    variable as a bool. Default is_persistable.
+    :param shard_num: the number of shard files.
+    :param async_save: if True, only the copy of the tensors is done before
+    returning, and the files are written in a background thread, so that
+    training can continue.
+    :param scope: the scope holding the variables. Default global_scope().
+
+    :return: an AsyncCheckpoint if async_save is True, otherwise None.
+    """
+    if shard_num <= 0:
+        raise ValueError("shard_num must be positive")
+    if vars is None:
+        if main_program is None:
+            main_program = default_main_program()
+        if not isinstance(main_program, Program):
+            raise TypeError("program should be as Program type or None")
+        vars = filter(predicate, main_program.list_vars())
+    if scope is None:
+        scope = global_scope()
+
+    snapshot = _snapshot_vars(vars, scope)
+    if async_save:
+        return AsyncCheckpoint(snapshot, dirname, shard_num)
+    _write_shards(snapshot, dirname, shard_num)
+
+
+def load_checkpoint(executor,
+                    dirname,
+                    main_program=None,
+                    vars=None,
+                    predicate=is_persistable,
+                    name_pattern=None,
+                    use_mmap=True,
+                    verify_checksum=True,
+                    scope=None):
+    """
+    Load the variables from a checkpoint saved by save_checkpoint.
+
+    The shards are loaded in parallel. With use_mmap, the shards are memory
+    mapped, and each tensor is copied straight from the mapped pages, which
+    are only read when the tensor is loaded. Otherwise each shard is read
+    into memory at once first.
+
+    :param executor: executor to load variables into.
+    :param dirname: directory path of the checkpoint.
+    :param main_program: program. If vars is None, then filter all variables
+    in this program which fit `predicate`. Default default_main_program().
+    :param vars: variables need to be loaded. If vars is specified, program &
+    predicate will be ignored
+    :param predicate: The Predicate describes a callable that returns a
+    variable as a bool. Default is_persistable.
+    :param name_pattern: a shell-style wildcard pattern, e.g. "fc_*", only the
+    variables whose names match it are loaded if it is not None.
+    :param use_mmap: whether memory map the shards.
+    :param verify_checksum: whether check the CRC32 of the tensors loaded.
+    :param scope: the scope to load the variables into. Default
+    global_scope().
+
+    :return: the names of the variables loaded.
+    """
+    if vars is None:
+        if main_program is None:
+            main_program = default_main_program()
+        if not isinstance(main_program, Program):
+            raise TypeError("program's type should be Program")
+        vars = filter(predicate, main_program.list_vars())
+    if scope is None:
+        scope = global_scope()
+
+    with open(os.path.join(dirname, CHECKPOINT_INDEX_FILE)) as f:
+        index = json.load(f)
+    if index['version'] != CHECKPOINT_FORMAT_VERSION:
+        raise ValueError("Unsupported checkpoint version %s" %
+                         index['version'])
+
+    names = [
+        var.name for var in vars
+        if var.type == core.VarDesc.VarType.LOD_TENSOR and (
+            name_pattern is None or fnmatch.fnmatchcase(var.name,
+                                                         name_pattern))
+    ]
+    missing = [name for name in names if name not in index['vars']]
+    if missing:
+        raise ValueError("Variables %s are not in the checkpoint %s" %
+                         (", ".join(missing), dirname))
+
+    by_shard = {}
+    for name in names:
+        by_shard.setdefault(index['vars'][name]['shard'], []).append(name)
+    # the variables are created in the scope on this thread
+    tensors = dict((name, scope.var(str(name)).get_tensor())
+                   for name in names)
+    place = executor.places[0]
+
+    def load_shard(shard_id):
+        filename = os.path.join(dirname, index['shards'][shard_id])
+        mapped = use_mmap and os.path.getsize(filename) > 0
+        with open(filename, "rb") as f:
+            if mapped:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buf = f.read()
+        try:
+            for name in by_shard[shard_id]:
+                entry = index['vars'][name]
+                dtype = np.dtype(str(entry['dtype']))
+                if entry['nbytes'] == 0:
+                    arr = np.zeros(entry['shape'], dtype=dtype)
+                else:
+                    arr = np.frombuffer(
+                        buf,
+                        dtype=dtype,
+                        count=entry['nbytes'] // dtype.itemsize,
+                        offset=entry['offset']).reshape(entry['shape'])
+                if verify_checksum and _crc32(arr) != entry['crc32']:
+                    raise ValueError("Checksum mismatch of variable %s in %s"
+                                     % (name, filename))
+                tensors[name].set(arr, place)
+                if entry['lod']:
+                    tensors[name].set_lod(entry['lod'])
+                del arr
+        finally:
+            if mapped:
+                buf.close()
+
+    _run_in_threads(load_shard, [(i, ) for i in by_shard])
+    return names
@@ -12,11 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from collections import defaultdict
+import bisect
+from collections import defaultdict, deque
 import framework
 from framework import Program, default_main_program, Parameter, Variable
 import backward
-from backward import _rename_arg_
 from . import core
 
 dtype_to_size = {
@@ -30,6 +30,26 @@ dtype_to_size = {
 }
 
 
+def _var_size(var_desc):
+    """
+    Returns the number of the batch size dimensions of the var, i.e. the
+    dimensions of -1, and its byte size excluding these dimensions.
+    """
+    size = dtype_to_size[var_desc.dtype()]
+    batch_dims = 0
+    for dim in var_desc.shape():
+        if dim < 0:
+            batch_dims += 1
+        else:
+            size *= dim
+    return batch_dims, size
+
+
+def _var_bytes(var_desc, batch_size):
+    batch_dims, size = _var_size(var_desc)
+    return size * batch_size**batch_dims
+
+
 class ControlFlowGraph(object):
     def __init__(self, Program, ops, forward_num, skip_opt):
         self._program = Program
@@ -41,7 +61,11 @@ class ControlFlowGraph(object):
         self._defs = defaultdict(set)
         self._live_in = defaultdict(set)
         self._live_out = defaultdict(set)
+        # var name -> the indexes of the ops whose uses, defs, live_in or
+        # live_out contain the var, which makes renaming incremental.
+        self._var_to_ops = defaultdict(set)
         self._skip_opt = skip_opt
+        self._analyzed = False
 
     def _add_connections(self, connections):
         for node1, node2 in connections:
@@ -59,48 +83,59 @@ class ControlFlowGraph(object):
             self._uses[i].update(self._ops[i].input_arg_names())
             self._defs[i].update(self._ops[i].output_arg_names())
 
-    def _update_graph(self, old_name, new_name, begin_idx=0):
-        for i in range(begin_idx, self.op_size):
-            if old_name in self._uses[i]:
-                self._uses[i].remove(old_name)
-                self._uses[i].add(new_name)
-            if old_name in self._defs[i]:
-                self._defs[i].remove(old_name)
-                self._defs[i].add(new_name)
-            if old_name in self._live_in[i]:
-                self._live_in[i].remove(old_name)
-                self._live_out[i].add(new_name)
-            if old_name in self._live_out[i]:
-                self._live_out[i].remove(old_name)
-                self._live_out[i].add(new_name)
-
-    def _reach_fixed_point(self, live_in, live_out):
-        if len(live_in) != len(self._live_in):
-            return False
-        if len(live_out) != len(self._live_out):
-            return False
-        for i in range(self.op_size):
-            if live_in[i] != self._live_in[i]:
-                return False
+    def _build_var_index(self):
+        self._var_to_ops = defaultdict(set)
         for i in range(self.op_size):
-            if live_out[i] != self._live_out[i]:
-                return False
-        return True
+            for names in (self._uses[i], self._defs[i], self._live_in[i],
+                          self._live_out[i]):
+                for name in names:
+                    self._var_to_ops[name].add(i)
+
+    def _update_graph(self, old_name, new_name, begin_idx=0):
+        ops = [i for i in self._var_to_ops[old_name] if i >= begin_idx]
+        for i in ops:
+            for names in (self._uses[i], self._defs[i], self._live_in[i],
+                          self._live_out[i]):
+                if old_name in names:
+                    names.remove(old_name)
+                    names.add(new_name)
+            self._var_to_ops[old_name].discard(i)
+            self._var_to_ops[new_name].add(i)
+
+    def _rename_var(self, old_name, new_name, begin_idx):
+        # only the ops using or defining the var need to be renamed
+        for i in self._var_to_ops[old_name]:
+            if i >= begin_idx and (old_name in self._uses[i] or
+                                   old_name in self._defs[i]):
+                self._ops[i].rename_input(old_name, new_name)
+                self._ops[i].rename_output(old_name, new_name)
+        self._update_graph(old_name, new_name, begin_idx)
 
     def _dataflow_analyze(self):
+        """
+        Compute live_in and live_out of the ops by a backward worklist
+        algorithm, only the predecessors of an op whose live_in changed
+        are visited again.
+        """
         self._build_graph()
-        live_in = defaultdict(set)
-        live_out = defaultdict(set)
-        while True:
-            for i in range(self.op_size, 0, -1):
-                live_in[i] = set(self._live_in[i])
-                live_out[i] = set(self._live_out[i])
-                for s in self._successors[i]:
-                    self._live_out[i] |= self._live_in[s]
-                self._live_in[i] = self._uses[i] | (
-                    self._live_out[i] - self._defs[i])
-            if self._reach_fixed_point(live_in, live_out):
-                break
+        worklist = deque(reversed(range(self.op_size)))
+        in_worklist = set(worklist)
+        while worklist:
+            i = worklist.popleft()
+            in_worklist.discard(i)
+            live_out = set()
+            for s in self._successors[i]:
+                live_out |= self._live_in[s]
+            self._live_out[i] = live_out
+            live_in = self._uses[i] | (live_out - self._defs[i])
+            if live_in != self._live_in[i]:
+                self._live_in[i] = live_in
+                for p in self._presuccessors[i]:
+                    if p not in in_worklist:
+                        worklist.append(p)
+                        in_worklist.add(p)
+        self._build_var_index()
+        self._analyzed = True
 
     def _get_diff(self, a, b):
         u = a & b
@@ -118,84 +153,181 @@ class ControlFlowGraph(object):
         else:
             return block_desc.find_var_recursive(str(var_name))
 
-    def memory_optimize(self):
-        def check_var_validity(block_desc, x, is_forward):
-            if str(x) == "@EMPTY@":
-                return False
-            if not self._has_var(block_desc, x, is_forward):
-                return False
-            if self._find_var(block_desc, x, is_forward).persistable():
-                return False
-            if self._find_var(
-                    block_desc, x,
-                    is_forward).type() != core.VarDesc.VarType.LOD_TENSOR:
-                return False
-            if x in self._skip_opt:
-                return False
-            if not self._find_var(block_desc, x, is_forward).shape():
-                return False
-            return True
+    def _check_var_validity(self, block_desc, x, is_forward):
+        if str(x) == "@EMPTY@":
+            return False
+        if not self._has_var(block_desc, x, is_forward):
+            return False
+        if self._find_var(block_desc, x, is_forward).persistable():
+            return False
+        if self._find_var(
+                block_desc, x,
+                is_forward).type() != core.VarDesc.VarType.LOD_TENSOR:
+            return False
+        if x in self._skip_opt:
+            return False
+        if not self._find_var(block_desc, x, is_forward).shape():
+            return False
+        if self._find_var(block_desc, x,
+                          is_forward).dtype() not in dtype_to_size:
+            return False
+        return True
 
-        self._build_graph()
-        self._dataflow_analyze()
-        self.pool = []
+    def memory_usage(self, batch_size=1):
+        """
+        Estimate the memory of the non-persistable LoDTensors in use at each
+        op. It is the total size of the distinct variables live before the
+        op and of the ones it defines.
+
+        Args:
+            batch_size(int): the size of the dimensions set to -1.
+
+        Returns:
+            list: the bytes in use at each op.
+        """
+        if not self._analyzed:
+            self._dataflow_analyze()
+        usage = []
+        for i in range(self.op_size):
+            block_desc = self._ops[i].block()
+            is_forward = i < self._forward_num
+            in_use = 0
+            for x in self._live_in[i] | self._defs[i]:
+                if self._check_var_validity(block_desc, x, is_forward):
+                    in_use += _var_bytes(
+                        self._find_var(block_desc, x, is_forward), batch_size)
+            usage.append(in_use)
+        return usage
+
+    def peak_memory(self, batch_size=1):
+        """
+        Estimate the peak memory of the non-persistable LoDTensors of the
+        ops, see memory_usage.
+
+        Args:
+            batch_size(int): the size of the dimensions set to -1.
+
+        Returns:
+            tuple: the peak bytes and the index of the first op reaching it.
+        """
+        usage = self.memory_usage(batch_size)
+        peak = max(usage) if usage else 0
+        if peak == 0:
+            return 0, -1
+        return peak, usage.index(peak)
+
+    def allocated_memory(self, batch_size=1):
+        """
+        Estimate the memory allocated for the non-persistable LoDTensors of
+        the ops. The executor keeps all the variables of a run until the run
+        ends, so it is the total size of the distinct variables, which is
+        what memory_optimize reduces.
+
+        Args:
+            batch_size(int): the size of the dimensions set to -1.
+
+        Returns:
+            int: the bytes allocated.
+        """
+        if not self._analyzed:
+            self._dataflow_analyze()
+        allocated = 0
+        for x, ops in self._var_to_ops.iteritems():
+            used = [i for i in ops if x in self._uses[i] or x in self._defs[i]]
+            if not used:
+                continue
+            i = min(used)
+            block_desc = self._ops[i].block()
+            is_forward = i < self._forward_num
+            if self._check_var_validity(block_desc, x, is_forward):
+                allocated += _var_bytes(
+                    self._find_var(block_desc, x, is_forward), batch_size)
+        return allocated
+
+    def _pool_pop_best_fit(self, block_desc, x, is_forward):
+        """
+        Pop the smallest cached var whose byte size is at least the size of
+        x, return None if there is no such var.
+        """
+        batch_dims, size = _var_size(self._find_var(block_desc, x, is_forward))
+        pool = self.pool[batch_dims]
+        idx = bisect.bisect_left(pool, (size, ))
+        while idx < len(pool):
+            cache_var = pool[idx][2]
+            if self._has_var(block_desc, cache_var, is_forward):
+                pool.pop(idx)
+                return cache_var
+            idx += 1
+        return None
+
+    def _pool_add(self, block_desc, x, is_forward):
+        batch_dims, size = _var_size(self._find_var(block_desc, x, is_forward))
+        self._pool_counter += 1
+        # the counter keeps the pool ordered by the insertion order within
+        # the vars of the same size.
+        bisect.insort(self.pool[batch_dims], (size, self._pool_counter, x))
+
+    def memory_optimize(self, print_log=False):
+        """
+        Let the variables reuse the memory of the variables which are not
+        live any more. A variable x defined by an op can reuse a cached
+        variable, if they have the same number of batch size dimensions,
+        and the byte size of the cached one is not smaller than x, whatever
+        the dtypes are. The smallest of such variables is chosen.
+
+        Args:
+            print_log(bool): whether to print the variables reused.
+
+        Returns:
+            int: the number of variables reusing others.
+        """
+        if not self._analyzed:
+            self._dataflow_analyze()
+        # batch size dims -> [(byte size, counter, var name)] sorted
+        self.pool = defaultdict(list)
+        self._pool_counter = 0
+        reused = 0
         for i in range(self.op_size):
             op = self._ops[i]
             if op.type() == "while" or op.type() == "while_grad":
                 continue
             block_desc = op.block()
             is_forward = i < self._forward_num
-            if self.pool:
+            if any(self.pool.itervalues()):
                 defs_can_optimize = filter(
-                    lambda x: check_var_validity(block_desc, x, is_forward),
+                    lambda x: self._check_var_validity(block_desc, x, is_forward),
                     self._defs[i])
-                out_pair = [
-                    (x, self._find_var(block_desc, x, is_forward).shape())
-                    for x in defs_can_optimize
-                ]
-                for x, x_shape in out_pair:
+                for x in defs_can_optimize:
                     # If x is both in uses and defs, it can not be optimized!
                     if x in self._uses[i]:
                         continue
-                    for index, cache_pair in enumerate(self.pool):
-                        cache_var = cache_pair[0]
-                        cache_shape = cache_pair[1]
-                        if x_shape == cache_shape:
-                            if self._has_var(block_desc, cache_var, is_forward):
-                                x_dtype = self._find_var(block_desc, x,
-                                                         is_forward).dtype()
-                                cache_dtype = self._find_var(
-                                    block_desc, cache_var, is_forward).dtype()
-                                # TODO(qijun): actually, we should compare dtype_to_size[x_dtype]
-                                # and dtype_to_size[cache_dtype]
-                                if x_dtype == cache_dtype:
-                                    print(("Hit Cache !!!! cache pool index "
-                                           "is %d, var name is %s, "
-                                           "cached var name is %s, "
-                                           "var shape is %s ") %
-                                          (index, x, cache_var,
-                                           str(cache_shape)))
-                                    self.pool.pop(index)
-                                    if x == cache_var:
-                                        break
-                                    _rename_arg_(
-                                        self._ops, x, cache_var, begin_idx=i)
-                                    self._program.block(block_desc.id).var(
-                                        str(x)).desc = self._find_var(
-                                            block_desc, cache_var, is_forward)
-                                    self._update_graph(
-                                        x, cache_var, begin_idx=i)
-                                    break
+                    cache_var = self._pool_pop_best_fit(block_desc, x,
+                                                        is_forward)
+                    if cache_var is None or x == cache_var:
+                        continue
+                    if print_log:
+                        print(("Hit Cache !!!! var name is %s, cached var name "
+                               "is %s, var shape is %s, cached var shape is "
+                               "%s") %
+                              (x, cache_var, str(
+                                  self._find_var(block_desc, x, is_forward)
+                                  .shape()), str(
+                                      self._find_var(block_desc, cache_var,
+                                                     is_forward).shape())))
+                    self._rename_var(x, cache_var, begin_idx=i)
+                    self._program.block(block_desc.id).var(str(
+                        x)).desc = self._find_var(block_desc, cache_var,
+                                                  is_forward)
+                    reused += 1
 
             in_diff, out_diff = self._get_diff(self._live_in[i],
                                                self._live_out[i])
             can_optimize = filter(
-                lambda x: check_var_validity(block_desc, x, is_forward),
+                lambda x: self._check_var_validity(block_desc, x, is_forward),
                 in_diff)
-            if can_optimize:
-                for var_name in can_optimize:
-                    self.pool.append((var_name, self._find_var(
-                        block_desc, var_name, is_forward).shape()))
+            for var_name in can_optimize:
+                self._pool_add(block_desc, var_name, is_forward)
+        return reused
 
 
 def get_cfgs(input_program):
@@ -267,7 +399,111 @@ def get_cfgs(input_program):
     return cfgs
 
 
-def memory_optimize(input_program):
+def memory_optimize(input_program, print_log=False, batch_size=1):
+    """
+    Optimize the memory usage of the program by letting the variables reuse
+    the memory of the variables which are not live any more.
+
+    Args:
+        input_program(Program): the program to optimize in place.
+        print_log(bool): whether to print the variables reused.
+        batch_size(int): the batch size used to estimate the peak memory
+            reported.
+
+    Returns:
+        dict: a report of the optimization. "peak_before" and "peak_after"
+        are the estimated peak bytes of the non-persistable variables
+        before and after the optimization, summed over the global block
+        and the while blocks. As the executor keeps all the variables of a
+        run until the run ends, the peak is the total size of the distinct
+        variables. "reused_vars" is the number of variables reusing the
+        memory of others.
+    """
     cfgs = get_cfgs(input_program)
+    report = {'peak_before': 0, 'peak_after': 0, 'reused_vars': 0}
     for cfg in cfgs:
-        cfg.memory_optimize()
+        report['peak_before'] += cfg.allocated_memory(batch_size)
+        report['reused_vars'] += cfg.memory_optimize(print_log)
+        report['peak_after'] += cfg.allocated_memory(batch_size)
+    # the op descs were renamed on the c++ end, invalidate cached programs
+    input_program.bump_version()
+    if print_log:
+        print("memory_optimize: %d vars reused, estimated peak memory %d "
+              "bytes -> %d bytes with batch size %d" %
+              (report['reused_vars'], report['peak_before'],
+               report['peak_after'], batch_size))
+    return report
+
+
+def _persistable_memory(block, batch_size):
+    size = 0
+    for var in block.vars.itervalues():
+        desc = var.desc
+        if desc.persistable() and \
+                desc.type() == core.VarDesc.VarType.LOD_TENSOR and \
+                desc.dtype() in dtype_to_size:
+            size += _var_bytes(desc, batch_size)
+    return size
+
+
+def estimate_memory(program=None, batch_size=1, print_log=False):
+    """
+    Estimate the memory the blocks of a program need without running it.
+
+    The shapes of the variables are resolved by setting their -1 dimensions
+    to batch_size, and the live variables of each op are found by the same
+    liveness analysis memory_optimize uses. The result can be used to choose
+    the batch size, or to decide whether to apply memory_optimize.
+
+    Args:
+        program(Program): the program to analyze, default_main_program() if
+            None.
+        batch_size(int): the batch size to estimate the memory for.
+        print_log(bool): whether to print the estimation of each block.
+
+    Returns:
+        list: a dict for each block, ordered by the block index. The items
+        of the dict are
+
+        - "block_id": the index of the block.
+        - "peak_bytes": the peak bytes of the non-persistable LoDTensors
+          live at an op of the block.
+        - "peak_ops": the (index, type) of the ops reaching the peak.
+        - "allocated_bytes": the total size of the distinct non-persistable
+          LoDTensors of the block, which the executor keeps until a run
+          ends.
+        - "persistable_bytes": the total size of the persistable LoDTensors
+          created in the block, e.g. the parameters.
+    """
+    if program is None:
+        program = default_main_program()
+    pdesc = program.get_desc()
+    reports = []
+    for block_id in range(pdesc.num_blocks()):
+        block_desc = pdesc.block(block_id)
+        ops = [block_desc.op(i) for i in range(block_desc.op_size())]
+        # the ops of the sub blocks use the vars of their ancestor blocks,
+        # which are found recursively for the ops not taken as forward.
+        forward_num = len(ops) if block_id == 0 else 0
+        cfg = ControlFlowGraph(program, ops, forward_num, set())
+        usage = cfg.memory_usage(batch_size)
+        peak = max(usage) if usage else 0
+        peak_ops = [(i, ops[i].type()) for i in range(len(ops))
+                    if peak > 0 and usage[i] == peak]
+        reports.append({
+            'block_id': block_id,
+            'peak_bytes': peak,
+            'peak_ops': peak_ops,
+            'allocated_bytes': cfg.allocated_memory(batch_size),
+            'persistable_bytes':
+            _persistable_memory(program.block(block_id), batch_size)
+        })
+    if print_log:
+        print("estimated memory with batch size %d:" % batch_size)
+        for r in reports:
+            print("block %d: peak %d bytes at ops %s, allocated %d bytes, "
+                  "persistable %d bytes" %
+                  (r['block_id'], r['peak_bytes'], ", ".join(
+                      "%d(%s)" % op for op in r['peak_ops']),
+                   r['allocated_bytes'], r['persistable_bytes']))
+    return reports
@@ -16,7 +16,7 @@ import core
 from contextlib import contextmanager
 import os
 
-__all__ = ['cuda_profiler', 'reset_profiler', 'profiler']
+__all__ = ['cuda_profiler', 'reset_profiler', 'profiler', 'record_event']
 
 NVPROF_CONFIG = [
     "gpustarttimestamp",
@@ -73,7 +73,24 @@ def reset_profiler():
 
 
 @contextmanager
-def profiler(state, sorted_key=None):
+def record_event(name):
+    """The Python side event recorder.
+    record_event records the code in its scope as an event named `name` if
+    the profiler is enabled, which is shown in the profiling report and in
+    the timeline written by profiler with `trace_path`.
+
+    Args:
+        name (string) : The name of the event.
+    """
+    core.push_event(name)
+    try:
+        yield
+    finally:
+        core.pop_event(name)
+
+
+@contextmanager
+def profiler(state, sorted_key=None, trace_path=None):
     """The profiler interface.
     Different from cuda_profiler, this profiler can be used to profile both CPU
     and GPU program. By defalut, it records the CPU and GPU operator kernels,
@@ -95,6 +112,12 @@ def profiler(state, sorted_key=None):
             The `max` means sorting by the maximum execution time.
             The `min` means sorting by the minimum execution time.
             The `ave` means sorting by the average execution time.
+        trace_path (string) : If not None, the timeline of the events is
+            also written into this file in the Chrome trace format, which
+            can be viewed by chrome://tracing. It has the operators with
+            their threads and block indexes, the spans recorded by
+            record_event, e.g. feeding and fetching in Executor.run, and
+            the memory used after each operator.
     """
 
     if state not in ['CPU', 'GPU']:
@@ -117,4 +140,5 @@ def profiler(state, sorted_key=None):
     }
     # TODO(qingqing) : redirect C++ ostream to Python stream.
     # with core.ostream_redirect(stdout=True, stderr=True):
-    core.disable_profiler(key_map[sorted_key])
+    core.disable_profiler(key_map[sorted_key],
+                          '' if trace_path is None else trace_path)
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import numpy
 import paddle.fluid as fluid
 
 
@@ -23,5 +24,46 @@ def test_converter():
     print(result)
 
 
+def test_batched_converter():
+    img = fluid.layers.data(name='batched_image', shape=[1, 28, 28])
+    word = fluid.layers.data(
+        name='word', shape=[1], dtype='int64', lod_level=1)
+    data = [[[i] * 784, range(i + 1)] for i in range(5)]
+    batched = fluid.DataFeeder([img, word], fluid.CPUPlace(), batched=True)
+    generic = fluid.DataFeeder([img, word], fluid.CPUPlace(), batched=False)
+    assert len(batched.batched_converters) == 2
+    # feed twice to check that the reused buffers are reset
+    for _ in range(2):
+        expected = generic.feed(data)
+        result = batched.feed(data)
+        for name in ['batched_image', 'word']:
+            assert numpy.array_equal(
+                numpy.array(result[name]), numpy.array(expected[name]))
+            assert result[name].lod() == expected[name].lod()
+
+
+def test_batched_converter_flat_and_mismatched():
+    img = fluid.layers.data(name='chw_image', shape=[3, 4, 4])
+    flat = [[numpy.arange(48) + i] for i in range(3)]
+    nested = [[s[0].reshape((3, 4, 4))] for s in flat]
+    feeder = fluid.DataFeeder([img], fluid.CPUPlace(), batched=True)
+    assert len(feeder.batched_converters) == 1
+    expected = numpy.array([s[0] for s in nested], dtype='float32')
+    for data in [flat, nested]:
+        result = numpy.array(feeder.feed(data)['chw_image'])
+        assert numpy.array_equal(result, expected)
+
+    # neither a scalar nor a row is broadcast into the sample
+    for sample in [1.0, numpy.arange(4)]:
+        try:
+            feeder.feed([[sample]])
+        except ValueError:
+            pass
+        else:
+            assert False, "the mismatched sample should be rejected"
+
+
 if __name__ == '__main__':
     test_converter()
+    test_batched_converter()
+    test_batched_converter_flat_and_mismatched()
@@ -0,0 +1,113 @@
+#   Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+import paddle.fluid as fluid
+import paddle.fluid.core as core
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.main = fluid.Program()
+        self.startup = fluid.Program()
+        with fluid.program_guard(self.main, self.startup):
+            x = fluid.layers.data(name='x', shape=[13], dtype='float32')
+            hidden = fluid.layers.fc(input=x, size=20, act='relu')
+            fluid.layers.fc(input=hidden, size=1)
+        self.exe = fluid.Executor(core.CPUPlace())
+        self.scope = core.Scope()
+        with fluid.scope_guard(self.scope):
+            self.exe.run(self.startup)
+        self.params = [p.name for p in self.main.global_block().all_parameters()]
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def values(self, scope):
+        return dict((name, numpy.array(scope.find_var(name).get_tensor()))
+                    for name in self.params)
+
+    def check_load(self, **kwargs):
+        expected = self.values(self.scope)
+        scope = core.Scope()
+        names = fluid.io.load_checkpoint(
+            self.exe, self.dirname, self.main, scope=scope, **kwargs)
+        self.assertEqual(sorted(names), sorted(self.params))
+        for name, value in self.values(scope).iteritems():
+            self.assertTrue(numpy.array_equal(value, expected[name]))
+
+    def test_save_load(self):
+        fluid.io.save_checkpoint(
+            self.dirname, self.main, shard_num=3, scope=self.scope)
+        self.assertTrue(
+            os.path.exists(
+                os.path.join(self.dirname, fluid.io.CHECKPOINT_INDEX_FILE)))
+        self.check_load()
+        self.check_load(use_mmap=False)
+
+    def test_async_save(self):
+        handle = fluid.io.save_checkpoint(
+            self.dirname, self.main, async_save=True, scope=self.scope)
+        handle.wait()
+        self.assertTrue(handle.done())
+        self.check_load()
+
+    def test_save_over(self):
+        fluid.io.save_checkpoint(
+            self.dirname, self.main, shard_num=3, scope=self.scope)
+        old_files = set(os.listdir(self.dirname))
+        # change the values, and save them over the old checkpoint
+        for name in self.params:
+            tensor = self.scope.find_var(name).get_tensor()
+            tensor.set(numpy.array(tensor) + 1, core.CPUPlace())
+        fluid.io.save_checkpoint(
+            self.dirname, self.main, shard_num=2, scope=self.scope)
+        self.check_load()
+
+        with open(os.path.join(self.dirname,
+                               fluid.io.CHECKPOINT_INDEX_FILE)) as f:
+            shards = json.load(f)['shards']
+        self.assertEqual(len(shards), 2)
+        # the new shards never overwrite the old ones, which are removed
+        # after the new index is written
+        self.assertFalse(set(shards) & old_files)
+        self.assertEqual(
+            sorted(os.listdir(self.dirname)),
+            sorted(shards + [fluid.io.CHECKPOINT_INDEX_FILE]))
+
+    def test_partial_load(self):
+        fluid.io.save_checkpoint(self.dirname, self.main, scope=self.scope)
+        scope = core.Scope()
+        names = fluid.io.load_checkpoint(
+            self.exe,
+            self.dirname,
+            self.main,
+            name_pattern='*.b_*',
+            scope=scope)
+        self.assertGreater(len(names), 0)
+        for name in names:
+            self.assertIn('.b_', name)
+        for name in self.params:
+            if name not in names:
+                self.assertIsNone(scope.find_var(name))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#   Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import paddle.fluid.core as core
+import numpy as np
+from paddle.fluid.op import Operator
+
+
+class TestCompressGrad(unittest.TestCase):
+    def setUp(self):
+        self.shape = [31, 17]
+        self.place = core.CPUPlace()
+        self.x = np.random.uniform(-1, 1, self.shape).astype("float32")
+
+    def run_ops(self, method, ratio=0.01, residual=None):
+        scope = core.Scope()
+        scope.var("X").get_tensor().set(self.x, self.place)
+        scope.var("Out")
+        scope.var("Restored")
+        kwargs = {}
+        if residual is not None:
+            scope.var("Residual").get_tensor().set(residual, self.place)
+            kwargs = {"Residual": "Residual", "ResidualOut": "Residual"}
+        Operator(
+            "compress_grad",
+            X="X",
+            Out="Out",
+            method=method,
+            ratio=ratio,
+            **kwargs).run(scope, self.place)
+        Operator(
+            "decompress_grad",
+            X="Out",
+            Out="Restored",
+            shape=self.shape,
+            method=method).run(scope, self.place)
+        compressed = np.array(scope.find_var("Out").get_tensor())
+        restored = np.array(scope.find_var("Restored").get_tensor())
+        if residual is not None:
+            residual = np.array(scope.find_var("Residual").get_tensor())
+        return compressed, restored, residual
+
+    def test_fp16(self):
+        compressed, restored, _ = self.run_ops("fp16")
+        self.assertEqual(compressed.size, (self.x.size + 1) / 2)
+        self.assertTrue(np.allclose(restored, self.x, atol=1e-3))
+
+    def test_int8(self):
+        residual = np.random.uniform(-0.01, 0.01,
+                                     self.shape).astype("float32")
+        expected = self.x + residual
+        compressed, restored, residual = self.run_ops("int8", residual=residual)
+        self.assertEqual(compressed.size, 1 + (self.x.size + 3) / 4)
+        scale = np.abs(expected).max() / 127
+        self.assertTrue(np.allclose(restored, expected, atol=scale))
+        # the error is fed back by the residual
+        self.assertTrue(np.allclose(restored + residual, expected, atol=1e-6))
+
+    def test_topk(self):
+        residual = np.zeros(self.shape).astype("float32")
+        compressed, restored, residual = self.run_ops(
+            "topk", ratio=0.1, residual=residual)
+        k = int(np.ceil(self.x.size * 0.1))
+        self.assertEqual(compressed.size, 2 * k)
+        self.assertEqual(np.count_nonzero(restored), k)
+        threshold = np.sort(np.abs(self.x).flatten())[-k]
+        self.assertTrue(np.all(np.abs(restored[restored != 0]) >= threshold))
+        self.assertTrue(np.allclose(restored + residual, self.x))
+
+
+if __name__ == '__main__':
+    unittest.main()
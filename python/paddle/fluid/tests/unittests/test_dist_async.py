@@ -0,0 +1,116 @@
+#   Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import paddle.fluid as fluid
+import numpy
+from multiprocessing import Process, Queue
+import os
+import time
+
+PSERVER = "127.0.0.1:6180"
+TRAINERS = 2
+
+
+def transpile(trainer_id, is_pserver=False):
+    main = fluid.Program()
+    startup = fluid.Program()
+    with fluid.program_guard(main, startup):
+        x = fluid.layers.data(name='x', shape=[13], dtype='float32')
+        y = fluid.layers.data(name='y', shape=[1], dtype='float32')
+        y_predict = fluid.layers.fc(input=x, size=1)
+        cost = fluid.layers.square_error_cost(input=y_predict, label=y)
+        avg_cost = fluid.layers.mean(x=cost)
+        sgd = fluid.optimizer.SGD(learning_rate=0.001)
+        optimize_ops, params_grads = sgd.minimize(avg_cost)
+
+        t = fluid.DistributeTranspiler()
+        t.transpile(
+            optimize_ops,
+            params_grads,
+            trainer_id,
+            program=main,
+            pservers=PSERVER,
+            trainers=TRAINERS,
+            sync_mode=False,
+            max_staleness=10)
+        if is_pserver:
+            pserver_program = t.get_pserver_program(PSERVER)
+            return pserver_program, t.get_startup_program(PSERVER,
+                                                          pserver_program)
+        return t.get_trainer_program(), startup
+
+
+def run_pserver():
+    pserver_program, startup = transpile(0, is_pserver=True)
+    exe = fluid.Executor(fluid.CPUPlace())
+    exe.run(startup)
+    exe.run(pserver_program)
+
+
+def run_trainer(trainer_id, steps, results):
+    trainer_program, startup = transpile(trainer_id)
+    exe = fluid.Executor(fluid.CPUPlace())
+    exe.run(startup)
+    param = trainer_program.global_block().all_parameters()[0].name
+    params = []
+    for _ in xrange(steps):
+        exe.run(trainer_program,
+                feed={
+                    "x": numpy.random.random((8, 13)).astype("float32"),
+                    "y": numpy.random.random((8, 1)).astype("float32")
+                })
+        # the param is fetched from the pserver by each step
+        params.append(numpy.array(fluid.fetch_var(param)))
+    results.put((trainer_id, params[0], params[-1]))
+
+
+class TestAsyncPserver(unittest.TestCase):
+    def test_no_barrier(self):
+        pserver = Process(target=run_pserver)
+        pserver.daemon = True
+        pserver.start()
+        time.sleep(1)
+        # the trainers run different numbers of steps, so the faster one
+        # would wait for the other forever in the sync mode.
+        results = Queue()
+        trainers = [
+            Process(
+                target=run_trainer, args=(i, 10 * (i + 1), results))
+            for i in xrange(TRAINERS)
+        ]
+        for p in trainers:
+            p.start()
+        try:
+            params = [results.get(timeout=60) for _ in trainers]
+            for p in trainers:
+                p.join(60)
+                self.assertEqual(p.exitcode, 0)
+            # the async updates of the trainers reached the pserver, so the
+            # params fetched by the later steps differ from the first ones.
+            for trainer_id, first, last in params:
+                self.assertEqual(first.shape, last.shape)
+                self.assertFalse(numpy.allclose(first, last))
+        finally:
+            for p in trainers:
+                if p.is_alive():
+                    p.terminate()
+            # FIXME(typhoonzero): find a way to gracefully shutdown the server.
+            os.system("kill -9 %d" % pserver.pid)
+            pserver.join()
+
+
+if __name__ == "__main__":
+    unittest.main()
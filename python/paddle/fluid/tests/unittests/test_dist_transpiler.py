@@ -0,0 +1,161 @@
+#   Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import paddle.fluid as fluid
+
+
+class TestDistTranspiler(unittest.TestCase):
+    def setUp(self):
+        self.pservers = "127.0.0.1:6174,127.0.0.1:6175"
+        self.main_program = fluid.Program()
+        self.startup_program = fluid.Program()
+        with fluid.program_guard(self.main_program, self.startup_program):
+            x = fluid.layers.data(name='x', shape=[13], dtype='float32')
+            y = fluid.layers.data(name='y', shape=[1], dtype='float32')
+            hidden = x
+            for _ in xrange(4):
+                hidden = fluid.layers.fc(input=hidden, size=8, act='relu')
+            y_predict = fluid.layers.fc(input=hidden, size=1)
+            cost = fluid.layers.square_error_cost(input=y_predict, label=y)
+            avg_cost = fluid.layers.mean(x=cost)
+            sgd = fluid.optimizer.SGD(learning_rate=0.001)
+            self.optimize_ops, self.params_grads = sgd.minimize(avg_cost)
+
+    def transpile(self, fuse_grad_size_mb, grad_compression=None,
+                  sync_mode=True):
+        t = fluid.DistributeTranspiler()
+        with fluid.program_guard(self.main_program, self.startup_program):
+            t.transpile(
+                self.optimize_ops,
+                self.params_grads,
+                trainer_id=0,
+                program=self.main_program,
+                pservers=self.pservers,
+                trainers=2,
+                fuse_grad_size_mb=fuse_grad_size_mb,
+                grad_compression=grad_compression,
+                sync_mode=sync_mode)
+        return t
+
+    def test_fuse_grad(self):
+        t = self.transpile(1)
+        trainer_ops = t.get_trainer_program().global_block().ops
+        send_op = [op for op in trainer_ops if op.type == "send"][0]
+        recv_op = [op for op in trainer_ops if op.type == "recv"][0]
+        # all the grads are small, so one fused buffer for each pserver
+        self.assertEqual(
+            sorted(send_op.input("X")),
+            ["fused_grad.0.0.trainer_0", "fused_grad.1.0.trainer_0"])
+        self.assertEqual(send_op.output("Out"), [])
+        self.assertEqual(
+            len(recv_op.output("Out")), len(self.params_grads))
+
+        grads_on_pservers = 0
+        for ep in self.pservers.split(","):
+            pserver_program = t.get_pserver_program(ep)
+            optimize_ops = pserver_program.block(1).ops
+            grads = t.param_grad_ep_mapping[ep]["grads"]
+            grads_on_pservers += len(grads)
+            # each trainer's fused buffer is split and reshaped back into
+            # its grads before they are summed.
+            self.assertEqual([op.type for op in optimize_ops[:2]],
+                             ["split", "reshape"])
+            self.assertEqual(
+                len([op for op in optimize_ops if op.type == "reshape"]),
+                2 * len(grads))
+            for op in optimize_ops:
+                if op.type == "split":
+                    self.assertEqual(len(op.output("Out")), len(grads))
+        self.assertEqual(grads_on_pservers, len(self.params_grads))
+
+    def test_no_fuse(self):
+        t = self.transpile(0)
+        trainer_ops = t.get_trainer_program().global_block().ops
+        self.assertEqual([op for op in trainer_ops if op.type == "recv"], [])
+        send_op = [op for op in trainer_ops if op.type == "send"][0]
+        self.assertEqual(len(send_op.input("X")), len(self.params_grads))
+
+    def test_compress_fused_grad(self):
+        t = self.transpile(1, grad_compression="int8")
+        trainer_ops = t.get_trainer_program().global_block().ops
+        compress_ops = [op for op in trainer_ops if op.type == "compress_grad"]
+        send_op = [op for op in trainer_ops if op.type == "send"][0]
+        self.assertEqual(
+            sorted(send_op.input("X")), [
+                "fused_grad.0.0.compressed.trainer_0",
+                "fused_grad.1.0.compressed.trainer_0"
+            ])
+        self.assertEqual(len(compress_ops), 2)
+        for op in compress_ops:
+            self.assertEqual(op.input("Residual"), op.output("ResidualOut"))
+
+        for ep in self.pservers.split(","):
+            optimize_ops = t.get_pserver_program(ep).block(1).ops
+            # decompress the buffer of each trainer, then unpack them
+            self.assertEqual([op.type for op in optimize_ops[:3]],
+                             ["decompress_grad", "decompress_grad", "split"])
+
+    def test_compress_startup_program(self):
+        default_startup_ops = len(
+            fluid.default_startup_program().global_block().ops)
+        t = fluid.DistributeTranspiler()
+        # no program_guard, the startup program is passed instead
+        t.transpile(
+            self.optimize_ops,
+            self.params_grads,
+            trainer_id=0,
+            program=self.main_program,
+            pservers=self.pservers,
+            trainers=2,
+            grad_compression="int8",
+            startup_program=self.startup_program)
+        residuals = [
+            op.input("Residual")[0]
+            for op in t.get_trainer_program().global_block().ops
+            if op.type == "compress_grad"
+        ]
+        self.assertEqual(len(residuals), len(self.params_grads))
+        startup_outputs = [
+            op.output("Out")[0]
+            for op in self.startup_program.global_block().ops
+            if op.type == "fill_constant"
+        ]
+        for residual in residuals:
+            self.assertIn(residual, startup_outputs)
+        self.assertEqual(
+            len(fluid.default_startup_program().global_block().ops),
+            default_startup_ops)
+
+    def test_async(self):
+        t = self.transpile(0, sync_mode=False)
+        for ep in self.pservers.split(","):
+            pserver_program = t.get_pserver_program(ep)
+            listen_op = pserver_program.global_block().ops[-1]
+            self.assertFalse(listen_op.attr("sync_mode"))
+            grad_to_block_id = listen_op.attr("grad_to_block_id")
+            grads = t.param_grad_ep_mapping[ep]["grads"]
+            # one block for each grad of each trainer
+            self.assertEqual(len(grad_to_block_id), 2 * len(grads))
+            for grad_and_id in grad_to_block_id:
+                grad_name, block_id = grad_and_id.split(":")
+                ops = pserver_program.block(int(block_id)).ops
+                self.assertEqual([op.type for op in ops], ["sgd"])
+                self.assertEqual(ops[0].input("Grad"), [grad_name])
+            # no grads are merged in the optimize block
+            self.assertEqual(pserver_program.block(1).ops, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#   Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import paddle.fluid as fluid
+from paddle.fluid.distributed_spliter import SizeBalanced, size_balanced
+from paddle.fluid.distribute_transpiler import split_dense_variable
+
+
+class TestSizeBalanced(unittest.TestCase):
+    def setUp(self):
+        program = fluid.Program()
+        # one large block and several small ones, round robin would put
+        # the large block and half of the small ones on the same server.
+        shapes = [[4096, 64]] + [[512, 64]] * 8 + [[64]] * 4
+        self.var_list = []
+        for i, shape in enumerate(shapes):
+            self.var_list.append(program.global_block().create_var(
+                name="var_%d" % i, persistable=True, shape=shape))
+        self.endpoints = ["127.0.0.1:6174", "127.0.0.1:6175"]
+
+    def numel(self, eplist, ep):
+        total = 0
+        for var, var_ep in zip(self.var_list, eplist):
+            if var_ep == ep:
+                total += reduce(lambda x, y: x * y, var.shape)
+        return total
+
+    def test_balanced(self):
+        eplist = size_balanced(self.var_list, self.endpoints)
+        self.assertEqual(len(eplist), len(self.var_list))
+        self.assertEqual(
+            self.numel(eplist, self.endpoints[0]),
+            self.numel(eplist, self.endpoints[1]))
+
+    def test_capacities(self):
+        split_method = SizeBalanced(
+            capacities={self.endpoints[0]: 3}, optimizer="adam")
+        eplist = split_method(self.var_list, self.endpoints)
+        self.assertGreater(
+            self.numel(eplist, self.endpoints[0]),
+            2 * self.numel(eplist, self.endpoints[1]))
+        placement = split_method.placement
+        self.assertEqual([p["endpoint"] for p in placement], self.endpoints)
+        self.assertEqual(
+            sum(len(p["vars"]) for p in placement), len(self.var_list))
+        report = split_method.report()
+        for ep in self.endpoints:
+            self.assertIn(ep, report)
+
+    def test_split_blocks(self):
+        program = fluid.Program()
+        block = program.global_block()
+        var_list = [
+            block.create_var(
+                name="w", persistable=True, shape=[2048]), block.create_var(
+                    name="b", persistable=True, shape=[3072])
+        ]
+        blocks = []
+        for block_str in split_dense_variable(var_list, 2):
+            varname, block_id, size = block_str.split(":")
+            blocks.append(
+                block.create_var(
+                    name="%s@GRAD.block%s.trainer_0" % (varname, block_id),
+                    shape=[long(size)]))
+        self.assertEqual(len(blocks), 4)
+
+        # the blocks of w fill an endpoint of 3 times the capacity, and the
+        # blocks of b would collide by equal capacities.
+        for capacities in [{self.endpoints[0]: 3}, None]:
+            eplist = SizeBalanced(capacities=capacities)(blocks,
+                                                         self.endpoints)
+            for varname in ["w", "b"]:
+                eps = [
+                    ep for var, ep in zip(blocks, eplist)
+                    if var.name.startswith(varname + "@GRAD.block")
+                ]
+                self.assertEqual(len(set(eps)), len(eps))
+
+    def test_unknown_optimizer(self):
+        self.assertRaises(ValueError, SizeBalanced, optimizer="unknown")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#   Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+
+import numpy
+import paddle.fluid as fluid
+import paddle.fluid.core as core
+
+
+class TestInterOpParallel(unittest.TestCase):
+    def build_program(self):
+        main = fluid.Program()
+        startup = fluid.Program()
+        with fluid.program_guard(main, startup):
+            x = fluid.layers.data(name='x', shape=[32], dtype='float32')
+            label = fluid.layers.data(name='label', shape=[1], dtype='int64')
+            # independent branches
+            branches = [
+                fluid.layers.fc(input=x,
+                                size=16,
+                                act='relu',
+                                param_attr=fluid.ParamAttr(
+                                    initializer=fluid.initializer.Constant(
+                                        0.01 * (i + 1)))) for i in xrange(4)
+            ]
+            concat = fluid.layers.concat(input=branches, axis=1)
+            predict = fluid.layers.fc(
+                input=concat,
+                size=10,
+                act='softmax',
+                param_attr=fluid.ParamAttr(
+                    initializer=fluid.initializer.Constant(0.02)))
+            cost = fluid.layers.cross_entropy(input=predict, label=label)
+            avg_cost = fluid.layers.mean(cost)
+            fluid.optimizer.SGD(learning_rate=0.1).minimize(avg_cost)
+        return main, startup, avg_cost
+
+    def train(self, inter_op_threads):
+        main, startup, avg_cost = self.build_program()
+        numpy.random.seed(1)
+        exe = fluid.Executor(
+            core.CPUPlace(), inter_op_threads=inter_op_threads)
+        losses = []
+        with fluid.scope_guard(core.Scope()):
+            exe.run(startup)
+            for _ in xrange(5):
+                x = numpy.random.random((8, 32)).astype('float32')
+                label = numpy.random.randint(0, 10, (8, 1)).astype('int64')
+                loss, = exe.run(main,
+                                feed={'x': x,
+                                      'label': label},
+                                fetch_list=[avg_cost])
+                losses.append(loss)
+        return losses
+
+    def test_same_result(self):
+        serial = self.train(1)
+        parallel = self.train(4)
+        for a, b in zip(serial, parallel):
+            self.assertTrue(numpy.allclose(a, b))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -18,7 +18,7 @@ import unittest
 import paddle.fluid.layers as layers
 import paddle.fluid.optimizer as optimizer
 from paddle.fluid.framework import Program, program_guard
-from paddle.fluid.memory_optimization_transpiler import memory_optimize
+from paddle.fluid.memory_optimization_transpiler import memory_optimize, estimate_memory
 
 
 class TestControlFlowGraph(unittest.TestCase):
@@ -38,9 +38,26 @@ class TestControlFlowGraph(unittest.TestCase):
     def test_control_flow_graph(self):
         print("before optimization")
         print(str(self.program))
-        result_program = memory_optimize(self.program)
+        report = memory_optimize(self.program, print_log=True)
         print("after optimization")
-        print(str(result_program))
+        print(str(self.program))
+        self.assertGreater(report['reused_vars'], 0)
+        self.assertLess(report['peak_after'], report['peak_before'])
+
+    def test_estimate_memory(self):
+        reports = estimate_memory(self.program, batch_size=8, print_log=True)
+        self.assertEqual(len(reports), len(self.program.blocks))
+        block = reports[0]
+        self.assertGreater(block['peak_bytes'], 0)
+        self.assertGreater(len(block['peak_ops']), 0)
+        self.assertLessEqual(block['peak_bytes'], block['allocated_bytes'])
+        # fc weight 13x1 and bias 1 of float32 at least
+        self.assertGreaterEqual(block['persistable_bytes'], 14 * 4)
+
+        larger = estimate_memory(self.program, batch_size=16)[0]
+        self.assertGreater(larger['peak_bytes'], block['peak_bytes'])
+        self.assertEqual(larger['persistable_bytes'],
+                         block['persistable_bytes'])
 
 
 if __name__ == "__main__":
@@ -14,6 +14,9 @@
 
 import unittest
 import os
+import json
+import shutil
+import tempfile
 import numpy as np
 import paddle.fluid as fluid
 import paddle.fluid.profiler as profiler
@@ -22,6 +25,12 @@ import paddle.fluid.core as core
 
 
 class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
     def test_nvprof(self):
         if not fluid.core.is_compiled_with_cuda():
             return
@@ -41,7 +50,7 @@ class TestProfiler(unittest.TestCase):
                 exe.run(fluid.default_main_program(), feed={'data': input})
         os.remove(output_file)
 
-    def net_profiler(self, state):
+    def net_profiler(self, state, trace_path=None):
         if state == 'GPU' and not core.is_compiled_with_cuda():
             return
         startup_program = fluid.Program()
@@ -65,7 +74,7 @@ class TestProfiler(unittest.TestCase):
         exe.run(startup_program)
 
         accuracy.reset(exe)
-        with profiler.profiler(state, 'total') as prof:
+        with profiler.profiler(state, 'total', trace_path) as prof:
             for iter in range(10):
                 if iter == 2:
                     profiler.reset_profiler()
@@ -85,6 +94,22 @@ class TestProfiler(unittest.TestCase):
     def test_cuda_profiler(self):
         self.net_profiler('GPU')
 
+    def test_chrome_trace(self):
+        trace_path = os.path.join(self.dirname, 'trace.json')
+        self.net_profiler('CPU', trace_path)
+        with open(trace_path) as f:
+            trace = json.load(f)
+        events = trace['traceEvents']
+        ops = [e for e in events if e.get('cat') == 'op']
+        self.assertTrue(any(e['name'] == 'mul' for e in ops))
+        for e in ops:
+            self.assertEqual(e['ph'], 'X')
+            self.assertEqual(e['args']['block_id'], 0)
+        names = set(e['name'] for e in events)
+        self.assertIn('Executor.run/feed', names)
+        self.assertIn('Executor.run/fetch', names)
+        self.assertIn('memory_used', names)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,164 @@
+#   Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import gc
+import unittest
+
+import numpy
+import paddle.fluid.core as core
+
+from paddle.fluid.executor import Executor, ProgramCache, global_scope
+from paddle.fluid.framework import Program, program_guard
+from paddle.fluid.layers import mul, data, scale
+
+
+class TestProgramCache(unittest.TestCase):
+    def setUp(self):
+        self.program = Program()
+        with program_guard(self.program, Program()):
+            a = data(name='a', shape=[10], dtype='float32')
+            b = data(
+                name='b',
+                shape=[10, 5],
+                dtype='float32',
+                append_batch_size=False)
+            self.out = mul(x=a, y=b)
+        self.a_np = numpy.random.random((3, 10)).astype('float32')
+        self.b_np = numpy.random.random((10, 5)).astype('float32')
+
+    def run_program(self, exe):
+        outs = exe.run(self.program,
+                       feed={'a': self.a_np,
+                             'b': self.b_np},
+                       fetch_list=[self.out])
+        self.assertTrue(
+            numpy.allclose(outs[0], numpy.dot(self.a_np, self.b_np)))
+
+    def test_hit(self):
+        exe = Executor(core.CPUPlace())
+        for _ in xrange(3):
+            self.run_program(exe)
+        self.assertEqual(exe.program_cache.misses, 1)
+        self.assertEqual(exe.program_cache.hits, 2)
+        self.assertEqual(len(exe.program_cache), 1)
+
+    def test_invalidate_on_modify(self):
+        exe = Executor(core.CPUPlace())
+        self.run_program(exe)
+        version = self.program.version
+        with program_guard(self.program, Program()):
+            scale(x=self.out, scale=2.0)
+        self.assertGreater(self.program.version, version)
+        self.run_program(exe)
+        self.assertEqual(exe.program_cache.misses, 2)
+        self.assertEqual(exe.program_cache.hits, 0)
+
+    def test_invalidate_on_rename_input(self):
+        exe = Executor(core.CPUPlace())
+        self.run_program(exe)
+        block = self.program.global_block()
+        block.create_var(name='c', shape=[10, 5], dtype='float32')
+        version = self.program.version
+        block.ops[-1].rename_input('b', 'c')
+        self.assertGreater(self.program.version, version)
+        outs = exe.run(self.program,
+                       feed={'a': self.a_np,
+                             'c': self.b_np},
+                       fetch_list=[self.out])
+        self.assertTrue(
+            numpy.allclose(outs[0], numpy.dot(self.a_np, self.b_np)))
+        self.assertEqual(exe.program_cache.misses, 2)
+
+        version = self.program.version
+        block.var('c').persistable = False
+        self.assertGreater(self.program.version, version)
+
+    def test_switch_scope(self):
+        exe = Executor(core.CPUPlace())
+        scopes = [core.Scope(), core.Scope()]
+        for i in xrange(4):
+            outs = exe.run(self.program,
+                           feed={'a': self.a_np,
+                                 'b': self.b_np},
+                           fetch_list=[self.out],
+                           scope=scopes[i % 2])
+            self.assertTrue(
+                numpy.allclose(outs[0], numpy.dot(self.a_np, self.b_np)))
+        self.assertEqual(exe.program_cache.hits, 3)
+
+    def test_free_local_scope(self):
+        scope = global_scope()
+        kids_num = scope.kids_num()
+        exe = Executor(core.CPUPlace())
+        for _ in xrange(2):
+            self.run_program(exe)
+            self.assertEqual(scope.kids_num(), kids_num)
+        self.assertEqual(exe.program_cache.hits, 1)
+
+    def test_release_local_scopes(self):
+        scope = global_scope()
+        kids_num = scope.kids_num()
+        for _ in xrange(3):
+            exe = Executor(core.CPUPlace(), keep_local_scope=True)
+            self.run_program(exe)
+            self.assertEqual(scope.kids_num(), kids_num + 1)
+            del exe
+            gc.collect()
+            self.assertEqual(scope.kids_num(), kids_num)
+
+        exe = Executor(core.CPUPlace(), keep_local_scope=True)
+        self.run_program(exe)
+        exe.close()
+        self.assertEqual(len(exe.program_cache), 0)
+        self.assertEqual(scope.kids_num(), kids_num)
+
+    def test_disable_cache(self):
+        exe = Executor(core.CPUPlace())
+        exe.run(self.program,
+                feed={'a': self.a_np,
+                      'b': self.b_np},
+                fetch_list=[self.out],
+                use_program_cache=False)
+        self.assertEqual(len(exe.program_cache), 0)
+        self.assertEqual(exe.program_cache.misses, 0)
+
+
+class TestProgramCacheEviction(unittest.TestCase):
+    def test_lru(self):
+        cache = ProgramCache(capacity=2)
+        programs = [Program() for _ in xrange(3)]
+        for i, p in enumerate(programs):
+            cache.put(i, p, p)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(0, programs[0]))
+        self.assertIs(cache.get(1, programs[1]), programs[1])
+        cache.put(3, programs[0], programs[0])
+        # key 2 is the least recently used one
+        self.assertIsNone(cache.get(2, programs[2]))
+        self.assertIs(cache.get(1, programs[1]), programs[1])
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 2)
+
+    def test_release(self):
+        released = []
+        cache = ProgramCache(capacity=1, release=released.append)
+        programs = [Program() for _ in xrange(2)]
+        cache.put(0, programs[0], 'a')
+        cache.put(1, programs[1], 'b')
+        self.assertEqual(released, ['a'])
+        cache.clear()
+        self.assertEqual(released, ['a', 'b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
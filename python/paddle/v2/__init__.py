@@ -17,6 +17,7 @@ import layer
 import activation
 import parameters
 import trainer
+import checkpoint
 import event
 import data_type
 import topology
@@ -44,6 +45,7 @@ __all__ = [
     'parameters',
     'init',
     'trainer',
+    'checkpoint',
     'event',
     'data_type',
     'attr',
@@ -154,3 +156,4 @@ def init(**kwargs):
 
 infer = inference.infer
 batch = minibatch.batch
+bucket_batch = minibatch.bucket_batch
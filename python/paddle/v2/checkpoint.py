@@ -0,0 +1,137 @@
+# Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Asynchronous checkpointing of the parameters.
+
+The parameters are copied into a snapshot on the training thread, which is
+fast, and the snapshot is written into a tar file by a background thread
+while the training goes on.
+"""
+
+import glob
+import os
+import threading
+
+from . import parameters as v2_parameters
+
+__all__ = ['AsyncCheckpointer']
+
+
+class AsyncCheckpointer(object):
+    """
+    Write the snapshots of the parameters into tar files in a directory in
+    the background.
+
+    Each checkpoint is written to a temporary file first, and renamed to
+    `<prefix>-<tag>.tar` when it is completed, so a checkpoint file is never
+    partially written. Only the latest max_to_keep checkpoints are kept.
+    At most one checkpoint is written at a time, saving another one waits
+    for the previous one.
+
+    The tar files are in the format of `Parameters.to_tar`, and can be
+    loaded by `Parameters.from_tar`.
+
+    :param dirname: the directory to save the checkpoints in.
+    :type dirname: basestring
+    :param max_to_keep: the number of the latest checkpoints to keep, all
+                        are kept if it is None.
+    :type max_to_keep: int
+    :param prefix: the prefix of the checkpoint file names.
+    :type prefix: basestring
+    """
+
+    def __init__(self, dirname, max_to_keep=5, prefix="checkpoint"):
+        if max_to_keep is not None and max_to_keep <= 0:
+            raise ValueError("max_to_keep must be positive or None")
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self.dirname = dirname
+        self.max_to_keep = max_to_keep
+        self.prefix = prefix
+        self.__thread__ = None
+        self.__error__ = None
+
+    def checkpoints(self):
+        """
+        :return: the paths of the checkpoints completed, oldest first.
+        :rtype: list
+        """
+        files = glob.glob(os.path.join(self.dirname, self.prefix + "-*.tar"))
+        return sorted(files, key=lambda f: (os.path.getmtime(f), f))
+
+    def latest(self):
+        """
+        :return: the path of the latest checkpoint, or None.
+        """
+        files = self.checkpoints()
+        return files[-1] if files else None
+
+    def save(self, snapshot, tag):
+        """
+        Start writing a snapshot of the parameters in the background.
+
+        :param snapshot: the snapshot taken by `Parameters.snapshot` or
+                         `SGD.snapshot_parameters`.
+        :type snapshot: OrderedDict
+        :param tag: the tag in the file name, e.g. "pass-1-batch-100".
+        :type tag: basestring
+        :return: the path the checkpoint will be written to.
+        """
+        self.wait()
+        filename = os.path.join(self.dirname,
+                                "%s-%s.tar" % (self.prefix, tag))
+        self.__thread__ = threading.Thread(
+            target=self.__write__, args=(snapshot, filename))
+        self.__thread__.daemon = True
+        self.__thread__.start()
+        return filename
+
+    def done(self):
+        """
+        :return: whether no checkpoint is being written.
+        """
+        return self.__thread__ is None or not self.__thread__.is_alive()
+
+    def wait(self):
+        """
+        Wait for the checkpoint being written, and raise the error raised
+        while writing it.
+        """
+        if self.__thread__ is not None:
+            self.__thread__.join()
+            self.__thread__ = None
+        if self.__error__ is not None:
+            error, self.__error__ = self.__error__, None
+            raise error
+
+    def __write__(self, snapshot, filename):
+        tmp_filename = filename + ".tmp"
+        try:
+            with open(tmp_filename, "wb") as f:
+                v2_parameters.snapshot_to_tar(snapshot, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.rename(tmp_filename, filename)
+            self.__remove_old__()
+        except Exception as e:
+            self.__error__ = e
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+
+    def __remove_old__(self):
+        if self.max_to_keep is None:
+            return
+        files = self.checkpoints()
+        for f in files[:max(0, len(files) - self.max_to_keep)]:
+            os.remove(f)
@@ -0,0 +1,346 @@
+#   Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+A persistent cache of the parsed samples of the datasets.
+
+The samples a dataset reader yields are written once into a memmap shard of
+`paddle.v2.dataset.common` under CACHE_HOME, and later processes load them
+back by mapping the file instead of parsing the raw archives again. A cache
+entry is keyed on the module name, the md5 of the source archives and the
+arguments of the reader, so changing any of them builds a new entry, and
+the old one is left behind. All of the entries can be removed by `clear`.
+
+Set the environment variable PADDLE_DATASET_CACHE=0 to disable the cache.
+
+The caches can be prebuilt by the command line:
+
+    python -m paddle.v2.dataset.cache build [module ...]
+    python -m paddle.v2.dataset.cache list [module ...]
+    python -m paddle.v2.dataset.cache clear [module ...]
+"""
+
+import argparse
+import errno
+import glob
+import hashlib
+import importlib
+import itertools
+import json
+import os
+import time
+
+import paddle.v2.dataset.common
+# the dataset modules import this module while the package is initialized,
+# when paddle.v2.dataset.common can not be accessed as an attribute yet.
+from paddle.v2.dataset.common import DATA_HOME
+
+__all__ = [
+    'CACHE_HOME',
+    'enabled',
+    'cache_file',
+    'load_or_build',
+    'cached_reader',
+    'entries',
+    'clear',
+]
+
+CACHE_HOME = os.path.join(DATA_HOME, 'cache')
+
+# bump it to invalidate all of the caches when the format of the cached
+# samples changes.
+CACHE_VERSION = 1
+
+
+def enabled():
+    """
+    Whether the cache is enabled by the environment variable
+    PADDLE_DATASET_CACHE, which is enabled by default.
+    """
+    return os.environ.get('PADDLE_DATASET_CACHE', '1') != '0'
+
+
+def cache_file(module_name, sources, args):
+    """
+    The path of the cache entry.
+
+    :param module_name: the name of the dataset module, e.g. "imdb".
+    :type module_name: basestring
+    :param sources: the md5 of the source archives.
+    :type sources: list
+    :param args: the arguments of the reader, which must have a stable repr.
+    :return: the path of the memmap shard.
+    :rtype: basestring
+    """
+    key = repr((CACHE_VERSION, module_name, list(sources), args))
+    return os.path.join(CACHE_HOME, module_name,
+                        '%s.mmap' % hashlib.md5(key).hexdigest())
+
+
+def _field_type(field):
+    if isinstance(field, list):
+        return 'list'
+    elif isinstance(field, tuple):
+        return 'tuple'
+    return None
+
+
+def _load(filename):
+    try:
+        with open(filename + '.json') as f:
+            meta = json.load(f)
+        return paddle.v2.dataset.common.MemmapShard(filename), meta
+    except (IOError, OSError, ValueError):
+        return None, None
+
+
+def load_or_build(module_name, sources, args, build):
+    """
+    Load the cache entry, or write the samples returned by build into it if
+    it does not exist or is broken.
+
+    :param build: return the samples, e.g. a generator of them, which are
+                  written into the cache one by one.
+    :type build: callable
+    :return: the memmap shard of the samples, and the meta information of
+             the entry. The list of the samples returned by build is
+             returned instead of the shard if it is empty or the cache is
+             disabled, the meta information is None then.
+    :rtype: tuple
+    """
+    filename = cache_file(module_name, sources, args)
+    if not enabled():
+        return list(build()), None
+    shard, meta = _load(filename)
+    if shard is not None:
+        return shard, meta
+
+    samples = iter(build())
+    try:
+        first = next(samples)
+    except StopIteration:
+        return [], None
+    fields = first if isinstance(first, (tuple, list)) else [first]
+    dirname = os.path.dirname(filename)
+    if not os.path.exists(dirname):
+        try:
+            os.makedirs(dirname)
+        except OSError:
+            # created by another process
+            pass
+    # write to temporary files first, so a broken entry is never seen
+    tmp = '%s.%d.tmp' % (filename, os.getpid())
+    num_samples = paddle.v2.dataset.common.write_memmap_shard(
+        itertools.chain([first], samples), tmp)
+    meta = {
+        'module': module_name,
+        'sources': list(sources),
+        'args': repr(args),
+        'num_samples': num_samples,
+        'field_types': [_field_type(f) for f in fields],
+        'created': time.time(),
+    }
+    with open(tmp + '.json', 'w') as f:
+        json.dump(meta, f)
+    os.rename(tmp + '.json', filename + '.json')
+    os.rename(tmp, filename)
+    return paddle.v2.dataset.common.MemmapShard(filename), meta
+
+
+def _restore(shard, field_types):
+    """
+    Yield the samples of the shard, with the numpy arrays of the fields
+    which were lists or tuples converted back.
+    """
+    if not any(field_types):
+        for sample in shard:
+            yield sample
+        return
+
+    def restore(field, field_type):
+        # the pickled fields are restored as they were
+        if not hasattr(field, 'tolist'):
+            return field
+        if field_type == 'list':
+            return field.tolist()
+        elif field_type == 'tuple':
+            return tuple(field.tolist())
+        return field
+
+    for sample in shard:
+        if shard.sample_type == 'single':
+            yield restore(sample, field_types[0])
+        else:
+            fields = [restore(f, t) for f, t in zip(sample, field_types)]
+            yield tuple(fields) if shard.sample_type == 'tuple' else fields
+
+
+def cached_reader(module_name, sources, args, reader):
+    """
+    Create a reader which yields the samples of reader from the cache. All
+    of the samples are read and written into the cache when it is called the
+    first time.
+
+    :param module_name: the name of the dataset module, e.g. "imdb".
+    :type module_name: basestring
+    :param sources: the md5 of the source archives.
+    :type sources: list
+    :param args: the arguments of the reader, which must have a stable repr.
+    :param reader: the reader to cache.
+    :type reader: callable
+    :return: the cached reader.
+    :rtype: callable
+    """
+    if not enabled():
+        return reader
+
+    loaded = []
+
+    def cached():
+        if not loaded:
+            loaded.append(
+                load_or_build(module_name, sources, args, reader))
+        shard, meta = loaded[0]
+        if meta is None:
+            return iter(shard)
+        return _restore(shard, meta['field_types'])
+
+    return cached
+
+
+def entries(module_name=None):
+    """
+    The meta information of the cache entries of the module, or of all the
+    modules if module_name is None.
+
+    :rtype: list
+    """
+    pattern = os.path.join(CACHE_HOME, module_name or '*', '*.mmap.json')
+    result = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path) as f:
+            meta = json.load(f)
+        meta['file'] = path[:-len('.json')]
+        result.append(meta)
+    return result
+
+
+def _building(path):
+    """
+    Whether the temporary file is being written by a process alive.
+    """
+    pid = path.split('.')[-2]
+    if not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+def clear(module_name=None):
+    """
+    Remove all of the cache entries of the module, or of all the modules if
+    module_name is None. The temporary files of the entries being built by
+    other processes are kept, but the ones left by the dead processes are
+    removed.
+
+    :return: the number of the files removed.
+    :rtype: int
+    """
+    pattern = os.path.join(CACHE_HOME, module_name or '*', '*.mmap*')
+    files = []
+    for path in glob.glob(pattern):
+        tmp = path[:-len('.json')] if path.endswith('.json') else path
+        if tmp.endswith('.tmp') and _building(tmp):
+            continue
+        files.append(path)
+    for path in files:
+        try:
+            os.remove(path)
+        except OSError as e:
+            # removed by another process
+            if e.errno != errno.ENOENT:
+                raise
+    return len(files)
+
+
+def _build_imdb(m):
+    w = m.word_dict()
+    return [m.train(w), m.test(w)]
+
+
+def _build_imikolov(m):
+    w = m.build_dict()
+    return [m.train(w, 5), m.test(w, 5)]
+
+
+def _build_wmt16(m):
+    sizes = (m.TOTAL_EN_WORDS, m.TOTAL_DE_WORDS)
+    return [m.train(*sizes), m.test(*sizes), m.validation(*sizes)]
+
+
+# the readers built by the command line, with the arguments used by the
+# convert function of each module.
+_BUILDERS = {
+    'conll05': lambda m: [m.test()],
+    'imdb': _build_imdb,
+    'imikolov': _build_imikolov,
+    'movielens': lambda m: [m.train(), m.test()],
+    'sentiment': lambda m: [lambda: m.train(), lambda: m.test()],
+    'wmt14': lambda m: [m.train(30000), m.test(30000)],
+    'wmt16': _build_wmt16,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Manage the cache of the parsed datasets.')
+    parser.add_argument(
+        'command',
+        choices=['build', 'list', 'clear'],
+        help='build the caches, list the entries, or remove all of the '
+        'entries')
+    parser.add_argument(
+        'modules',
+        nargs='*',
+        help='the dataset modules, all of them by default: %s' %
+        ', '.join(sorted(_BUILDERS)))
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        if not enabled():
+            parser.error('the cache is disabled by PADDLE_DATASET_CACHE')
+        for name in args.modules or sorted(_BUILDERS):
+            if name not in _BUILDERS:
+                parser.error('unknown dataset module %s' % name)
+            begin = time.time()
+            module = importlib.import_module('paddle.v2.dataset.' + name)
+            for reader in _BUILDERS[name](module):
+                for _ in reader():
+                    pass
+            print '%s: built in %.1fs' % (name, time.time() - begin)
+    elif args.command == 'list':
+        for name in args.modules or [None]:
+            for meta in entries(name):
+                print '%s\t%d samples\t%s\t%s' % (
+                    meta['module'], meta['num_samples'], meta['args'],
+                    meta['file'])
+    else:
+        removed = sum(clear(name) for name in args.modules or [None])
+        print 'removed %d files' % removed
+
+
+if __name__ == '__main__':
+    main()
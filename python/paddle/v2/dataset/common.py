@@ -23,14 +23,24 @@ import paddle.v2.dataset
 import cPickle
 import glob
 import cPickle as pickle
+import json
+import random
+import struct
+import tempfile
+import array
+import numpy
 
 __all__ = [
     'DATA_HOME',
     'download',
     'md5file',
     'split',
+    'cluster_files',
     'cluster_files_reader',
     'convert',
+    'MemmapShard',
+    'split_memmap',
+    'memmap_files_reader',
 ]
 
 DATA_HOME = os.path.expanduser('~/.cache/paddle/dataset')
@@ -164,6 +174,25 @@ def split(reader, line_count, suffix="%05d.pickle", dumper=cPickle.dump):
             dumper(lines, f)
 
 
+def cluster_files(files_pattern, trainer_count, trainer_id):
+    """
+    Select the files of a trainer from the given files according to trainer
+    count and trainer_id.
+
+    :param files_pattern: the glob pattern of the files
+    :param trainer_count: total trainer count
+    :param trainer_id: the trainer rank id
+    :return: the sorted file names selected.
+    :rtype: list
+    """
+    file_list = glob.glob(files_pattern)
+    file_list.sort()
+    return [
+        fn for idx, fn in enumerate(file_list)
+        if idx % trainer_count == trainer_id
+    ]
+
+
 def cluster_files_reader(files_pattern,
                          trainer_count,
                          trainer_id,
@@ -183,13 +212,9 @@ def cluster_files_reader(files_pattern,
     def reader():
         if not callable(loader):
             raise TypeError("loader should be callable.")
-        file_list = glob.glob(files_pattern)
-        file_list.sort()
-        my_file_list = []
-        for idx, fn in enumerate(file_list):
-            if idx % trainer_count == trainer_id:
-                print "append file: %s" % fn
-                my_file_list.append(fn)
+        my_file_list = cluster_files(files_pattern, trainer_count, trainer_id)
+        for fn in my_file_list:
+            print "append file: %s" % fn
         for fn in my_file_list:
             with open(fn, "r") as f:
                 lines = loader(f)
@@ -234,3 +259,382 @@ def convert(output_path, reader, line_count, name_prefix):
             continue
 
     write_data(indx_f, lines)
+
+
+MEMMAP_MAGIC = 'PDMMAP01'
+# align the columns to the cache line size
+_MEMMAP_ALIGNMENT = 64
+
+
+def _align(offset):
+    return (offset + _MEMMAP_ALIGNMENT - 1) // _MEMMAP_ALIGNMENT * \
+        _MEMMAP_ALIGNMENT
+
+
+def _is_number(v):
+    return isinstance(v, (bool, int, long, float, numpy.number))
+
+
+class _MemmapColumn(object):
+    """
+    A column of a memmap shard, built from the values of a field of the
+    records added one by one. The values are pickled into a temporary file
+    instead of being kept in memory, and the kind of the column is decided
+    after all of them are added. The kind of the column is one of
+      - scalar: a number per record, stored as a 1-D array.
+      - fixed: a numeric array of the same shape per record.
+      - var: a numeric array of a variable length per record, stored as the
+             concatenated values and the offsets of the records.
+      - pickle: anything else, stored as the concatenated pickled values and
+                the offsets of the records.
+    """
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        # the byte sizes of the pickled values
+        self.sizes = array.array('l')
+        # the lengths of the arrays, for the var column
+        self.lengths = array.array('l')
+        self.all_numbers = True
+        self.all_arrays = True
+        self.dtype = None
+        self.numeric = True
+        self.shape = None
+        self.same_shape = True
+        self.inner_shape = None
+        self.same_inner_shape = True
+
+    def add(self, v):
+        pickled = pickle.dumps(v, pickle.HIGHEST_PROTOCOL)
+        self.file.write(pickled)
+        self.sizes.append(len(pickled))
+
+        if self.all_numbers and _is_number(v):
+            self.dtype = self._result_type(numpy.asarray(v).dtype)
+            return
+        if self.all_numbers:
+            self.all_numbers = False
+            self.dtype = None
+            if len(self.sizes) > 1:
+                # the numbers added before are not arrays
+                self.all_arrays = False
+        if not self.all_arrays:
+            return
+        if not isinstance(v, (list, tuple, numpy.ndarray)):
+            self.all_arrays = False
+            return
+
+        a = numpy.asarray(v)
+        if a.size > 0:
+            self.numeric = self.numeric and a.dtype.kind in 'biuf'
+            if self.numeric:
+                self.dtype = self._result_type(a.dtype)
+        if self.shape is None:
+            self.shape = a.shape
+        elif a.shape != self.shape:
+            self.same_shape = False
+        if a.ndim == 0:
+            self.same_inner_shape = False
+        else:
+            if self.inner_shape is None:
+                self.inner_shape = a.shape[1:]
+            elif a.shape[1:] != self.inner_shape:
+                self.same_inner_shape = False
+            self.lengths.append(len(a))
+
+    def _result_type(self, dtype):
+        if self.dtype is None:
+            return dtype
+        return numpy.result_type(self.dtype, dtype)
+
+    def kind(self):
+        if self.all_numbers:
+            return 'scalar'
+        if self.all_arrays and self.numeric and self.dtype is not None:
+            if self.same_shape:
+                return 'fixed'
+            if self.same_inner_shape:
+                return 'var'
+        return 'pickle'
+
+    def arrays(self):
+        """
+        The meta information of the arrays stored by the column, as a dict
+        of {name: (dtype, shape)}.
+        """
+        num = len(self.sizes)
+        kind = self.kind()
+        if kind == 'scalar':
+            return {'values': (self.dtype, (num, ))}
+        elif kind == 'fixed':
+            return {'values': (self.dtype, (num, ) + self.shape)}
+        if kind == 'var':
+            lengths = self.lengths
+            values = (self.dtype, (sum(lengths), ) + self.inner_shape)
+        else:
+            lengths = self.sizes
+            values = (numpy.dtype('uint8'), (sum(lengths), ))
+        return {
+            'values': values,
+            'offsets': (numpy.dtype('int64'), (num + 1, ))
+        }
+
+    def _values(self):
+        self.file.seek(0)
+        for size in self.sizes:
+            yield self.file.read(size)
+
+    def write(self, name, f):
+        """
+        Write the array of the name into the file f.
+        """
+        kind = self.kind()
+        if name == 'offsets':
+            lengths = self.lengths if kind == 'var' else self.sizes
+            offsets = numpy.zeros(len(lengths) + 1, dtype='int64')
+            numpy.cumsum(numpy.frombuffer(lengths, dtype=lengths.typecode),
+                         out=offsets[1:])
+            f.write(offsets.tostring())
+        elif kind == 'pickle':
+            for pickled in self._values():
+                f.write(pickled)
+        elif kind == 'scalar':
+            chunk = []
+            for pickled in self._values():
+                chunk.append(pickle.loads(pickled))
+                if len(chunk) == 4096:
+                    f.write(numpy.array(chunk, dtype=self.dtype).tostring())
+                    chunk = []
+            if chunk:
+                f.write(numpy.array(chunk, dtype=self.dtype).tostring())
+        else:
+            for pickled in self._values():
+                a = numpy.asarray(pickle.loads(pickled))
+                f.write(
+                    numpy.ascontiguousarray(a.astype(self.dtype, copy=False))
+                    .tostring())
+
+    def close(self):
+        self.file.close()
+
+
+def write_memmap_shard(samples, filename):
+    """
+    Write samples into a binary shard file which can be memory-mapped by
+    MemmapShard.
+
+    The file starts with MEMMAP_MAGIC, followed by the length of the JSON
+    header as a little-endian uint64, and the header itself. The header
+    records the number of records and, for each field of the samples, the
+    kind of the column and the dtype, shape and offset of its arrays. The
+    arrays follow the header, each aligned to 64 bytes.
+
+    The samples are read only once, and their fields are spilled into
+    temporary files until the columns are written, so samples could be a
+    generator of more samples than the memory holds.
+
+    :param samples: the samples to write. All of them must have the same
+                    structure: a tuple or list of fields, or a single field.
+    :type samples: iterable
+    :param filename: the file to write.
+    :type filename: basestring
+    :return: the number of the samples written.
+    :rtype: int
+    """
+    sample_type = None
+    columns = []
+    num_records = 0
+    try:
+        for s in samples:
+            if sample_type is None:
+                if isinstance(s, tuple):
+                    sample_type = 'tuple'
+                elif isinstance(s, list):
+                    sample_type = 'list'
+                else:
+                    sample_type = 'single'
+                field_num = 1 if sample_type == 'single' else len(s)
+                columns = [_MemmapColumn() for _ in xrange(field_num)]
+            if sample_type == 'single':
+                s = (s, )
+            if len(s) != len(columns):
+                raise ValueError("All the samples must have the same number "
+                                 "of fields")
+            for column, field in zip(columns, s):
+                column.add(field)
+            num_records += 1
+        if num_records == 0:
+            raise ValueError("Cannot write an empty shard")
+
+        header = {
+            'num_records': num_records,
+            'sample_type': sample_type,
+            'columns': []
+        }
+        arrays = []
+        for column in columns:
+            column_meta = {'kind': column.kind()}
+            for name, (dtype, shape) in sorted(column.arrays().iteritems()):
+                column_meta[name] = {'dtype': dtype.str, 'shape': list(shape)}
+                nbytes = int(numpy.prod(shape)) * dtype.itemsize
+                arrays.append((column_meta[name], nbytes, column, name))
+            header['columns'].append(column_meta)
+
+        # the offsets of the arrays only depend on the length of the header,
+        # so fill them with the max width first.
+        for meta, _, _, _ in arrays:
+            meta['offset'] = 2**62
+        header_len = len(json.dumps(header))
+        offset = _align(len(MEMMAP_MAGIC) + 8 + header_len)
+        for meta, nbytes, _, _ in arrays:
+            meta['offset'] = offset
+            offset = _align(offset + nbytes)
+        header_str = json.dumps(header).ljust(header_len)
+
+        with open(filename, 'wb') as f:
+            f.write(MEMMAP_MAGIC)
+            f.write(struct.pack('<Q', header_len))
+            f.write(header_str)
+            for meta, _, column, name in arrays:
+                f.seek(meta['offset'])
+                column.write(name, f)
+            f.truncate(offset)
+    finally:
+        for column in columns:
+            column.close()
+    return num_records
+
+
+class MemmapShard(object):
+    """
+    A shard written by write_memmap_shard. The file is memory-mapped, and
+    a record is read without deserializing the rest of the file.
+
+    The numeric array fields of the records are returned as read-only
+    numpy views of the file.
+
+    :param filename: the shard file.
+    :type filename: basestring
+    """
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            if f.read(len(MEMMAP_MAGIC)) != MEMMAP_MAGIC:
+                raise ValueError("%s is not a memmap shard" % filename)
+            header_len, = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_len))
+        self.filename = filename
+        self.num_records = header['num_records']
+        self.sample_type = header['sample_type']
+        self.memory = numpy.memmap(filename, dtype='uint8', mode='r')
+        self.columns = []
+        for meta in header['columns']:
+            column = {'kind': meta['kind']}
+            for name in ('values', 'offsets'):
+                if name in meta:
+                    column[name] = self._array(meta[name])
+            self.columns.append(column)
+
+    def _array(self, meta):
+        dtype = numpy.dtype(str(meta['dtype']))
+        shape = tuple(meta['shape'])
+        nbytes = int(numpy.prod(shape)) * dtype.itemsize
+        begin = meta['offset']
+        arr = self.memory[begin:begin + nbytes].view(dtype).reshape(shape)
+        # plain ndarray views are cheaper to slice than numpy.memmap
+        return arr.view(numpy.ndarray)
+
+    def __len__(self):
+        return self.num_records
+
+    def _field(self, column, i):
+        kind = column['kind']
+        values = column['values']
+        if kind == 'scalar':
+            return values[i].item()
+        elif kind == 'fixed':
+            return values[i]
+        offsets = column['offsets']
+        field = values[offsets[i]:offsets[i + 1]]
+        if kind == 'var':
+            return field
+        return pickle.loads(field.tostring())
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.num_records
+        if i < 0 or i >= self.num_records:
+            raise IndexError("record index out of range")
+        fields = [self._field(column, i) for column in self.columns]
+        if self.sample_type == 'tuple':
+            return tuple(fields)
+        elif self.sample_type == 'list':
+            return fields
+        return fields[0]
+
+    def __iter__(self):
+        for i in xrange(self.num_records):
+            yield self[i]
+
+
+def split_memmap(reader, line_count, suffix="%05d.mmap"):
+    """
+    Like split, but write the samples into memmap shard files, which are
+    read by memmap_files_reader or MemmapShard.
+
+    :param reader: is a reader creator
+    :param line_count: the number of samples in each file
+    :param suffix: the suffix for the output files, should contain "%d"
+                means the id for each file. Default is "%05d.mmap"
+    :return: the names of the files written.
+    :rtype: list
+    """
+    if line_count < 1:
+        raise ValueError("line_count must be positive")
+    filenames = []
+    lines = []
+    for d in reader():
+        lines.append(d)
+        if len(lines) == line_count:
+            filenames.append(suffix % len(filenames))
+            write_memmap_shard(lines, filenames[-1])
+            lines = []
+    if lines:
+        filenames.append(suffix % len(filenames))
+        write_memmap_shard(lines, filenames[-1])
+    return filenames
+
+
+def memmap_files_reader(files_pattern,
+                        trainer_count=1,
+                        trainer_id=0,
+                        shuffle=False):
+    """
+    Create a reader that yields the records of the memmap shard files
+    written by split_memmap. Like cluster_files_reader, the files are
+    selected according to trainer_count and trainer_id.
+
+    The shards are memory-mapped instead of being loaded, so the reader
+    yields the first record immediately and only the pages touched stay
+    in memory.
+
+    :param files_pattern: the files which generating by split_memmap(...)
+    :param trainer_count: total trainer count
+    :param trainer_id: the trainer rank id
+    :param shuffle: whether to shuffle the order of the files and of the
+                    records in each file.
+    """
+
+    def reader():
+        my_file_list = cluster_files(files_pattern, trainer_count, trainer_id)
+        if shuffle:
+            random.shuffle(my_file_list)
+        for fn in my_file_list:
+            shard = MemmapShard(fn)
+            indices = range(len(shard))
+            if shuffle:
+                random.shuffle(indices)
+            for i in indices:
+                yield shard[i]
+
+    return reader
@@ -23,6 +23,7 @@ to initialize SRL model.
 import tarfile
 import gzip
 import itertools
+import paddle.v2.dataset.cache
 import paddle.v2.dataset.common
 
 __all__ = ['test, get_dict', 'get_embedding', 'convert']
@@ -218,7 +219,9 @@ def test():
         paddle.v2.dataset.common.download(DATA_URL, 'conll05st', DATA_MD5),
         words_name='conll05st-release/test.wsj/words/test.wsj.words.gz',
         props_name='conll05st-release/test.wsj/props/test.wsj.props.gz')
-    return reader_creator(reader, word_dict, verb_dict, label_dict)
+    return paddle.v2.dataset.cache.cached_reader(
+        'conll05', [DATA_MD5, WORDDICT_MD5, VERBDICT_MD5, TRGDICT_MD5],
+        ('test', ), reader_creator(reader, word_dict, verb_dict, label_dict))
 
 
 def fetch():
@@ -55,14 +55,20 @@ TEST_FLAG = 'trnid'
 VALID_FLAG = 'valid'
 
 
-def default_mapper(is_train, sample):
+def default_mapper(is_train, sample, cache=None):
     '''
     map image bytes data to type needed by model input layer
+
+    The decoded and resized images can be kept in a cache, so that they are
+    decoded only once, e.g. for the train set:
+
+        cache = paddle.v2.image.MemoryImageCache(8 << 30)
+        mapper = functools.partial(default_mapper, True, cache=cache)
+        reader = train(mapper=mapper)
     '''
     img, label = sample
-    img = load_image_bytes(img)
-    img = simple_transform(
-        img, 256, 224, is_train, mean=[103.94, 116.78, 123.68])
+    img = load_bytes_and_transform(
+        img, 256, 224, is_train, mean=[103.94, 116.78, 123.68], cache=cache)
     return img.flatten().astype('float32'), label
 
 
@@ -109,13 +115,7 @@ def reader_creator(data_file,
 
     def reader():
         for file in open(file_list):
-            file = file.strip()
-            batch = None
-            with open(file, 'r') as f:
-                batch = cPickle.load(f)
-            data = batch['data']
-            labels = batch['label']
-            for sample, label in itertools.izip(data, batch['label']):
+            for sample, label in read_image_batch(file.strip()):
                 yield sample, int(label) - 1
 
     if use_xmap:
@@ -20,9 +20,9 @@ of 25,000 highly polar movie reviews for training, and 25,000 for testing.
 Besides, this module also provides API for building dictionary.
 """
 
+import paddle.v2.dataset.cache
 import paddle.v2.dataset.common
-import collections
-import tarfile
+import paddle.v2.dataset.text
 import re
 import string
 
@@ -32,35 +32,35 @@ URL = 'http://ai.stanford.edu/%7Eamaas/data/sentiment/aclImdb_v1.tar.gz'
 MD5 = '7c2ac02c03563afcf9b574c7e56c153a'
 
 
+def _tokenize(text):
+    # newline and punctuations removal and ad-hoc tokenization.
+    return text.rstrip("\n\r").translate(None,
+                                          string.punctuation).lower().split()
+
+
+def _texts(pattern):
+    return paddle.v2.dataset.text.tar_texts(
+        paddle.v2.dataset.common.download(URL, 'imdb', MD5), pattern)
+
+
 def tokenize(pattern):
     """
     Read files that match the given pattern.  Tokenize and yield each file.
     """
+    for text in _texts(pattern):
+        yield _tokenize(text)
 
-    with tarfile.open(paddle.v2.dataset.common.download(URL, 'imdb',
-                                                        MD5)) as tarf:
-        # Note that we should use tarfile.next(), which does
-        # sequential access of member files, other than
-        # tarfile.extractfile, which does random access and might
-        # destroy hard disks.
-        tf = tarf.next()
-        while tf != None:
-            if bool(pattern.match(tf.name)):
-                # newline and punctuations removal and ad-hoc tokenization.
-                yield tarf.extractfile(tf).read().rstrip("\n\r").translate(
-                    None, string.punctuation).lower().split()
-            tf = tarf.next()
-
-
-def build_dict(pattern, cutoff):
+
+def build_dict(pattern, cutoff, num_workers=None):
     """
     Build a word dictionary from the corpus. Keys of the dictionary are words,
     and values are zero-based IDs of these words.
+
+    The files are tokenized by num_workers processes, the number of the CPUs
+    by default.
     """
-    word_freq = collections.defaultdict(int)
-    for doc in tokenize(pattern):
-        for word in doc:
-            word_freq[word] += 1
+    word_freq = paddle.v2.dataset.text.word_count(
+        _texts(pattern), _tokenize, num_workers)
 
     # Not sure if we should prune less-frequent words here.
     word_freq = filter(lambda x: x[1] > cutoff, word_freq.items())
@@ -72,20 +72,26 @@ def build_dict(pattern, cutoff):
     return word_idx
 
 
-def reader_creator(pos_pattern, neg_pattern, word_idx):
+def reader_creator(pos_pattern, neg_pattern, word_idx, num_workers=None):
+    """
+    The files are encoded by word_idx once, and kept in the dataset cache,
+    which is reused by the later passes and runs.
+    """
     UNK = word_idx['<unk>']
-    INS = []
 
-    def load(pattern, out, label):
-        for doc in tokenize(pattern):
-            out.append(([word_idx.get(w, UNK) for w in doc], label))
+    def build():
+        for pattern, label in [(pos_pattern, 0), (neg_pattern, 1)]:
+            for ids in paddle.v2.dataset.text.encode(
+                    _texts(pattern), word_idx, UNK, _tokenize, num_workers):
+                yield ids, label
 
-    load(pos_pattern, INS, 0)
-    load(neg_pattern, INS, 1)
+    shard, _ = paddle.v2.dataset.cache.load_or_build(
+        'imdb', [MD5], (pos_pattern.pattern, neg_pattern.pattern,
+                        paddle.v2.dataset.text.dict_digest(word_idx)), build)
 
     def reader():
-        for doc, label in INS:
-            yield doc, label
+        for doc, label in shard:
+            yield doc.tolist(), label
 
     return reader
 
@@ -18,7 +18,9 @@ This module will download dataset from
 http://www.fit.vutbr.cz/~imikolov/rnnlm/ and parse training set and test set
 into paddle reader creators.
 """
+import paddle.v2.dataset.cache
 import paddle.v2.dataset.common
+import paddle.v2.dataset.text
 import collections
 import tarfile
 
@@ -101,7 +103,10 @@ def reader_creator(filename, word_idx, n, data_type):
                 else:
                     assert False, 'Unknow data type'
 
-    return reader
+    return paddle.v2.dataset.cache.cached_reader(
+        'imikolov', [paddle.v2.dataset.imikolov.MD5],
+        (filename, paddle.v2.dataset.text.dict_digest(word_idx), n,
+         data_type), reader)
 
 
 def train(word_idx, n, data_type=DataType.NGRAM):
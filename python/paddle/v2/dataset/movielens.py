@@ -23,6 +23,7 @@ set and test set into paddle reader creators.
 """
 
 import zipfile
+import paddle.v2.dataset.cache
 import paddle.v2.dataset.common
 import re
 import random
@@ -160,7 +161,9 @@ def __reader__(rand_seed=0, test_ratio=0.1, is_test=False):
 
 
 def __reader_creator__(**kwargs):
-    return lambda: __reader__(**kwargs)
+    return paddle.v2.dataset.cache.cached_reader(
+        'movielens', [MD5], sorted(kwargs.items()),
+        lambda: __reader__(**kwargs))
 
 
 train = functools.partial(__reader_creator__, is_test=False)
@@ -21,11 +21,13 @@ TODO(yuyang18): Complete dataset.
 """
 
 import collections
+import os
 from itertools import chain
 
 import nltk
 from nltk.corpus import movie_reviews
 
+import paddle.v2.dataset.cache
 import paddle.v2.dataset.common
 
 __all__ = ['train', 'test', 'get_word_dict', 'convert']
@@ -112,20 +114,33 @@ def reader_creator(data):
         yield each[0], each[1]
 
 
+def __cached__(name, begin, end):
+    """
+    Read the samples from the dataset cache, keyed on the md5 of the
+    movie_reviews archive downloaded by nltk.
+    """
+    download_data_if_not_yet()
+    archive = os.path.join(paddle.v2.dataset.common.DATA_HOME, 'corpora',
+                           'movie_reviews.zip')
+    sources = [paddle.v2.dataset.common.md5file(archive)] \
+        if os.path.exists(archive) else []
+    return paddle.v2.dataset.cache.cached_reader(
+        'sentiment', sources, (name, begin, end),
+        lambda: reader_creator(load_sentiment_data()[begin:end]))()
+
+
 def train():
     """
     Default training set reader creator
     """
-    data_set = load_sentiment_data()
-    return reader_creator(data_set[0:NUM_TRAINING_INSTANCES])
+    return __cached__('train', 0, NUM_TRAINING_INSTANCES)
 
 
 def test():
     """
     Default test set reader creator
     """
-    data_set = load_sentiment_data()
-    return reader_creator(data_set[NUM_TRAINING_INSTANCES:])
+    return __cached__('test', NUM_TRAINING_INSTANCES, NUM_TOTAL_INSTANCES)
 
 
 def fetch():
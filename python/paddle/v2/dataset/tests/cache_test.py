@@ -0,0 +1,129 @@
+#   Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import paddle.v2.dataset.cache
+import numpy
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_home = paddle.v2.dataset.cache.CACHE_HOME
+        paddle.v2.dataset.cache.CACHE_HOME = tempfile.mkdtemp()
+        self.calls = 0
+
+    def tearDown(self):
+        shutil.rmtree(paddle.v2.dataset.cache.CACHE_HOME)
+        paddle.v2.dataset.cache.CACHE_HOME = self.cache_home
+
+    def reader(self):
+        self.calls += 1
+        for i in xrange(10):
+            yield [i, i % 3, range(i), [i * 0.5]]
+
+    def test_cached_reader(self):
+        expected = list(self.reader())
+        self.calls = 0
+        for i in xrange(2):
+            reader = paddle.v2.dataset.cache.cached_reader(
+                'test', ['0123'], ('train', 1), self.reader)
+            self.assertEqual(list(reader()), expected)
+            self.assertEqual(list(reader()), expected)
+        # the samples are read once, and loaded from the cache later
+        self.assertEqual(self.calls, 1)
+
+        # a different key builds a new entry
+        reader = paddle.v2.dataset.cache.cached_reader(
+            'test', ['4567'], ('train', 1), self.reader)
+        self.assertEqual(list(reader()), expected)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(len(paddle.v2.dataset.cache.entries('test')), 2)
+        self.assertEqual(paddle.v2.dataset.cache.entries()[0]['num_samples'],
+                         10)
+
+        self.assertEqual(paddle.v2.dataset.cache.clear('test'), 4)
+        self.assertEqual(paddle.v2.dataset.cache.entries(), [])
+
+    def test_tuple_samples(self):
+        def reader():
+            for i in xrange(5):
+                yield (i, i + 1), numpy.arange(i, dtype='int32')
+
+        reader = paddle.v2.dataset.cache.cached_reader('test', [], None,
+                                                       reader)
+        for i, (pair, arr) in enumerate(reader()):
+            self.assertEqual(pair, (i, i + 1))
+            self.assertTrue(isinstance(arr, numpy.ndarray))
+            self.assertEqual(arr.tolist(), range(i))
+
+    def test_generator_build(self):
+        def build():
+            for i in xrange(5):
+                yield i, range(i)
+
+        shard, meta = paddle.v2.dataset.cache.load_or_build('test', [], None,
+                                                            build)
+        self.assertEqual(meta['num_samples'], 5)
+        self.assertEqual([(i, list(s)) for i, s in shard],
+                         [(i, range(i)) for i in xrange(5)])
+        self.assertEqual(
+            paddle.v2.dataset.cache.load_or_build('test', [], 1,
+                                                  lambda: iter([])),
+            ([], None))
+
+    def test_clear_building(self):
+        reader = paddle.v2.dataset.cache.cached_reader('test', [], None,
+                                                       self.reader)
+        list(reader())
+        filename = paddle.v2.dataset.cache.cache_file('test', [], 1)
+        # a process alive is building an entry, and a dead one left the
+        # temporary files of another.
+        building = '%s.%d.tmp' % (filename, os.getpid())
+        dead = '%s.%d.tmp' % (filename, 2**22 + 1)
+        for path in [building, building + '.json', dead, dead + '.json']:
+            open(path, 'w').close()
+        self.assertEqual(paddle.v2.dataset.cache.clear('test'), 4)
+        self.assertEqual(
+            sorted(os.listdir(os.path.dirname(filename))),
+            sorted(os.path.basename(p) for p in [building, building + '.json']))
+
+    def test_import_package(self):
+        # the dataset modules import the cache module while the package is
+        # being initialized.
+        import paddle.v2.dataset
+        for name in [
+                'conll05', 'imdb', 'imikolov', 'movielens', 'sentiment',
+                'wmt14', 'wmt16'
+        ]:
+            self.assertTrue(hasattr(paddle.v2.dataset, name))
+
+    def test_disabled(self):
+        os.environ['PADDLE_DATASET_CACHE'] = '0'
+        try:
+            reader = paddle.v2.dataset.cache.cached_reader(
+                'test', [], None, self.reader)
+            self.assertTrue(reader == self.reader)
+            samples, meta = paddle.v2.dataset.cache.load_or_build(
+                'test', [], None, lambda: [1, 2])
+            self.assertEqual((samples, meta), ([1, 2], None))
+            self.assertEqual(paddle.v2.dataset.cache.entries(), [])
+        finally:
+            del os.environ['PADDLE_DATASET_CACHE']
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -16,6 +16,7 @@ import paddle.v2.dataset.common
 import unittest
 import tempfile
 import glob
+import numpy
 
 
 class TestCommon(unittest.TestCase):
@@ -89,6 +90,34 @@ class TestCommon(unittest.TestCase):
         recs.sort()
         self.assertEqual(total, record_num)
 
+    def test_memmap(self):
+        def test_reader():
+            for x in xrange(10):
+                yield (numpy.full((2, 3), x, dtype='float32'), x, range(x),
+                       'word-%d' % x)
+
+        path = tempfile.mkdtemp()
+        files = paddle.v2.dataset.common.split_memmap(
+            test_reader, 4, suffix=path + '/test-%05d.mmap')
+        self.assertEqual(len(files), 3)
+
+        shard = paddle.v2.dataset.common.MemmapShard(files[1])
+        self.assertEqual(len(shard), 4)
+        img, label, seq, word = shard[2]
+        self.assertTrue(numpy.array_equal(img, numpy.full((2, 3), 6)))
+        self.assertEqual(label, 6)
+        self.assertEqual(list(seq), range(6))
+        self.assertEqual(word, 'word-6')
+
+        for trainer_id, labels in [(0, [0, 1, 2, 3, 8, 9]), (1, [4, 5, 6, 7])]:
+            reader = paddle.v2.dataset.common.memmap_files_reader(
+                path + '/*.mmap', 2, trainer_id)
+            self.assertEqual([e[1] for e in reader()], labels)
+
+        reader = paddle.v2.dataset.common.memmap_files_reader(
+            path + '/*.mmap', shuffle=True)
+        self.assertEqual(sorted(e[1] for e in reader()), range(10))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,104 @@
+#   Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import paddle.v2.dataset.text
+import cStringIO
+import os
+import re
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+
+def _column_tokenize(text):
+    columns = text.split("\t")
+    if len(columns) != 2:
+        return None
+    return [c.split() for c in columns]
+
+
+class TestText(unittest.TestCase):
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.tar_file = os.path.join(self.dirname, "corpus.tar")
+        self.docs = ["a b c a", "b a", "d", "", "c c a"] * 50
+        with tarfile.open(self.tar_file, "w") as tf:
+            for i, doc in enumerate(self.docs):
+                info = tarfile.TarInfo("corpus/%04d.txt" % i)
+                info.size = len(doc)
+                tf.addfile(info, cStringIO.StringIO(doc))
+            info = tarfile.TarInfo("corpus/README")
+            info.size = 5
+            tf.addfile(info, cStringIO.StringIO("a a a"))
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def texts(self):
+        return paddle.v2.dataset.text.tar_texts(self.tar_file,
+                                                re.compile(".*\.txt$"))
+
+    def test_word_count(self):
+        self.assertEqual(list(self.texts()), self.docs)
+        for num_workers in [1, 3]:
+            counter = paddle.v2.dataset.text.word_count(
+                self.texts(), num_workers=num_workers)
+            self.assertEqual(
+                dict(counter), {"a": 200,
+                                "b": 100,
+                                "c": 150,
+                                "d": 50})
+
+    def test_encode(self):
+        word_idx = {"a": 0, "b": 1, "c": 2}
+        expected = [[word_idx.get(w, 3) for w in doc.split()]
+                    for doc in self.docs]
+        for num_workers in [1, 3]:
+            ids = list(
+                paddle.v2.dataset.text.encode(
+                    self.texts(), word_idx, 3, num_workers=num_workers))
+            self.assertEqual([i.tolist() for i in ids], expected)
+            self.assertTrue(all(i.dtype == "int32" for i in ids))
+
+    def test_encode_columns(self):
+        texts = ["a b\tc", "b\ta a", "bad"]
+        for num_workers in [1, 2]:
+            ids = list(
+                paddle.v2.dataset.text.encode(
+                    texts, [{"a": 1}, {"a": 2}],
+                    0,
+                    _column_tokenize,
+                    num_workers=num_workers))
+            self.assertEqual(len(ids), 3)
+            self.assertEqual([i.tolist() for i in ids[0]], [[1, 0], [0]])
+            self.assertEqual([i.tolist() for i in ids[1]], [[0], [2, 2]])
+            self.assertIsNone(ids[2])
+
+    def test_interleaved_encode(self):
+        texts = ["a"] * 2500
+        for num_workers in [1, 2]:
+            pairs = list(
+                zip(
+                    paddle.v2.dataset.text.encode(
+                        texts, {"a": 1}, 0, num_workers=num_workers),
+                    paddle.v2.dataset.text.encode(
+                        texts, {"a": 2}, 0, num_workers=num_workers)))
+            self.assertEqual(len(pairs), len(texts))
+            self.assertTrue(
+                all(a.tolist() == [1] and b.tolist() == [2] for a, b in pairs))
+
+
+if __name__ == '__main__':
+    unittest.main()
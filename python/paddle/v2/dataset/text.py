@@ -0,0 +1,218 @@
+#   Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Text preprocessing shared by the text datasets.
+
+The texts are read sequentially in the main process, and tokenized by a
+process pool in chunks. The word counts of the chunks are merged by
+collections.Counter. The datasets keep the id-encoded corpus in
+`paddle.v2.dataset.cache`, in which the ids of all the documents are a
+single int32 array indexed by an offsets array.
+"""
+
+import collections
+import cPickle
+import functools
+import hashlib
+import itertools
+import multiprocessing
+import tarfile
+
+import numpy
+
+__all__ = [
+    'split_tokenize',
+    'tar_texts',
+    'map_chunks',
+    'word_count',
+    'encode',
+    'dict_digest',
+]
+
+
+def split_tokenize(text):
+    """
+    Split the text by the white spaces.
+    """
+    return text.split()
+
+
+def tar_texts(tar_file, pattern):
+    """
+    Yield the contents of the members of the tar file whose names match the
+    pattern.
+    """
+    with tarfile.open(tar_file) as tarf:
+        # Note that we should use tarfile.next(), which does
+        # sequential access of member files, other than
+        # tarfile.extractfile, which does random access and might
+        # destroy hard disks.
+        tf = tarf.next()
+        while tf != None:
+            if bool(pattern.match(tf.name)):
+                yield tarf.extractfile(tf).read()
+            tf = tarf.next()
+
+
+def map_chunks(fn,
+               items,
+               num_workers=None,
+               chunk_size=1000,
+               initializer=None,
+               initargs=()):
+    """
+    Split the items into chunks, and yield fn(chunk) of each chunk in order.
+    fn runs in a process pool, so it must be picklable, e.g. a module level
+    function or a functools.partial of it. Only a few chunks are read ahead
+    of the one yielded, so items could be a generator of a large corpus.
+
+    :param num_workers: the number of the processes, the number of the CPUs
+                        by default. fn runs in the calling process if it is 1.
+    :type num_workers: int
+    :param initializer: called by each process of the pool when it starts,
+                        but not when fn runs in the calling process.
+    :type initializer: callable
+    """
+    if num_workers is None:
+        num_workers = multiprocessing.cpu_count()
+    items = iter(items)
+    chunks = iter(lambda: list(itertools.islice(items, chunk_size)), [])
+
+    if num_workers <= 1:
+        for chunk in chunks:
+            yield fn(chunk)
+        return
+
+    pool = multiprocessing.Pool(num_workers, initializer, initargs)
+    try:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(fn, (chunk, )))
+            if len(pending) > 2 * num_workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+
+
+def _count_chunk(tokenizer, texts):
+    counter = collections.Counter()
+    for text in texts:
+        counter.update(tokenizer(text) or [])
+    return counter
+
+
+def word_count(texts, tokenizer=split_tokenize, num_workers=None):
+    """
+    Count the words of the texts.
+
+    :param texts: the texts, e.g. the ones yielded by tar_texts.
+    :param tokenizer: split a text into words. It must be picklable.
+    :type tokenizer: callable
+    :param num_workers: the number of the processes to tokenize the texts.
+    :type num_workers: int
+    :return: the count of each word.
+    :rtype: collections.Counter
+    """
+    counter = collections.Counter()
+    for c in map_chunks(
+            functools.partial(_count_chunk, tokenizer), texts, num_workers):
+        counter.update(c)
+    return counter
+
+
+# the dictionary used by encode, set in each process of the pool. It is not
+# set in the calling process, where several encode generators could be
+# interleaved.
+_word_idx = None
+
+
+def _set_word_idx(word_idx):
+    global _word_idx
+    _word_idx = word_idx
+
+
+def _encode_words(words, word_idx, unk_id):
+    return numpy.array([word_idx.get(w, unk_id) for w in words], dtype='int32')
+
+
+def _encode_chunk(tokenizer, unk_id, texts, word_idx=None):
+    if word_idx is None:
+        word_idx = _word_idx
+    ids = []
+    for text in texts:
+        words = tokenizer(text)
+        if words is None:
+            ids.append(None)
+        elif isinstance(word_idx, dict):
+            ids.append(_encode_words(words, word_idx, unk_id))
+        else:
+            ids.append(
+                tuple(
+                    _encode_words(w, d, unk_id)
+                    for w, d in zip(words, word_idx)))
+    return ids
+
+
+def encode(texts, word_idx, unk_id, tokenizer=split_tokenize,
+           num_workers=None):
+    """
+    Yield the word ids of each text as an int32 array, or None if the
+    tokenizer returns None for the text.
+
+    The texts could also have several columns encoded by different
+    dictionaries, e.g. the source and the target sentences of a parallel
+    corpus. word_idx is the list of the dictionaries of the columns then,
+    the tokenizer returns the list of the words of each column, and a tuple
+    of the arrays of the columns is yielded for each text.
+
+    :param texts: the texts, e.g. the ones yielded by tar_texts.
+    :param word_idx: the ids of the words, or a list of them of each column.
+    :type word_idx: dict|list
+    :param unk_id: the id of the words not in word_idx.
+    :type unk_id: int
+    :param tokenizer: split a text into words. It must be picklable.
+    :type tokenizer: callable
+    :param num_workers: the number of the processes to encode the texts.
+    :type num_workers: int
+    """
+    if num_workers is None:
+        num_workers = multiprocessing.cpu_count()
+    if num_workers <= 1:
+        chunks = map_chunks(
+            functools.partial(
+                _encode_chunk, tokenizer, unk_id, word_idx=word_idx),
+            texts,
+            num_workers)
+    else:
+        chunks = map_chunks(
+            functools.partial(_encode_chunk, tokenizer, unk_id),
+            texts,
+            num_workers,
+            initializer=_set_word_idx,
+            initargs=(word_idx, ))
+    for ids in chunks:
+        for i in ids:
+            yield i
+
+
+def dict_digest(word_idx):
+    """
+    The md5 of the dictionary, to tell the corpora encoded by different
+    dictionaries apart.
+    """
+    return hashlib.md5(
+        cPickle.dumps(sorted(word_idx.iteritems()),
+                      cPickle.HIGHEST_PROTOCOL)).hexdigest()
@@ -22,6 +22,7 @@ parse training set and test set into paddle reader creators.
 import tarfile
 import gzip
 
+import paddle.v2.dataset.cache
 import paddle.v2.dataset.common
 from paddle.v2.parameters import Parameters
 
@@ -108,7 +109,8 @@ def reader_creator(tar_file, file_name, dict_size):
 
                     yield src_ids, trg_ids, trg_ids_next
 
-    return reader
+    return paddle.v2.dataset.cache.cached_reader(
+        'wmt14', [MD5_TRAIN], (file_name, dict_size), reader)
 
 
 def train(dict_size):
@@ -31,9 +31,11 @@ Multi30K: Multilingual English-German Image Descriptions.
 import os
 import tarfile
 import gzip
-from collections import defaultdict
+import functools
 
+import paddle.v2.dataset.cache
 import paddle.v2.dataset.common
+import paddle.v2.dataset.text
 
 __all__ = [
     "train",
@@ -56,15 +58,30 @@ END_MARK = "<e>"
 UNK_MARK = "<unk>"
 
 
+def _column_words(col, line):
+    """
+    The words of the column of a line, or None if the line is malformed.
+    """
+    line_split = line.strip().split("\t")
+    if len(line_split) != 2: return None
+    return line_split[col].split()
+
+
+def _line_words(src_col, line):
+    """
+    The words of the source and the target columns of a line, or None if the
+    line is malformed.
+    """
+    line_split = line.strip().split("\t")
+    if len(line_split) != 2: return None
+    return [line_split[src_col].split(), line_split[1 - src_col].split()]
+
+
 def __build_dict(tar_file, dict_size, save_path, lang):
-    word_dict = defaultdict(int)
     with tarfile.open(tar_file, mode="r") as f:
-        for line in f.extractfile("wmt16/train"):
-            line_split = line.strip().split("\t")
-            if len(line_split) != 2: continue
-            sen = line_split[0] if lang == "en" else line_split[1]
-            for w in sen.split():
-                word_dict[w] += 1
+        word_dict = paddle.v2.dataset.text.word_count(
+            f.extractfile("wmt16/train"),
+            functools.partial(_column_words, 0 if lang == "en" else 1))
 
     with open(save_path, "w") as fout:
         fout.write("%s\n%s\n%s\n" % (START_MARK, END_MARK, UNK_MARK))
@@ -114,25 +131,31 @@ def reader_creator(tar_file, file_name, src_dict_size, trg_dict_size, src_lang):
         unk_id = src_dict[UNK_MARK]
 
         src_col = 0 if src_lang == "en" else 1
-        trg_col = 1 - src_col
-
-        with tarfile.open(tar_file, mode="r") as f:
-            for line in f.extractfile(file_name):
-                line_split = line.strip().split("\t")
-                if len(line_split) != 2:
-                    continue
-                src_words = line_split[src_col].split()
-                src_ids = [start_id] + [
-                    src_dict.get(w, unk_id) for w in src_words
-                ] + [end_id]
-
-                trg_words = line_split[trg_col].split()
-                trg_ids = [trg_dict.get(w, unk_id) for w in trg_words]
-
-                trg_ids_next = trg_ids + [end_id]
-                trg_ids = [start_id] + trg_ids
 
-                yield src_ids, trg_ids, trg_ids_next
+        def build():
+            # the source and the target columns of a line are tokenized
+            # together, so the tar file is read once.
+            with tarfile.open(tar_file, mode="r") as f:
+                for ids in paddle.v2.dataset.text.encode(
+                        f.extractfile(file_name), [src_dict, trg_dict],
+                        unk_id, functools.partial(_line_words, src_col)):
+                    if ids is not None:
+                        yield ids
+
+        # the lines are encoded once, and kept in the dataset cache reused
+        # by the later passes and runs.
+        samples, _ = paddle.v2.dataset.cache.load_or_build(
+            "wmt16", [DATA_MD5],
+            (file_name, paddle.v2.dataset.text.dict_digest(src_dict),
+             paddle.v2.dataset.text.dict_digest(trg_dict)), build)
+        for src_ids, trg_ids in samples:
+            src_ids = [start_id] + src_ids.tolist() + [end_id]
+            trg_ids = trg_ids.tolist()
+
+            trg_ids_next = trg_ids + [end_id]
+            trg_ids = [start_id] + trg_ids
+
+            yield src_ids, trg_ids, trg_ids_next
 
     return reader
 
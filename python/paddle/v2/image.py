@@ -34,33 +34,125 @@ try:
     import cv2
 except ImportError:
     cv2 = None
+import collections
+import hashlib
+import itertools
+import mmap
+import multiprocessing
 import os
+import struct
 import tarfile
+import threading
 import cPickle
 
 __all__ = [
     "load_image_bytes", "load_image", "resize_short", "to_chw", "center_crop",
     "random_crop", "left_right_flip", "simple_transform", "load_and_transform",
-    "batch_images_from_tar"
+    "batch_images_from_tar", "batch_transform", "batch_transform_mapper",
+    "load_bytes_and_transform", "MemoryImageCache", "MmapImageCache",
+    "read_image_batch", "resize_image_bytes"
 ]
 
 
+# The batch files written by batch_images_from_tar start with this magic.
+# The images follow, each prefixed by its length (uint32) and label (int64).
+# Then comes an index of the offsets of the images (uint64) and a footer of
+# the offset of the index (uint64) and the number of images (uint32).
+_BATCH_MAGIC = "PDIMGB\x00\x01"
+_BATCH_RECORD = struct.Struct("<Iq")
+_BATCH_FOOTER = struct.Struct("<QI")
+
+
+def _write_image_batch(path, data, labels):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_BATCH_MAGIC)
+        offsets = np.empty(len(data), dtype="<u8")
+        for i, (im, label) in enumerate(itertools.izip(data, labels)):
+            offsets[i] = f.tell()
+            f.write(_BATCH_RECORD.pack(len(im), int(label)))
+            f.write(im)
+        index_offset = f.tell()
+        f.write(offsets.tostring())
+        f.write(_BATCH_FOOTER.pack(index_offset, len(data)))
+    os.rename(tmp, path)
+
+
+def read_image_batch(path, indices=None):
+    """
+    Read the images and labels from a batch file written by
+    `batch_images_from_tar`. The pickled batch files written by the former
+    versions are also supported.
+
+    :param path: path of the batch file.
+    :type path: string
+    :param indices: the indices of the images to read, which are found by
+                    the offset index of the file. All of the images are read
+                    sequentially if it is None.
+    :type indices: list
+    :return: a generator of (image bytes, label).
+    """
+    with open(path, "rb") as f:
+        if f.read(len(_BATCH_MAGIC)) != _BATCH_MAGIC:
+            f.seek(0)
+            batch = cPickle.load(f)
+            data, labels = batch['data'], batch['label']
+            if indices is None:
+                indices = xrange(len(data))
+            for i in indices:
+                yield data[i], labels[i]
+            return
+
+        f.seek(-_BATCH_FOOTER.size, os.SEEK_END)
+        index_offset, count = _BATCH_FOOTER.unpack(f.read(_BATCH_FOOTER.size))
+        if indices is None:
+            f.seek(len(_BATCH_MAGIC))
+        else:
+            f.seek(index_offset)
+            offsets = np.fromstring(f.read(count * 8), dtype="<u8")
+        for i in (xrange(count) if indices is None else indices):
+            if indices is not None:
+                f.seek(offsets[i])
+            length, label = _BATCH_RECORD.unpack(f.read(_BATCH_RECORD.size))
+            yield f.read(length), label
+
+
 def batch_images_from_tar(data_file,
                           dataset_name,
                           img2label,
-                          num_per_batch=1024):
+                          num_per_batch=1024,
+                          mapper=None,
+                          num_workers=None):
     """
     Read images from tar file and batch them into batch file.
 
+    The tar file is read sequentially without loading its whole index, and
+    the images are written into compact binary batch files, which are read
+    by `read_image_batch`.
+
+    Example usage to shrink the images by a process pool:
+
+    .. code-block:: python
+
+        mapper = functools.partial(resize_image_bytes, resize_size=256)
+        batch_images_from_tar(data_file, 'train', img2label, mapper=mapper)
+
     :param data_file: path of image tar file
     :type data_file: string
     :param dataset_name: 'train','test' or 'valid'
     :type dataset_name: string
     :param img2label: a dic with image file name as key 
-                    and image's label as value
+                    and image's integer label as value
     :type img2label: dic
     :param num_per_batch: image number per batch file
     :type num_per_batch: int
+    :param mapper: a function to transform the image bytes before they are
+                   written, e.g. to re-encode or resize them. It runs in a
+                   process pool, so it must be picklable.
+    :type mapper: callable
+    :param num_workers: the number of the processes to run mapper, the
+                        number of the CPUs by default.
+    :type num_workers: int
     :return: path of list file containing paths of batch file
     :rtype: string
     """
@@ -68,46 +160,81 @@ def batch_images_from_tar(data_file,
     out_path = "%s/%s" % (batch_dir, dataset_name)
     meta_file = "%s/%s.txt" % (batch_dir, dataset_name)
 
-    if os.path.exists(out_path):
+    # the list file is written at last, so the batches interrupted are
+    # written again.
+    if os.path.exists(meta_file):
         return meta_file
-    else:
+    if not os.path.exists(out_path):
         os.makedirs(out_path)
 
-    tf = tarfile.open(data_file)
-    mems = tf.getmembers()
+    pool = None
+    if mapper is not None:
+        pool = multiprocessing.Pool(num_workers)
+
+    paths = []
+
+    def write(data, labels):
+        path = os.path.abspath('%s/batch_%d' % (out_path, len(paths)))
+        _write_image_batch(path, data, labels)
+        paths.append(path)
+
+    pending = None
     data = []
     labels = []
-    file_id = 0
-    for mem in mems:
-        if mem.name in img2label:
-            data.append(tf.extractfile(mem).read())
-            labels.append(img2label[mem.name])
-            if len(data) == num_per_batch:
-                output = {}
-                output['label'] = labels
-                output['data'] = data
-                cPickle.dump(
-                    output,
-                    open('%s/batch_%d' % (out_path, file_id), 'w'),
-                    protocol=cPickle.HIGHEST_PROTOCOL)
-                file_id += 1
+    tf = tarfile.open(data_file)
+    try:
+        mem = tf.next()
+        while mem is not None:
+            if mem.isfile() and mem.name in img2label:
+                data.append(tf.extractfile(mem).read())
+                labels.append(img2label[mem.name])
+            mem = tf.next()
+            if len(data) == num_per_batch or (mem is None and data):
+                if pool is None:
+                    write(data, labels)
+                else:
+                    # map this batch while the next one is read
+                    if pending is not None:
+                        write(pending[0].get(), pending[1])
+                    pending = (pool.map_async(mapper, data), labels)
                 data = []
                 labels = []
-    if len(data) > 0:
-        output = {}
-        output['label'] = labels
-        output['data'] = data
-        cPickle.dump(
-            output,
-            open('%s/batch_%d' % (out_path, file_id), 'w'),
-            protocol=cPickle.HIGHEST_PROTOCOL)
-
-    with open(meta_file, 'a') as meta:
-        for file in os.listdir(out_path):
-            meta.write(os.path.abspath("%s/%s" % (out_path, file)) + "\n")
+        if pending is not None:
+            write(pending[0].get(), pending[1])
+    finally:
+        tf.close()
+        if pool is not None:
+            pool.terminate()
+
+    with open(meta_file + ".tmp", 'w') as meta:
+        for path in paths:
+            meta.write(path + "\n")
+    os.rename(meta_file + ".tmp", meta_file)
     return meta_file
 
 
+def resize_image_bytes(bytes, resize_size, is_color=True, quality=95):
+    """
+    Decode the image bytes array, resize the shorter edge of the image to
+    resize_size and encode it as JPEG again. It can be the mapper of
+    `batch_images_from_tar`.
+
+    :param bytes: the input image bytes array.
+    :type bytes: str
+    :param resize_size: the shorter edge length of the resized image.
+    :type resize_size: int
+    :param is_color: whether the image is color or not.
+    :type is_color: bool
+    :param quality: the JPEG quality from 0 to 100.
+    :type quality: int
+    :return: the encoded image bytes array.
+    :rtype: str
+    """
+    im = resize_short(load_image_bytes(bytes, is_color), resize_size)
+    _, buf = cv2.imencode('.jpg', im, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buf.tostring()
+
+
 def load_image_bytes(bytes, is_color=True):
     """
     Load an color or gray image from bytes array.
@@ -319,6 +446,14 @@ def simple_transform(im,
     :type mean: numpy array | list
     """
     im = resize_short(im, resize_size)
+    return _transform_resized(im, crop_size, is_train, is_color, mean)
+
+
+def _transform_resized(im, crop_size, is_train, is_color=True, mean=None):
+    """
+    The part of `simple_transform` after resizing, which is done on each
+    pass even if the resized images are cached.
+    """
     if is_train:
         im = random_crop(im, crop_size, is_color=is_color)
         if np.random.randint(2) == 0:
@@ -350,7 +485,8 @@ def load_and_transform(filename,
                        crop_size,
                        is_train,
                        is_color=True,
-                       mean=None):
+                       mean=None,
+                       cache=None):
     """
     Load image from the input file `filename` and transform image for
     data argumentation. Please refer to the `simple_transform` interface
@@ -375,7 +511,373 @@ def load_and_transform(filename,
     :param mean: the mean values, which can be element-wise mean values or 
                  mean values per channel.
     :type mean: numpy array | list
+    :param cache: the cache of the resized images, keyed by the file name.
+                  The images are loaded and resized only once, and cropped
+                  and flipped on each pass.
+    :type cache: MemoryImageCache | MmapImageCache
+    """
+    if cache is None:
+        im = load_image(filename, is_color)
+        return simple_transform(im, resize_size, crop_size, is_train,
+                                is_color, mean)
+    im = _load_resized(
+        filename, lambda: load_image(filename, is_color), resize_size,
+        is_color, cache)
+    return _transform_resized(im, crop_size, is_train, is_color, mean)
+
+
+def load_bytes_and_transform(bytes,
+                             resize_size,
+                             crop_size,
+                             is_train,
+                             is_color=True,
+                             mean=None,
+                             cache=None):
+    """
+    Load image from the bytes array and transform image for data
+    argumentation, like `load_and_transform`.
+
+    Example usage:
+
+    .. code-block:: python
+
+        cache = MemoryImageCache(8 << 30)
+        im = load_bytes_and_transform(data, 256, 224, True, cache=cache)
+
+    :param bytes: the input image bytes array.
+    :type bytes: str
+    :param resize_size: The shorter edge length of the resized image.
+    :type resize_size: int
+    :param crop_size: The cropping size.
+    :type crop_size: int
+    :param is_train: Whether it is training or not.
+    :type is_train: bool
+    :param is_color: whether the image is color or not.
+    :type is_color: bool
+    :param mean: the mean values, which can be element-wise mean values or
+                 mean values per channel.
+    :type mean: numpy array | list
+    :param cache: the cache of the resized images, keyed by the md5 of
+                  the bytes.
+    :type cache: MemoryImageCache | MmapImageCache
     """
-    im = load_image(filename, is_color)
-    im = simple_transform(im, resize_size, crop_size, is_train, is_color, mean)
+    if cache is None:
+        im = load_image_bytes(bytes, is_color)
+        return simple_transform(im, resize_size, crop_size, is_train,
+                                is_color, mean)
+    im = _load_resized(
+        hashlib.md5(bytes).hexdigest(),
+        lambda: load_image_bytes(bytes, is_color), resize_size, is_color,
+        cache)
+    return _transform_resized(im, crop_size, is_train, is_color, mean)
+
+
+def _load_resized(key, load, resize_size, is_color, cache):
+    key = "%s:%d:%d" % (key, resize_size, is_color)
+    im = cache.get(key)
+    if im is None:
+        im = resize_short(load(), resize_size)
+        cache.put(key, im)
     return im
+
+
+class MemoryImageCache(object):
+    """
+    An in-memory cache of decoded images, which evicts the least recently
+    used images to keep the total bytes of the images under a budget. It
+    can be shared by the threads of `paddle.v2.reader.xmap_readers`.
+
+    :param max_bytes: the byte budget of the images.
+    :type max_bytes: int
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.__images__ = collections.OrderedDict()
+        self.__lock__ = threading.Lock()
+
+    def __len__(self):
+        return len(self.__images__)
+
+    def get(self, key):
+        """
+        Return the image of the key, or None if it is not cached.
+        """
+        with self.__lock__:
+            im = self.__images__.pop(key, None)
+            if im is None:
+                self.misses += 1
+                return None
+            # move it to the most recently used end
+            self.__images__[key] = im
+            self.hits += 1
+            return im
+
+    def put(self, key, im):
+        """
+        Cache the image, it is not copied and should not be modified later.
+        """
+        if im.nbytes > self.max_bytes:
+            return
+        with self.__lock__:
+            old = self.__images__.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            while self.nbytes + im.nbytes > self.max_bytes:
+                _, evicted = self.__images__.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+            self.__images__[key] = im
+            self.nbytes += im.nbytes
+
+
+class MmapImageCache(object):
+    """
+    An on-disk cache of decoded images, which is memory-mapped when read.
+    The images are appended to the file path + ".data", and the offsets of
+    them are kept in the file path + ".index", so the cache can be reused
+    by the later runs. The images are not evicted, no image is added after
+    the data file reaches max_bytes.
+
+    It can be shared by the threads of `paddle.v2.reader.xmap_readers`,
+    but only one process should write a cache at a time. Call flush() or
+    close() to save the index.
+
+    :param path: the path prefix of the cache files.
+    :type path: string
+    :param max_bytes: the max size of the data file, no limit if None.
+    :type max_bytes: int
+    :param flush_interval: save the index after this number of images are
+                           added.
+    :type flush_interval: int
+    """
+
+    def __init__(self, path, max_bytes=None, flush_interval=1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.hits = 0
+        self.misses = 0
+        self.__index__ = {}
+        if os.path.exists(path + ".index"):
+            with open(path + ".index", "rb") as f:
+                self.__index__ = cPickle.load(f)
+        self.__data__ = open(path + ".data", "a+b")
+        self.__data__.seek(0, os.SEEK_END)
+        self.__size__ = self.__data__.tell()
+        self.__mmap__ = None
+        self.__unsaved__ = 0
+        self.__lock__ = threading.Lock()
+
+    def __len__(self):
+        return len(self.__index__)
+
+    def get(self, key):
+        """
+        Return a read-only view of the image of the key in the mapped file,
+        or None if it is not cached.
+        """
+        with self.__lock__:
+            entry = self.__index__.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            offset, shape, dtype = entry
+            count = int(np.prod(shape))
+            end = offset + count * np.dtype(dtype).itemsize
+            if self.__mmap__ is None or len(self.__mmap__) < end:
+                # map the images appended after the last mapping
+                self.__data__.flush()
+                self.__mmap__ = mmap.mmap(
+                    self.__data__.fileno(), 0, access=mmap.ACCESS_READ)
+            self.hits += 1
+            return np.frombuffer(
+                self.__mmap__, dtype=dtype, count=count,
+                offset=offset).reshape(shape)
+
+    def put(self, key, im):
+        """
+        Append the image to the data file.
+        """
+        im = np.ascontiguousarray(im)
+        with self.__lock__:
+            if key in self.__index__ or (
+                    self.max_bytes is not None and
+                    self.__size__ + im.nbytes > self.max_bytes):
+                return
+            self.__data__.seek(0, os.SEEK_END)
+            self.__data__.write(im.tostring())
+            self.__index__[key] = (self.__size__, im.shape, im.dtype.str)
+            self.__size__ += im.nbytes
+            self.__unsaved__ += 1
+            if self.__unsaved__ >= self.flush_interval:
+                self.__flush__()
+
+    def __flush__(self):
+        self.__data__.flush()
+        os.fsync(self.__data__.fileno())
+        tmp = self.path + ".index.tmp"
+        with open(tmp, "wb") as f:
+            cPickle.dump(self.__index__, f, protocol=cPickle.HIGHEST_PROTOCOL)
+        os.rename(tmp, self.path + ".index")
+        self.__unsaved__ = 0
+
+    def flush(self):
+        """
+        Save the index, so that the images added are seen by the later runs.
+        """
+        with self.__lock__:
+            self.__flush__()
+
+    def close(self):
+        self.flush()
+        self.__data__.close()
+
+
+def _mean_for_batch(mean, is_color):
+    """
+    Reshape the mean values to be subtracted from a (N, C, H, W) batch.
+    """
+    mean = np.asarray(mean, dtype=np.float32)
+    if mean.ndim == 1 and is_color:
+        # mean value per channel
+        return mean.reshape((1, -1, 1, 1))
+    elif mean.ndim == 2:
+        # elementwise mean of gray images
+        return mean[np.newaxis, np.newaxis]
+    # mean value of gray images, or elementwise mean with CHW layout
+    return mean
+
+
+def batch_transform(ims,
+                    crop_size,
+                    is_train,
+                    is_color=True,
+                    mean=None,
+                    resize_size=None,
+                    out=None):
+    """
+    The batch version of `simple_transform`. It crops, flips, transposes
+    and subtracts the mean of a list of images, and writes the results
+    into one float32 array with NCHW layout. The crop offsets and the flips
+    of all images are drawn at once, each image is copied into the output
+    array only once, and the mean is subtracted from the whole batch in
+    place.
+
+    Example usage:
+
+    .. code-block:: python
+
+        ims = [load_image(f) for f in files]
+        batch = batch_transform(ims, 224, True, resize_size=256)
+
+    :param ims: The input images with HWC layout, or HW layout for gray
+                images. The images may have different sizes.
+    :type ims: list
+    :param crop_size: The cropping size.
+    :type crop_size: int
+    :param is_train: Whether it is training or not. The images are cropped
+                     randomly and flipped with a probability of 0.5 if
+                     it is True, and cropped in the center otherwise.
+    :type is_train: bool
+    :param is_color: whether the images are color or not.
+    :type is_color: bool
+    :param mean: the mean values, which can be element-wise mean values or
+                 mean values per channel.
+    :type mean: numpy array | list
+    :param resize_size: The shorter edge length of the resized images. The
+                        images are not resized if it is None.
+    :type resize_size: int
+    :param out: The array to write the results into, with the shape
+                (len(ims), C, crop_size, crop_size) and dtype float32. A
+                new one is created if it is None.
+    :type out: ndarray
+    :return: the (N, C, crop_size, crop_size) float32 array.
+    :rtype: ndarray
+    """
+    if resize_size is not None:
+        ims = [resize_short(im, resize_size) for im in ims]
+    num = len(ims)
+    channels = ims[0].shape[2] if is_color and ims[0].ndim == 3 else 1
+    shape = (num, channels, crop_size, crop_size)
+    if out is None:
+        out = np.empty(shape, dtype=np.float32)
+    assert out.shape == shape and out.dtype == np.float32, \
+        "out should be a float32 array with the shape %s" % (shape, )
+
+    heights = np.array([im.shape[0] for im in ims])
+    widths = np.array([im.shape[1] for im in ims])
+    assert (heights >= crop_size).all() and (widths >= crop_size).all(), \
+        "the images should be larger than the cropping size"
+    if is_train:
+        h_starts = (np.random.random_sample(num) *
+                    (heights - crop_size + 1)).astype(np.int64)
+        w_starts = (np.random.random_sample(num) *
+                    (widths - crop_size + 1)).astype(np.int64)
+        flips = np.random.randint(2, size=num) == 0
+    else:
+        h_starts = (heights - crop_size) / 2
+        w_starts = (widths - crop_size) / 2
+        flips = np.zeros(num, dtype=bool)
+
+    for i, im in enumerate(ims):
+        h_start, w_start = h_starts[i], w_starts[i]
+        im = im[h_start:h_start + crop_size, w_start:w_start + crop_size]
+        if flips[i]:
+            im = im[:, ::-1]
+        if im.ndim == 3:
+            # HWC to CHW, converted to float32 by the assignment
+            out[i] = im.transpose((2, 0, 1))
+        else:
+            out[i, 0] = im
+
+    if mean is not None:
+        out -= _mean_for_batch(mean, is_color)
+    return out
+
+
+def batch_transform_mapper(crop_size,
+                           is_train,
+                           is_color=True,
+                           mean=None,
+                           resize_size=None):
+    """
+    Create a mapper for `paddle.v2.reader.xmap_readers`, which transforms
+    a minibatch of samples by `batch_transform`. The first field of each
+    sample is the image, and it is replaced by a view of the transformed
+    batch, which can be fed to the `DataFeeder` directly.
+
+    Example usage:
+
+    .. code-block:: python
+
+        reader = paddle.batch(decoded_reader, 128)
+        reader = paddle.reader.xmap_readers(
+            batch_transform_mapper(224, True, resize_size=256), reader, 4, 8)
+
+    :param crop_size: The cropping size.
+    :type crop_size: int
+    :param is_train: Whether it is training or not.
+    :type is_train: bool
+    :param is_color: whether the images are color or not.
+    :type is_color: bool
+    :param mean: the mean values, which can be element-wise mean values or
+                 mean values per channel.
+    :type mean: numpy array | list
+    :param resize_size: The shorter edge length of the resized images.
+    :type resize_size: int
+    :return: the mapper.
+    :rtype: callable
+    """
+    if mean is not None:
+        mean = np.asarray(mean, dtype=np.float32)
+
+    def mapper(batch):
+        out = batch_transform([sample[0] for sample in batch], crop_size,
+                              is_train, is_color, mean, resize_size)
+        return [(out[i], ) + tuple(sample[1:])
+                for i, sample in enumerate(batch)]
+
+    return mapper
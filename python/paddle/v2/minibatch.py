@@ -12,7 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-__all__ = ['batch']
+import bisect
+import random
+
+__all__ = ['batch', 'bucket_batch']
 
 
 def batch(reader, batch_size):
@@ -39,3 +42,124 @@ def batch(reader, batch_size):
             yield b
 
     return batch_reader
+
+
+def _default_length(sample):
+    if isinstance(sample, (tuple, list)):
+        return len(sample[0])
+    return len(sample)
+
+
+def bucket_batch(reader,
+                 bucket_boundaries,
+                 batch_size=None,
+                 max_tokens=None,
+                 length=_default_length,
+                 shuffle=False,
+                 buf_size=10000,
+                 drop_last=False):
+    """
+    Create a batched reader which puts samples of similar lengths in the
+    same mini-batch, so that less computation is spent on padding and on
+    the long tail of RNN steps.
+
+    Samples are grouped into buckets by their length: with boundaries
+    [b1, b2, ..., bn], the first bucket holds the lengths <= b1, the second
+    one the lengths in (b1, b2], ..., and the last one the lengths > bn.
+    A mini-batch is taken from a single bucket, and is full when it holds
+    batch_size samples, or when one more sample would make its padded size,
+    i.e. the number of samples times the max length, exceed max_tokens.
+
+    :param reader: the data reader to read from.
+    :type reader: callable
+    :param bucket_boundaries: the upper length bounds of the buckets.
+    :type bucket_boundaries: list
+    :param batch_size: size of each mini-batch. Exactly one of batch_size
+                       and max_tokens must be set.
+    :type batch_size: int
+    :param max_tokens: the max padded tokens of each mini-batch.
+    :type max_tokens: int
+    :param length: a function returning the length of a sample. The default
+                   is the length of the first field of the sample.
+    :type length: callable
+    :param shuffle: whether to shuffle. If True, the reader reads buf_size
+                    samples at a time, shuffles them before bucketing, and
+                    shuffles the mini-batches of all the buckets before
+                    yielding them.
+    :type shuffle: bool
+    :param buf_size: the number of samples shuffled at a time.
+    :type buf_size: int
+    :param drop_last: whether to drop the mini-batches which are not full
+                      when the reader ends.
+    :type drop_last: bool
+    :return: the batched reader.
+    :rtype: callable
+    """
+    if (batch_size is None) == (max_tokens is None):
+        raise ValueError("Exactly one of batch_size and max_tokens must be "
+                         "set")
+    boundaries = sorted(bucket_boundaries)
+
+    def bucket_batch_reader():
+        buckets = [[] for _ in xrange(len(boundaries) + 1)]
+        max_lens = [0] * len(buckets)
+
+        def add(sample):
+            # add the sample to its bucket, return the batch completed
+            sample_len = length(sample)
+            i = bisect.bisect_left(boundaries, sample_len)
+            b = buckets[i]
+            ret = None
+            if max_tokens is not None and b and (len(b) + 1) * max(
+                    max_lens[i], sample_len) > max_tokens:
+                ret = b
+                b = buckets[i] = []
+                max_lens[i] = 0
+            b.append(sample)
+            max_lens[i] = max(max_lens[i], sample_len)
+            if batch_size is not None and len(b) == batch_size:
+                ret = b
+                buckets[i] = []
+                max_lens[i] = 0
+            return ret
+
+        def flush():
+            rest = [b for b in buckets if b]
+            for i in xrange(len(buckets)):
+                buckets[i] = []
+                max_lens[i] = 0
+            return rest
+
+        if not shuffle:
+            for sample in reader():
+                b = add(sample)
+                if b is not None:
+                    yield b
+            if not drop_last:
+                for b in flush():
+                    yield b
+            return
+
+        def shuffled_batches(samples):
+            random.shuffle(samples)
+            batches = [b for b in map(add, samples) if b is not None]
+            random.shuffle(batches)
+            return batches
+
+        samples = []
+        for sample in reader():
+            samples.append(sample)
+            if len(samples) == buf_size:
+                # the samples not batched yet stay in the buckets for the
+                # next buffer
+                for b in shuffled_batches(samples):
+                    yield b
+                samples = []
+        batches = shuffled_batches(samples)
+        if not drop_last:
+            batches += flush()
+            random.shuffle(batches)
+        for b in batches:
+            yield b
+
+    return bucket_batch_reader
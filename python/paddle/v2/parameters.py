@@ -16,12 +16,13 @@ import numpy as np
 from paddle.proto.ParameterConfig_pb2 import ParameterConfig
 from collections import OrderedDict
 import paddle.trainer.config_parser as cp
+import mmap
 import struct
 import tarfile
 import cStringIO
 from topology import Topology
 
-__all__ = ['Parameters', 'create']
+__all__ = ['Parameters', 'create', 'snapshot_to_tar']
 
 
 def create(layers):
@@ -339,23 +340,27 @@ class Parameters(object):
         """
         tar = tarfile.TarFile(fileobj=f, mode='w')
         for nm in self.names():
-            buf = cStringIO.StringIO()
-            self.serialize(nm, buf)
-            tarinfo = tarfile.TarInfo(name=nm)
-            buf.seek(0)
-            tarinfo.size = len(buf.getvalue())
-            tar.addfile(tarinfo, buf)
-
-            conf = self.__param_conf__[nm]
-            confStr = conf.SerializeToString()
-            tarinfo = tarfile.TarInfo(name="%s.protobuf" % nm)
-            tarinfo.size = len(confStr)
-            buf = cStringIO.StringIO(confStr)
-            buf.seek(0)
-            tar.addfile(tarinfo, fileobj=buf)
+            __add_parameter_to_tar__(tar, nm, self.get(nm),
+                                     self.__param_conf__[nm])
+
+    def snapshot(self):
+        """
+        Copy the values of all parameters, which can be saved by
+        `snapshot_to_tar` later, e.g. in another thread while the training
+        goes on.
+
+        :return: the names of the parameters mapped to their values and
+                 configurations.
+        :rtype: OrderedDict
+        """
+        snapshot = OrderedDict()
+        for nm in self.names():
+            value = np.array(self.get(nm), dtype=np.float32, copy=True)
+            snapshot[nm] = (value, self.__param_conf__[nm])
+        return snapshot
 
     @staticmethod
-    def from_tar(f):
+    def from_tar(f, use_mmap=False):
         """
         Create a `Parameters` object from the given file. And
         the `Parameters` only contains the parameters in this
@@ -363,24 +368,46 @@ class Parameters(object):
         defined network and the given file. For example, it
         can be used in the inference.
 
+        The tar file is read in one sequential pass, and each parameter is
+        read straight into its own array.
+
         :param f: the initialized model file.
         :type f: tar file
+        :param use_mmap: memory map the file and make the parameters
+                         read-only views of it instead of reading them. It
+                         is only used if f is a real file.
+        :type use_mmap: bool
         :return: A Parameters object.
         :rtype: Parameters.
         """
         params = Parameters()
         tar = tarfile.TarFile(fileobj=f, mode='r')
+        mapped = __mmap_file__(f) if use_mmap else None
+        values = dict()
         for finfo in tar:
             assert isinstance(finfo, tarfile.TarInfo)
+            if not finfo.isfile():
+                continue
             if finfo.name.endswith('.protobuf'):
-                f = tar.extractfile(finfo)
                 conf = ParameterConfig()
-                conf.ParseFromString(f.read())
+                conf.ParseFromString(tar.extractfile(finfo).read())
                 params.__append_config__(conf)
+            elif mapped is not None:
+                values[finfo.name] = __parameter_from_mmap__(mapped, finfo)
+            else:
+                values[finfo.name] = __read_parameter__(
+                    tar.extractfile(finfo))
 
         for param_name in params.names():
-            f = tar.extractfile(param_name)
-            params.deserialize(param_name, f)
+            if param_name not in values:
+                raise ValueError("No value of parameter %s in the tar file" %
+                                 param_name)
+            shape = params.get_shape(param_name)
+            value = values[param_name]
+            if value.size != reduce(lambda a, b: a * b, shape, 1):
+                raise ValueError("Parameter %s has %d values, expect shape "
+                                 "%s" % (param_name, value.size, shape))
+            params.__tmp_params__[param_name] = value.reshape(shape)
         return params
 
     def init_from_tar(self, f, exclude_params=[]):
@@ -402,6 +429,124 @@ class Parameters(object):
                 self.set(pname, tar_param.get(pname))
 
 
+class __ParameterReader__(object):
+    """
+    A file-like object reading a parameter value in the format written by
+    `Parameters.serialize`, without copying the value into a string.
+    """
+
+    def __init__(self, value):
+        value = np.ascontiguousarray(value, dtype=np.float32)
+        self.__chunks__ = [
+            struct.pack("IIQ", 0, 4, value.size), buffer(value.reshape(-1))
+        ]
+        self.__pos__ = 0
+        self.size = sum(len(c) for c in self.__chunks__)
+
+    def read(self, size=-1):
+        if size < 0:
+            size = self.size
+        parts = []
+        while size > 0 and self.__chunks__:
+            chunk = self.__chunks__[0]
+            part = chunk[self.__pos__:self.__pos__ + size]
+            parts.append(part)
+            size -= len(part)
+            self.__pos__ += len(part)
+            if self.__pos__ >= len(chunk):
+                self.__chunks__.pop(0)
+                self.__pos__ = 0
+        return "".join(parts)
+
+
+def __add_parameter_to_tar__(tar, name, value, conf):
+    reader = __ParameterReader__(value)
+    tarinfo = tarfile.TarInfo(name=name)
+    tarinfo.size = reader.size
+    tar.addfile(tarinfo, reader)
+
+    confStr = conf.SerializeToString()
+    tarinfo = tarfile.TarInfo(name="%s.protobuf" % name)
+    tarinfo.size = len(confStr)
+    buf = cStringIO.StringIO(confStr)
+    buf.seek(0)
+    tar.addfile(tarinfo, fileobj=buf)
+
+
+def snapshot_to_tar(snapshot, f):
+    """
+    Save a snapshot taken by `Parameters.snapshot` to a tar file, in the
+    same format as `Parameters.to_tar`.
+
+    :param snapshot: the snapshot of the parameters.
+    :type snapshot: OrderedDict
+    :param f: the file to write.
+    :type f: file
+    :return: Nothing.
+    """
+    tar = tarfile.TarFile(fileobj=f, mode='w')
+    for nm, (value, conf) in snapshot.iteritems():
+        __add_parameter_to_tar__(tar, nm, value, conf)
+
+
+# the header written by Parameters.serialize
+__PARAMETER_HEADER__ = struct.Struct("IIQ")
+__READ_CHUNK_SIZE__ = 1 << 20
+
+
+def __parse_parameter_header__(header):
+    if len(header) != __PARAMETER_HEADER__.size:
+        raise ValueError("Truncated parameter header")
+    _, value_size, size = __PARAMETER_HEADER__.unpack(header)
+    if value_size != 4:
+        raise ValueError("Only float32 parameters are supported")
+    return size
+
+
+def __read_parameter__(f):
+    """
+    Read a parameter written by `Parameters.serialize` from f, chunk by
+    chunk into a preallocated array.
+    """
+    size = __parse_parameter_header__(f.read(__PARAMETER_HEADER__.size))
+    value = np.empty(size, dtype=np.float32)
+    dest = value.view(np.uint8)
+    pos = 0
+    while pos < dest.size:
+        data = f.read(min(__READ_CHUNK_SIZE__, dest.size - pos))
+        if not data:
+            raise ValueError("Truncated parameter value")
+        dest[pos:pos + len(data)] = np.frombuffer(data, dtype=np.uint8)
+        pos += len(data)
+    return value
+
+
+def __mmap_file__(f):
+    """
+    Memory map the file f, or return None if it is not a real file.
+    """
+    try:
+        fileno = f.fileno()
+    except (AttributeError, IOError):
+        return None
+    return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+
+
+def __parameter_from_mmap__(mapped, finfo):
+    """
+    Make a read-only view of the parameter of the tar member finfo in the
+    memory mapped tar file.
+    """
+    offset = finfo.offset_data
+    size = __parse_parameter_header__(
+        mapped[offset:offset + __PARAMETER_HEADER__.size])
+    return np.frombuffer(
+        mapped,
+        dtype=np.float32,
+        count=size,
+        offset=offset + __PARAMETER_HEADER__.size)
+
+
 def __get_parameter_in_gradient_machine__(gradient_machine, name):
     """
 
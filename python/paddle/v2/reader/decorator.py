@@ -14,17 +14,26 @@
 
 __all__ = [
     'map_readers', 'buffered', 'compose', 'chain', 'shuffle',
-    'ComposeNotAligned', 'firstn', 'xmap_readers', 'PipeReader'
+    'ComposeNotAligned', 'firstn', 'xmap_readers', 'PipeReader',
+    'sliding_shuffle', 'global_shuffle'
 ]
 
-from threading import Thread
+from threading import Thread, Event
 import subprocess
+import multiprocessing
 
-from Queue import Queue
+from Queue import Queue, Empty, Full
+import cPickle as pickle
+from collections import deque
+import heapq
 import itertools
 import random
+import sys
+import traceback
 import zlib
 
+from shared_memory import SharedMemoryRing
+
 
 def map_readers(func, *readers):
     """
@@ -83,6 +92,121 @@ def shuffle(reader, buf_size):
     return data_reader
 
 
+def _sample_nbytes(sample):
+    """
+    Estimate the memory held by a sample in bytes.
+    """
+    if hasattr(sample, 'nbytes'):
+        # numpy.ndarray
+        return sample.nbytes
+    if isinstance(sample, (tuple, list)):
+        return sys.getsizeof(sample) + sum(_sample_nbytes(e) for e in sample)
+    if isinstance(sample, dict):
+        return sys.getsizeof(sample) + sum(
+            _sample_nbytes(k) + _sample_nbytes(v)
+            for k, v in sample.iteritems())
+    return sys.getsizeof(sample)
+
+
+def sliding_shuffle(reader, buf_bytes, sizeof=_sample_nbytes):
+    """
+    Creates a data reader whose data output is shuffled by a sliding buffer.
+
+    Unlike shuffle, the buffer is bounded by bytes, and it is not flushed
+    at once when it is full: every sample read after that pushes out a
+    sample chosen at random from the buffer, so the output is continuous.
+
+    :param reader: the original reader whose output will be shuffled.
+    :type reader: callable
+    :param buf_bytes: the max bytes of the samples held by the buffer.
+    :type buf_bytes: int
+    :param sizeof: a function returning the bytes of a sample. The default
+                   counts the nbytes of numpy arrays and the size of python
+                   objects.
+    :type sizeof: callable
+
+    :return: the new reader whose output is shuffled.
+    :rtype: callable
+    """
+
+    def data_reader():
+        buf = []
+        sizes = []
+        total = 0
+        for e in reader():
+            buf.append(e)
+            sizes.append(sizeof(e))
+            total += sizes[-1]
+            while total > buf_bytes and buf:
+                i = random.randrange(len(buf))
+                buf[i], buf[-1] = buf[-1], buf[i]
+                sizes[i], sizes[-1] = sizes[-1], sizes[i]
+                total -= sizes.pop()
+                yield buf.pop()
+
+        random.shuffle(buf)
+        for b in buf:
+            yield b
+
+    return data_reader
+
+
+def global_shuffle(readers, buf_bytes, open_num=4, sizeof=_sample_nbytes):
+    """
+    Creates a data reader which shuffles the samples of several readers,
+    typically one reader per file or shard, within a memory budget.
+
+    The order of the readers is shuffled in each pass, open_num of them are
+    read at the same time, and the next sample is taken from one of them
+    chosen at random. The interleaved samples are then shuffled by
+    sliding_shuffle with buf_bytes.
+
+    ..  code-block:: python
+
+        files = paddle.v2.dataset.common.cluster_files(
+            "/data/train-*.mmap", trainer_count, trainer_id)
+        reader = global_shuffle(
+            [paddle.v2.dataset.common.memmap_files_reader(f) for f in files],
+            buf_bytes=1 << 30)
+
+    Readers created by cluster_files_reader or creator.recordio for each
+    file can be used in the same way.
+
+    :param readers: the readers to read from.
+    :type readers: list
+    :param buf_bytes: the max bytes of the samples held by the shuffle
+                      buffer.
+    :type buf_bytes: int
+    :param open_num: the number of readers read at the same time.
+    :type open_num: int
+    :param sizeof: a function returning the bytes of a sample.
+    :type sizeof: callable
+
+    :return: the new reader whose output is shuffled.
+    :rtype: callable
+    """
+    if open_num < 1:
+        raise ValueError("open_num must be positive")
+
+    def interleaved_reader():
+        pending = list(readers)
+        random.shuffle(pending)
+        pending = iter(pending)
+        opened = [iter(r()) for r in itertools.islice(pending, open_num)]
+        while opened:
+            i = random.randrange(len(opened))
+            try:
+                yield next(opened[i])
+            except StopIteration:
+                r = next(pending, None)
+                if r is None:
+                    opened.pop(i)
+                else:
+                    opened[i] = iter(r())
+
+    return sliding_shuffle(interleaved_reader, buf_bytes, sizeof)
+
+
 def chain(*readers):
     """
     Creates a data reader whose output is the outputs of input data
@@ -233,10 +357,217 @@ class XmapEndSignal():
     pass
 
 
-def xmap_readers(mapper, reader, process_num, buffer_size, order=False):
+class XmapWorkerError(object):
+    """
+    Carries the traceback of an exception raised by the reader or by a
+    mapper process of xmap_readers to the consumer.
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+
+class _ReorderBuffer(object):
+    """
+    Restores the order of the items produced out of order by the workers
+    of xmap_readers. An item is released as soon as all the items before
+    it have been released.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.next_order = 0
+
+    def push(self, order, item):
+        heapq.heappush(self.heap, (order, item))
+        while self.heap and self.heap[0][0] == self.next_order:
+            yield heapq.heappop(self.heap)[1]
+            self.next_order += 1
+
+
+def _put_until_stopped(queue, item, stop):
+    """
+    Put item into a bounded queue, give up when the stop event is set.
+    Returns True if the item is put.
+    """
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Full:
+            pass
+    return False
+
+
+def _get_from_workers(queue, workers):
+    """
+    Get an item put by the worker processes, raise if all of them have
+    exited without putting it.
+    """
+    while True:
+        alive = any(w.is_alive() for w in workers)
+        try:
+            return queue.get(timeout=1)
+        except Empty:
+            if not alive:
+                raise RuntimeError("xmap_readers: worker processes exited "
+                                   "unexpectedly")
+
+
+def _xmap_process_worker(mapper, in_queue, out_queue, ring=None):
+    # samples are pickled explicitly, so that a pickling error is reported
+    # to the consumer instead of being lost in the feeder thread of queue.
+    chunk = in_queue.get()
+    while not isinstance(chunk, XmapEndSignal):
+        idx, data = chunk
+        slot = None
+        try:
+            mapped = [mapper(sample) for sample in pickle.loads(data)]
+            if ring is not None:
+                slot = ring.acquire()
+                mapped = ring.write(slot, mapped)
+            data = pickle.dumps(mapped, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            out_queue.put(XmapWorkerError(traceback.format_exc()))
+            return
+        out_queue.put((idx, slot, data))
+        chunk = in_queue.get()
+    out_queue.put(chunk)
+
+
+def _xmap_process_readers(mapper, reader, process_num, buffer_size, order,
+                          chunk_size, shared_memory_size):
+    end = XmapEndSignal()
+    queue_size = max(1, buffer_size // chunk_size)
+    window_size = queue_size + process_num
+
+    def put_chunk(in_queue, window, idx, chunk, stop):
+        if order and not _put_until_stopped(window, None, stop):
+            return False
+        data = pickle.dumps(chunk, pickle.HIGHEST_PROTOCOL)
+        return _put_until_stopped(in_queue, (idx, data), stop)
+
+    # read samples from reader, and put them into in_queue by chunks
+    def read_worker(in_queue, out_queue, window, stop):
+        try:
+            idx = 0
+            chunk = []
+            for sample in reader():
+                chunk.append(sample)
+                if len(chunk) == chunk_size:
+                    if not put_chunk(in_queue, window, idx, chunk, stop):
+                        return
+                    idx += 1
+                    chunk = []
+            if chunk:
+                if not put_chunk(in_queue, window, idx, chunk, stop):
+                    return
+        except Exception:
+            _put_until_stopped(out_queue,
+                               XmapWorkerError(traceback.format_exc()), stop)
+            return
+        for i in xrange(process_num):
+            if not _put_until_stopped(in_queue, end, stop):
+                return
+
+    def xreader():
+        in_queue = multiprocessing.Queue(queue_size)
+        out_queue = multiprocessing.Queue(queue_size)
+        # bounds the chunks held by the reorder buffer when order is True
+        window = Queue(window_size)
+        stop = Event()
+        ring = None
+        if shared_memory_size > 0:
+            # window_size slots for the chunks in flight, and window_size
+            # slots for the chunks yielded recently, whose arrays may still
+            # be used by the consumer.
+            ring = SharedMemoryRing(2 * window_size,
+                                    shared_memory_size // (2 * window_size))
+        held_slots = deque()
+
+        def load(slot, data):
+            samples = pickle.loads(data)
+            if slot is None:
+                return samples
+            held_slots.append(slot)
+            if len(held_slots) > window_size:
+                ring.release(held_slots.popleft())
+            return ring.read(slot, samples)
+
+        # fork the workers before starting the read thread
+        workers = []
+        for i in xrange(process_num):
+            worker = multiprocessing.Process(
+                target=_xmap_process_worker,
+                args=(mapper, in_queue, out_queue, ring))
+            worker.daemon = True
+            workers.append(worker)
+        for w in workers:
+            w.start()
+        t = Thread(
+            target=read_worker, args=(in_queue, out_queue, window, stop))
+        t.daemon = True
+        t.start()
+
+        finished = 0
+        try:
+            reorder_buffer = _ReorderBuffer()
+            while finished < process_num:
+                item = _get_from_workers(out_queue, workers)
+                if isinstance(item, XmapEndSignal):
+                    finished += 1
+                    continue
+                if isinstance(item, XmapWorkerError):
+                    raise RuntimeError("xmap_readers: worker failed with\n" +
+                                       item.message)
+                idx, slot, data = item
+                if not order:
+                    for sample in load(slot, data):
+                        yield sample
+                    continue
+                for slot, data in reorder_buffer.push(idx, (slot, data)):
+                    window.get()
+                    for sample in load(slot, data):
+                        yield sample
+        finally:
+            stop.set()
+            for w in workers:
+                # the consumer stopped early or a worker failed
+                if finished < process_num and w.is_alive():
+                    w.terminate()
+                w.join()
+
+    return xreader
+
+
+def xmap_readers(mapper,
+                 reader,
+                 process_num,
+                 buffer_size,
+                 order=False,
+                 use_process=False,
+                 chunk_size=16,
+                 shared_memory_size=0):
     """
     Use multiprocess to map samples from reader by a mapper defined by user.
     And this function contains a buffered decorator.
+
+    By default the mapper runs in threads, which suits mappers that release
+    the GIL. Set use_process to True to run CPU-bound mappers written in
+    Python, e.g. paddle.v2.image.simple_transform, in worker processes.
+    In that case, samples are sent to the workers in chunks of chunk_size
+    samples to amortize the pickling cost, the mapper and the samples must
+    be picklable on platforms without fork, and an exception raised by the
+    mapper is re-raised by the decorated reader as a RuntimeError.
+
+    When shared_memory_size is positive, the numpy arrays in the mapped
+    samples are sent back through a SharedMemoryRing of that many bytes
+    instead of being pickled, and the decorated reader yields read-only
+    views of the shared memory. A view stays valid until
+    (buffer_size // chunk_size + process_num) * chunk_size more samples are
+    read, copy it if it is kept longer. The arrays of a chunk that do not
+    fit in a slot of the ring are pickled as usual.
+
     :param mapper:  a function to map sample.
     :type mapper: callable
     :param reader: the data reader to read from
@@ -247,9 +578,22 @@ def xmap_readers(mapper, reader, process_num, buffer_size, order=False):
     :type buffer_size: int
     :param order: keep the order of reader
     :type order: bool
+    :param use_process: map samples in worker processes instead of threads
+    :type use_process: bool
+    :param chunk_size: the number of samples sent to a worker process at
+                       once, only used when use_process is True
+    :type chunk_size: int
+    :param shared_memory_size: the bytes of shared memory used to send the
+                               mapped numpy arrays, only used when
+                               use_process is True. 0 disables it.
+    :type shared_memory_size: int
     :return: the decarated reader
     :rtype: callable
     """
+    if use_process:
+        return _xmap_process_readers(mapper, reader, process_num, buffer_size,
+                                     order, chunk_size, shared_memory_size)
+
     end = XmapEndSignal()
 
     # define a worker to read samples from reader to in_queue
@@ -258,10 +602,12 @@ def xmap_readers(mapper, reader, process_num, buffer_size, order=False):
             in_queue.put(i)
         in_queue.put(end)
 
-    # define a worker to read samples from reader to in_queue with order flag
-    def order_read_worker(reader, in_queue):
+    # define a worker to read samples from reader to in_queue with order flag,
+    # it blocks when the reorder window is full
+    def order_read_worker(reader, in_queue, window):
         in_order = 0
         for i in reader():
+            window.put(None)
             in_queue.put((in_order, i))
             in_order += 1
         in_queue.put(end)
@@ -278,16 +624,13 @@ def xmap_readers(mapper, reader, process_num, buffer_size, order=False):
         out_queue.put(end)
 
     # define a worker to handle samples from in_queue by mapper
-    # and put mapped samples into out_queue by order
-    def order_handle_worker(in_queue, out_queue, mapper, out_order):
+    # and put mapped samples with their order into out_queue
+    def order_handle_worker(in_queue, out_queue, mapper):
         ins = in_queue.get()
         while not isinstance(ins, XmapEndSignal):
             order, sample = ins
             r = mapper(sample)
-            while order != out_order[0]:
-                pass
-            out_queue.put(r)
-            out_order[0] += 1
+            out_queue.put((order, r))
             ins = in_queue.get()
         in_queue.put(end)
         out_queue.put(end)
@@ -295,35 +638,37 @@ def xmap_readers(mapper, reader, process_num, buffer_size, order=False):
     def xreader():
         in_queue = Queue(buffer_size)
         out_queue = Queue(buffer_size)
-        out_order = [0]
+        # the samples read but not yielded yet are limited by the window,
+        # which bounds the reorder buffer
+        window = Queue(buffer_size + process_num)
         # start a read worker in a thread
         target = order_read_worker if order else read_worker
-        t = Thread(target=target, args=(reader, in_queue))
+        args = (reader, in_queue, window) if order else (reader, in_queue)
+        t = Thread(target=target, args=args)
         t.daemon = True
         t.start()
         # start several handle_workers
         target = order_handle_worker if order else handle_worker
-        args = (in_queue, out_queue, mapper, out_order) if order else (
-            in_queue, out_queue, mapper)
         workers = []
         for i in xrange(process_num):
-            worker = Thread(target=target, args=args)
+            worker = Thread(target=target, args=(in_queue, out_queue, mapper))
             worker.daemon = True
             workers.append(worker)
         for w in workers:
             w.start()
 
-        sample = out_queue.get()
-        while not isinstance(sample, XmapEndSignal):
-            yield sample
-            sample = out_queue.get()
-        finish = 1
+        finish = 0
+        reorder_buffer = _ReorderBuffer()
         while finish < process_num:
             sample = out_queue.get()
             if isinstance(sample, XmapEndSignal):
                 finish += 1
-            else:
+            elif not order:
                 yield sample
+            else:
+                for r in reorder_buffer.push(*sample):
+                    window.get()
+                    yield r
 
     return xreader
 
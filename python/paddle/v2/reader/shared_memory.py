@@ -0,0 +1,154 @@
+# Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+A shared memory transport for the numpy arrays in the samples passed between
+processes by reader decorators.
+
+The memory is an anonymous shared mmap divided into fixed size slots. It is
+created before the worker processes are forked, so it is shared by them. A
+producer acquires a free slot, copies the arrays of a chunk of samples into
+it, and sends only the small array descriptors through a queue. The consumer
+turns the descriptors back into numpy views of the slot without copying, and
+releases the slot when the views are no longer needed.
+"""
+
+__all__ = ['SharedMemoryRing']
+
+import mmap
+import multiprocessing
+import sys
+
+import numpy
+
+# align the arrays in a slot to the cache line size
+_ALIGNMENT = 64
+
+
+class _SharedArray(object):
+    """
+    Describes a numpy array stored in a slot of a SharedMemoryRing.
+    """
+    __slots__ = ('offset', 'dtype', 'shape')
+
+    def __init__(self, offset, dtype, shape):
+        self.offset = offset
+        self.dtype = dtype
+        self.shape = shape
+
+    def __getstate__(self):
+        return (self.offset, self.dtype, self.shape)
+
+    def __setstate__(self, state):
+        self.offset, self.dtype, self.shape = state
+
+
+class SharedMemoryRing(object):
+    """
+    A ring of fixed size shared memory slots.
+
+    The ring must be created before forking the processes that use it. Only
+    the platforms that fork the worker processes are supported.
+
+    :param slot_num: the number of slots.
+    :type slot_num: int
+    :param slot_size: the size of each slot in bytes.
+    :type slot_size: int
+    """
+
+    def __init__(self, slot_num, slot_size):
+        if sys.platform == 'win32':
+            raise NotImplementedError(
+                "SharedMemoryRing needs the worker processes to be forked")
+        if slot_num <= 0 or slot_size <= 0:
+            raise ValueError("slot_num and slot_size must be positive")
+        self.slot_num = slot_num
+        self.slot_size = slot_size
+        self.memory = mmap.mmap(-1, slot_num * slot_size)
+        self.free_slots = multiprocessing.Queue(slot_num)
+        for i in xrange(slot_num):
+            self.free_slots.put(i)
+
+    def acquire(self):
+        """
+        Wait for a free slot and return its index.
+        """
+        return self.free_slots.get()
+
+    def release(self, slot):
+        """
+        Return the slot to the ring. The views of the slot are invalid
+        after that.
+        """
+        self.free_slots.put(slot)
+
+    def _view(self, slot, offset, dtype, shape):
+        count = int(numpy.prod(shape)) if len(shape) > 0 else 1
+        return numpy.frombuffer(
+            self.memory,
+            dtype=dtype,
+            count=count,
+            offset=slot * self.slot_size + offset).reshape(shape)
+
+    def write(self, slot, obj):
+        """
+        Copy the numpy arrays in obj into the slot.
+
+        obj could be a numpy array, or a tuple, list or dict holding them at
+        any depth. The arrays which do not fit in the rest of the slot are
+        left in obj.
+
+        :return: obj with the arrays copied replaced by their descriptors.
+        """
+        offset = [0]
+
+        def encode(o):
+            if isinstance(o, numpy.ndarray):
+                if o.dtype.hasobject:
+                    return o
+                begin = (offset[0] + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+                if begin + o.nbytes > self.slot_size:
+                    return o
+                self._view(slot, begin, o.dtype, o.shape)[...] = o
+                offset[0] = begin + o.nbytes
+                return _SharedArray(begin, o.dtype.str, o.shape)
+            elif isinstance(o, tuple):
+                return tuple(encode(e) for e in o)
+            elif isinstance(o, list):
+                return [encode(e) for e in o]
+            elif isinstance(o, dict):
+                return dict((k, encode(v)) for k, v in o.iteritems())
+            return o
+
+        return encode(obj)
+
+    def read(self, slot, obj):
+        """
+        The reverse of write. The descriptors in obj are replaced by read-only
+        numpy views of the slot, no data is copied.
+        """
+
+        def decode(o):
+            if isinstance(o, _SharedArray):
+                view = self._view(slot, o.offset, o.dtype, o.shape)
+                view.flags.writeable = False
+                return view
+            elif isinstance(o, tuple):
+                return tuple(decode(e) for e in o)
+            elif isinstance(o, list):
+                return [decode(e) for e in o]
+            elif isinstance(o, dict):
+                return dict((k, decode(v)) for k, v in o.iteritems())
+            return o
+
+        return decode(obj)
@@ -12,9 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import random
 import time
 import unittest
 
+import numpy
+
 import paddle.v2.reader
 
 
@@ -122,6 +125,45 @@ class TestShuffle(unittest.TestCase):
             self.assertEqual(total, 10)
 
 
+class TestSlidingShuffle(unittest.TestCase):
+    def test_sliding_shuffle(self):
+        def sizeof(e):
+            return 10
+
+        for buf_bytes in (0, 10, 35, 1000):
+            s = paddle.v2.reader.sliding_shuffle(
+                reader_creator_10(0), buf_bytes, sizeof)
+            self.assertEqual(sorted(s()), range(10))
+
+    def test_continuous_output(self):
+        read = [0]
+
+        def reader():
+            for i in xrange(100):
+                read[0] += 1
+                yield i
+
+        # the buffer holds at most 4 samples of 8 bytes, so a sample is
+        # yielded after each read once 5 samples are read.
+        s = paddle.v2.reader.sliding_shuffle(reader, 32, lambda e: 8)
+        for idx, e in enumerate(s()):
+            self.assertEqual(read[0], min(idx + 5, 100))
+
+    def test_global_shuffle(self):
+        def shard(begin):
+            def reader():
+                for i in xrange(begin, begin + 10):
+                    yield i
+
+            return reader
+
+        readers = [shard(i * 10) for i in xrange(5)]
+        for open_num in (1, 2, 10):
+            s = paddle.v2.reader.global_shuffle(
+                readers, 1 << 10, open_num=open_num)
+            self.assertEqual(sorted(s()), range(50))
+
+
 class TestXmap(unittest.TestCase):
     def test_xmap(self):
         def mapper(x):
@@ -145,6 +187,77 @@ class TestXmap(unittest.TestCase):
                         for idx, e in enumerate(result):
                             self.assertEqual(e, mapper(idx))
 
+    def test_xmap_order(self):
+        def mapper(x):
+            # finish the samples out of order
+            time.sleep(random.random() * 0.01)
+            return x
+
+        def reader():
+            for i in xrange(100):
+                yield i
+
+        for tNum in (2, 8):
+            for size in (1, 4):
+                r = paddle.v2.reader.xmap_readers(mapper, reader, tNum, size,
+                                                  True)
+                self.assertEqual(list(r()), range(100))
+
+    def test_xmap_process(self):
+        def mapper(x):
+            return (x + 1)
+
+        for order in (True, False):
+            for pNum in (1, 4):
+                for chunk_size in (1, 3, 16):
+                    reader = paddle.v2.reader.xmap_readers(
+                        mapper,
+                        reader_creator_10(0),
+                        pNum,
+                        8,
+                        order,
+                        use_process=True,
+                        chunk_size=chunk_size)
+                    for n in xrange(2):
+                        result = list(reader())
+                        if not order:
+                            result.sort()
+                        self.assertEqual(result, map(mapper, range(10)))
+
+    def test_xmap_shared_memory(self):
+        def mapper(x):
+            return numpy.arange(x, x + 100, dtype='float32'), x
+
+        for order in (True, False):
+            reader = paddle.v2.reader.xmap_readers(
+                mapper,
+                reader_creator_10(0),
+                2,
+                4,
+                order,
+                use_process=True,
+                chunk_size=2,
+                shared_memory_size=1 << 20)
+            result = list(reader())
+            if not order:
+                result.sort(key=lambda sample: sample[1])
+            self.assertEqual([x for _, x in result], range(10))
+            for arr, x in result[-4:]:
+                self.assertFalse(arr.flags.writeable)
+                self.assertTrue(numpy.array_equal(arr, mapper(x)[0]))
+
+    def test_xmap_process_error(self):
+        def mapper(x):
+            if x == 5:
+                raise ValueError("bad sample")
+            return x
+
+        reader = paddle.v2.reader.xmap_readers(
+            mapper, reader_creator_10(0), 2, 4, use_process=True, chunk_size=2)
+        with self.assertRaises(RuntimeError):
+            for e in reader():
+                pass
+
 
 class TestPipeReader(unittest.TestCase):
     def test_pipe_reader(self):
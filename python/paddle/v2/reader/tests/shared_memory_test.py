@@ -0,0 +1,53 @@
+#   Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import numpy
+
+from paddle.v2.reader.shared_memory import SharedMemoryRing
+
+
+class TestSharedMemoryRing(unittest.TestCase):
+    def test_write_read(self):
+        ring = SharedMemoryRing(2, 1024)
+        slot = ring.acquire()
+        small = numpy.arange(10, dtype='int64')
+        scalar = numpy.array(3.5)
+        big = numpy.zeros(1024, dtype='float32')
+        sample = [(small, 'label', {'x': scalar}), big]
+
+        encoded = ring.write(slot, sample)
+        # the array larger than the slot is not copied
+        self.assertIs(encoded[1], big)
+
+        decoded = ring.read(slot, encoded)
+        self.assertTrue(numpy.array_equal(decoded[0][0], small))
+        self.assertEqual(decoded[0][1], 'label')
+        self.assertEqual(decoded[0][2]['x'], 3.5)
+        self.assertFalse(decoded[0][0].flags.writeable)
+        # the views share the memory of the slot
+        ring.write(slot, [small * 2])
+        self.assertTrue(numpy.array_equal(decoded[0][0], small * 2))
+
+    def test_acquire_release(self):
+        ring = SharedMemoryRing(2, 64)
+        slots = set([ring.acquire(), ring.acquire()])
+        self.assertEqual(slots, set([0, 1]))
+        ring.release(1)
+        self.assertEqual(ring.acquire(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
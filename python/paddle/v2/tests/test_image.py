@@ -12,12 +12,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import cPickle
+import cStringIO
+import os
+import shutil
+import tarfile
+import tempfile
 import unittest
 import numpy as np
 
 import paddle.v2.image as image
 
 
+def _reverse(bytes):
+    return bytes[::-1]
+
+
 class Image(unittest.TestCase):
     def test_resize_flip_chw(self):
         # resize
@@ -38,6 +48,136 @@ class Image(unittest.TestCase):
         self.assertEqual(h, im.shape[1])
         self.assertEqual(w, im.shape[2])
 
+    def test_batch_transform(self):
+        ims = [
+            np.random.randint(
+                0, 256, size=(h, w, 3)).astype('uint8')
+            for h, w in [(32, 40), (36, 32), (32, 32)]
+        ]
+        mean = [103.94, 116.78, 123.68]
+
+        out = image.batch_transform(ims, 24, False, mean=mean)
+        self.assertEqual(out.shape, (3, 3, 24, 24))
+        self.assertEqual(out.dtype, np.float32)
+        for im, chw in zip(ims, out):
+            expected = image.to_chw(image.center_crop(im, 24)).astype(
+                'float32') - np.array(mean, 'float32')[:, None, None]
+            self.assertTrue(np.allclose(chw, expected))
+
+        # the output array is reused, and each image is a crop of the
+        # input or of the flipped input.
+        out2 = image.batch_transform(ims, 24, True, out=out)
+        self.assertTrue(out2 is out)
+        for im, chw in zip(ims, out):
+            hwc = chw.transpose((1, 2, 0))
+            found = False
+            for src in [im, image.left_right_flip(im)]:
+                for h in xrange(src.shape[0] - 24 + 1):
+                    for w in xrange(src.shape[1] - 24 + 1):
+                        if (src[h:h + 24, w:w + 24] == hwc).all():
+                            found = True
+            self.assertTrue(found)
+
+    def test_batch_transform_mapper(self):
+        batch = [(np.ones((30, 30), dtype='uint8') * i, i) for i in xrange(4)]
+        mapper = image.batch_transform_mapper(28, True, is_color=False)
+        samples = mapper(batch)
+        self.assertEqual(len(samples), 4)
+        for i, (im, label) in enumerate(samples):
+            self.assertEqual(im.shape, (1, 28, 28))
+            self.assertEqual(label, i)
+            self.assertTrue((im == i).all())
+
+    def test_memory_image_cache(self):
+        ims = [np.ones((4, 4, 3), dtype='uint8') * i for i in xrange(3)]
+        cache = image.MemoryImageCache(2 * ims[0].nbytes)
+        cache.put("0", ims[0])
+        cache.put("1", ims[1])
+        self.assertTrue(cache.get("0") is ims[0])
+        # "1" is the least recently used one
+        cache.put("2", ims[2])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.nbytes, 2 * ims[0].nbytes)
+        self.assertTrue(cache.get("1") is None)
+        self.assertTrue(cache.get("2") is ims[2])
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_mmap_image_cache(self):
+        dirname = tempfile.mkdtemp()
+        try:
+            path = os.path.join(dirname, "cache")
+            ims = [
+                np.random.randint(
+                    0, 256, size=(h, w, 3)).astype('uint8')
+                for h, w in [(4, 6), (5, 4), (3, 3)]
+            ]
+            cache = image.MmapImageCache(path, max_bytes=150)
+            for i, im in enumerate(ims):
+                cache.put(str(i), im)
+                if i == 0:
+                    self.assertTrue((cache.get("0") == ims[0]).all())
+            # the last image exceeds max_bytes
+            self.assertEqual(len(cache), 2)
+            self.assertTrue(cache.get("2") is None)
+            cache.close()
+
+            cache = image.MmapImageCache(path)
+            for i in xrange(2):
+                im = cache.get(str(i))
+                self.assertEqual(im.shape, ims[i].shape)
+                self.assertTrue((im == ims[i]).all())
+            cache.close()
+        finally:
+            shutil.rmtree(dirname)
+
+    def test_batch_images_from_tar(self):
+        dirname = tempfile.mkdtemp()
+        try:
+            data_file = os.path.join(dirname, "images.tar")
+            tf = tarfile.open(data_file, "w")
+            images = {}
+            for i in xrange(7):
+                name = "jpg/image_%d.jpg" % i
+                images[name] = "image %d" % i * (i + 1)
+                info = tarfile.TarInfo(name)
+                info.size = len(images[name])
+                tf.addfile(info, cStringIO.StringIO(images[name]))
+            tf.close()
+            # the last image is not in the dataset
+            img2label = dict((name, i) for i, name in enumerate(
+                sorted(images)[:6]))
+
+            for dataset_name, mapper in [("train", None), ("test", _reverse)]:
+                meta_file = image.batch_images_from_tar(
+                    data_file,
+                    dataset_name,
+                    img2label,
+                    num_per_batch=4,
+                    mapper=mapper)
+                files = [line.strip() for line in open(meta_file)]
+                self.assertEqual(len(files), 2)
+                samples = []
+                for f in files:
+                    samples.extend(image.read_image_batch(f))
+                expected = [(images[name], label)
+                            for name, label in sorted(img2label.items())]
+                if mapper is not None:
+                    expected = [(mapper(im), l) for im, l in expected]
+                self.assertEqual(samples, expected)
+                self.assertEqual(
+                    list(image.read_image_batch(files[0], [3, 1])),
+                    [expected[3], expected[1]])
+
+            # the pickled batch files written by the former versions
+            path = os.path.join(dirname, "batch_pickled")
+            with open(path, "wb") as f:
+                cPickle.dump({"data": ["a", "b"], "label": [1, 2]}, f,
+                             cPickle.HIGHEST_PROTOCOL)
+            self.assertEqual(
+                list(image.read_image_batch(path)), [("a", 1), ("b", 2)])
+        finally:
+            shutil.rmtree(dirname)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,77 @@
+#   Copyright (c) 2018 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+
+import paddle.v2.minibatch as minibatch
+
+
+def sequence_reader():
+    for i in xrange(100):
+        yield range(i % 20 + 1), i
+
+
+class TestBucketBatch(unittest.TestCase):
+    def check_batches(self, batches, boundaries):
+        samples = sorted(s[1] for b in batches for s in b)
+        self.assertEqual(samples, range(100))
+        for b in batches:
+            lens = [len(s[0]) for s in b]
+            # all the samples of a batch are in the same bucket
+            buckets = set(
+                sum(1 for bound in boundaries if l > bound) for l in lens)
+            self.assertEqual(len(buckets), 1)
+
+    def test_batch_size(self):
+        boundaries = [5, 10, 15]
+        for shuffle in (False, True):
+            reader = minibatch.bucket_batch(
+                sequence_reader,
+                boundaries,
+                batch_size=8,
+                shuffle=shuffle,
+                buf_size=30)
+            batches = list(reader())
+            self.check_batches(batches, boundaries)
+            self.assertTrue(all(len(b) <= 8 for b in batches))
+
+    def test_max_tokens(self):
+        boundaries = [10]
+        for shuffle in (False, True):
+            reader = minibatch.bucket_batch(
+                sequence_reader,
+                boundaries,
+                max_tokens=40,
+                shuffle=shuffle,
+                buf_size=30)
+            batches = list(reader())
+            self.check_batches(batches, boundaries)
+            for b in batches:
+                max_len = max(len(s[0]) for s in b)
+                self.assertTrue(len(b) == 1 or len(b) * max_len <= 40)
+
+    def test_drop_last(self):
+        reader = minibatch.bucket_batch(
+            sequence_reader, [10], batch_size=8, drop_last=True)
+        self.assertTrue(all(len(b) == 8 for b in reader()))
+
+    def test_invalid_args(self):
+        with self.assertRaises(ValueError):
+            minibatch.bucket_batch(sequence_reader, [10])
+        with self.assertRaises(ValueError):
+            minibatch.bucket_batch(
+                sequence_reader, [10], batch_size=8, max_tokens=100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -25,6 +25,7 @@ except ImportError:
     sys.exit(0)
 
 import paddle.v2.parameters as parameters
+import paddle.v2.checkpoint as checkpoint
 import paddle.v2.data_type as data_type
 import paddle.v2.layer as layer
 from paddle.v2.attr import ParamAttr
@@ -32,6 +33,9 @@ from paddle.proto.ParameterConfig_pb2 import ParameterConfig
 import random
 import cStringIO
 import numpy
+import os
+import shutil
+import tempfile
 
 
 def __rand_param_config__(name, psize=None):
@@ -75,6 +79,33 @@ class TestParameters(unittest.TestCase):
             p1 = params_dup.get(name)
             self.assertTrue(numpy.isclose(p0, p1).all())
 
+    def test_from_tar_mmap(self):
+        params = parameters.Parameters()
+        params.__append_config__(__rand_param_config__("param_0"))
+        params.__append_config__(__rand_param_config__("param_1", 1))
+        for name in params.names():
+            params.set(name,
+                       numpy.random.uniform(
+                           -1.0, 1.0, size=params.get_shape(name)))
+
+        tmp_file = tempfile.NamedTemporaryFile(suffix=".tar", delete=False)
+        try:
+            params.to_tar(tmp_file)
+            tmp_file.close()
+            for use_mmap in [False, True]:
+                with open(tmp_file.name, "rb") as f:
+                    params_dup = parameters.Parameters.from_tar(
+                        f, use_mmap=use_mmap)
+                self.assertEqual(params_dup.names(), params.names())
+                for name in params.names():
+                    p0 = params.get(name)
+                    p1 = params_dup.get(name)
+                    self.assertEqual(p0.shape, p1.shape)
+                    self.assertTrue(numpy.isclose(p0, p1).all())
+                    self.assertEqual(p1.flags.writeable, not use_mmap)
+        finally:
+            os.remove(tmp_file.name)
+
     def test_initializer(self):
         def initializer(name):
             assert name == "fc.w"
@@ -138,6 +169,40 @@ class TestParameters(unittest.TestCase):
             v2 = p2.get(name)
             self.assertTrue(numpy.isclose(v1, v2).all())
 
+    def test_async_checkpoint(self):
+        params = parameters.Parameters()
+        params.__append_config__(__rand_param_config__("param_0"))
+        params.__append_config__(__rand_param_config__("param_1"))
+        dirname = tempfile.mkdtemp()
+        try:
+            ckpt = checkpoint.AsyncCheckpointer(dirname, max_to_keep=2)
+            expected = None
+            for i in xrange(3):
+                for name in params.names():
+                    params.set(name,
+                               numpy.random.uniform(
+                                   -1.0, 1.0, size=params.get_shape(name)))
+                snapshot = params.snapshot()
+                expected = dict((name, params.get(name).copy())
+                                for name in params.names())
+                path = ckpt.save(snapshot, "batch-%d" % i)
+                # the snapshot is not changed by the training going on
+                for name in params.names():
+                    params.set(name, numpy.zeros(params.get_shape(name)))
+            ckpt.wait()
+            self.assertTrue(ckpt.done())
+            self.assertEqual(len(ckpt.checkpoints()), 2)
+            self.assertEqual(ckpt.latest(), path)
+            self.assertEqual(
+                [f for f in os.listdir(dirname) if f.endswith(".tmp")], [])
+            with open(path, "rb") as f:
+                loaded = parameters.Parameters.from_tar(f)
+            for name in params.names():
+                self.assertTrue(
+                    numpy.isclose(loaded.get(name), expected[name]).all())
+        finally:
+            shutil.rmtree(dirname)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -134,6 +134,36 @@ class SGD(object):
         self.__parameters__.to_tar(f)
         self.__parameter_updater__.restore()
 
+    def snapshot_parameters(self):
+        """
+        Copy the parameters as `save_parameter_to_tar` saves them, i.e.
+        with the settings such as model average applied.
+
+        :return: the snapshot, which can be saved by
+                 `paddle.v2.parameters.snapshot_to_tar`.
+        :rtype: OrderedDict
+        """
+        self.__parameter_updater__.catchUpWith()
+        self.__parameter_updater__.apply()
+        self.__parameter_updater__.getParametersRemote(True, True)
+        snapshot = self.__parameters__.snapshot()
+        self.__parameter_updater__.restore()
+        return snapshot
+
+    def save_parameter_to_tar_async(self, checkpointer, tag):
+        """
+        Save the parameters in the background. Only copying the parameters
+        blocks the training, the tar file is written by the checkpointer
+        while the training goes on.
+
+        :param checkpointer: the checkpointer to write the parameters.
+        :type checkpointer: paddle.v2.checkpoint.AsyncCheckpointer
+        :param tag: the tag of the checkpoint, e.g. "pass-1-batch-100".
+        :type tag: basestring
+        :return: the path the checkpoint will be written to.
+        """
+        return checkpointer.save(self.snapshot_parameters(), tag)
+
     def train(self, reader, num_passes=1, event_handler=None, feeding=None):
         """
         Training method. Will train num_passes of input data.